@@ -0,0 +1,295 @@
+import copy
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from isomorphism import canonicalize
+
+
+class EquityCache:
+    """
+    Least recently used cache of equity results, bounded both in number of entries and in bytes.
+
+    Results are copied in and out, so callers can modify what they get back without corrupting the cache.
+    """
+
+    def __init__(self, max_entries=4096, max_bytes=64 * 1024 ** 2):
+        """
+        Args:
+            max_entries (int): Largest number of results kept.
+            max_bytes (int): Largest total pickled size of the keys and results kept.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Looks up a result, marking it as the most recently used.
+
+        Args:
+            key (tuple): A key built by `spot_key`.
+
+        Returns:
+            A copy of the cached result, or None if it is not cached.
+        """
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return copy.deepcopy(self._entries[key][0])
+
+    def put(self, key, value):
+        """
+        Stores a result, evicting the least recently used ones until the cache fits its limits again.
+
+        Args:
+            key (tuple): A key built by `spot_key`.
+            value: The result to store, anything picklable except None.
+        """
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        size = len(pickle.dumps((key, value)))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (copy.deepcopy(value), size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Drops every cached result and resets the statistics.
+        """
+        self._entries.clear()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """
+        Reports how well the cache is doing.
+
+        Returns:
+            dict: The number of hits, misses and evictions, and the current number of entries and bytes.
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self._bytes}
+
+
+def spot_key(game_type, player_hands, board=(), dead_cards=(), query=()):
+    """
+    Builds the cache key of an equity query. Spots that only differ by a permutation of suits share a key.
+
+    Args:
+        game_type (str): The game and deck, e.g. 'holdem' or 'omaha-short'.
+        player_hands (list): Each player's hole card ids, in seat order.
+        board (list[int]): The community card ids dealt so far.
+        dead_cards (list[int]): Card ids known to be out of the deck.
+        query (tuple): Everything else the result depends on, such as the number of scenarios or the precision.
+
+    Returns:
+        tuple: The hashable key.
+    """
+    canonical_groups, _ = canonicalize(list(player_hands) + [board, dead_cards])
+    return (game_type, canonical_groups, tuple(query))
+
+
+# Shared by every equity engine in the process
+EQUITY_CACHE = EquityCache()
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "equity_store.sqlite3")
+
+# An estimate: a list of result parts whose first part holds the rates precision is judged on (a list of win rates
+# or an outcome dict), the number of samples it was computed from and whether it is exact
+EquityRecord = namedtuple("EquityRecord", ["rates", "num_samples", "exact"])
+
+
+def merge_rates(rates, num_samples, other_rates, other_samples, decimals=None):
+    """
+    Averages two estimates of the same rates weighted by their sample counts.
+
+    Args:
+        rates: Rates as a number, or lists and dicts of them nested any way. Missing dict entries count as 0.
+        num_samples (int): Samples behind `rates`.
+        other_rates: Rates with the same structure.
+        other_samples (int): Samples behind `other_rates`.
+        decimals (int, optional): Rounds the merged rates to this many decimals.
+
+    Returns:
+        The merged rates, with the same structure.
+    """
+    if isinstance(rates, dict) or isinstance(other_rates, dict):
+        return {key: merge_rates(rates.get(key, 0), num_samples, other_rates.get(key, 0), other_samples, decimals)
+                for key in list(rates) + [key for key in other_rates if key not in rates]}
+    if isinstance(rates, (list, tuple)):
+        return [merge_rates(rate, num_samples, other_rate, other_samples, decimals)
+                for rate, other_rate in zip(rates, other_rates)]
+    merged = (rates * num_samples + other_rates * other_samples) / (num_samples + other_samples)
+    return float(merged if decimals is None else np.round(merged, decimals))
+
+
+def max_standard_error(record, scale=1):
+    """
+    Computes the largest standard error among the rates of the first part of a record.
+
+    Args:
+        record (EquityRecord): The estimate.
+        scale (float): What a rate of 1 is expressed as, e.g. 100 for percentages.
+
+    Returns:
+        float: The largest standard error, in the same unit as the rates, 0 if the record is exact.
+    """
+    if record.exact:
+        return 0.0
+    rates = record.rates[0].values() if isinstance(record.rates[0], dict) else record.rates[0]
+    return max(float(np.sqrt(rate / scale * (1 - rate / scale) / record.num_samples) * scale) for rate in rates)
+
+
+class EquityStore:
+    """
+    Equity estimates persisted in a SQLite database, shared by every process using the same file.
+
+    Writes merge the new samples into whatever is stored inside one write transaction, so concurrent processes
+    refining the same spot add up their samples instead of overwriting each other.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, timeout=30):
+        """
+        Args:
+            path (str): Location of the SQLite database, created if missing.
+            timeout (float): Seconds to wait for another process's write transaction to finish.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS equity (key TEXT PRIMARY KEY, rates BLOB NOT NULL, "
+                                 "num_samples INTEGER NOT NULL, max_error REAL NOT NULL, exact INTEGER NOT NULL)")
+
+    def get(self, key):
+        """
+        Reads a stored estimate.
+
+        Args:
+            key (tuple): A key built by `spot_key`.
+
+        Returns:
+            EquityRecord: The stored estimate, or None if there is none.
+        """
+        row = self._connection.execute("SELECT rates, num_samples, exact FROM equity WHERE key = ?",
+                                       (repr(key),)).fetchone()
+        return None if row is None else EquityRecord(pickle.loads(row[0]), row[1], bool(row[2]))
+
+    def merge(self, key, record, scale=1, decimals=None):
+        """
+        Adds a new estimate to the stored one. Exact estimates replace sampled ones and are never refined further.
+
+        Args:
+            key (tuple): A key built by `spot_key`.
+            record (EquityRecord): The new estimate, independent of the stored one.
+            scale (float): What a rate of 1 is expressed as, e.g. 100 for percentages.
+            decimals (int, optional): Rounds merged rates to this many decimals.
+
+        Returns:
+            EquityRecord: The estimate now stored.
+        """
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._connection.execute("SELECT rates, num_samples, exact FROM equity WHERE key = ?",
+                                           (repr(key),)).fetchone()
+            stored = None if row is None else EquityRecord(pickle.loads(row[0]), row[1], bool(row[2]))
+            if stored is not None and stored.exact:
+                record = stored
+            elif stored is not None and not record.exact:
+                record = EquityRecord(merge_rates(stored.rates, stored.num_samples, record.rates, record.num_samples,
+                                                  decimals),
+                                      stored.num_samples + record.num_samples, False)
+            self._connection.execute("INSERT OR REPLACE INTO equity VALUES (?, ?, ?, ?, ?)",
+                                     (repr(key), pickle.dumps(record.rates), record.num_samples,
+                                      max_standard_error(record, scale), int(record.exact)))
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        return record
+
+    def close(self):
+        self._connection.close()
+
+
+_store = None
+
+
+def open_store(path=DEFAULT_STORE_PATH):
+    """
+    Makes every equity engine in the process reuse and refine the estimates stored at `path`.
+
+    Args:
+        path (str): Location of the SQLite database, created if missing.
+
+    Returns:
+        EquityStore: The opened store.
+    """
+    global _store
+    close_store()
+    _store = EquityStore(path)
+    return _store
+
+
+def close_store():
+    """
+    Stops using the persistent store, if one is open.
+    """
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+def get_store():
+    """
+    Returns:
+        EquityStore: The store opened by `open_store`, or None.
+    """
+    return _store
+
+
+def stored_estimate(store, key, estimate, num_samples=None, precision=None, scale=1, decimals=None):
+    """
+    Reuses the stored estimate of a spot if it is good enough, otherwise refines it with a new estimate.
+
+    A stored estimate is good enough if it is exact, if it has at least `num_samples` samples or if its largest
+    standard error is at most `precision`. With neither requirement, only an exact estimate is reused.
+
+    Args:
+        store (EquityStore): The store.
+        key (tuple): A key built by `spot_key`.
+        estimate (callable): Computes a new EquityRecord. Called with the number of samples still missing to reach
+            `num_samples`, or None to let it choose.
+        num_samples (int, optional): Number of samples wanted.
+        precision (float, optional): Largest standard error wanted.
+        scale (float): What a rate of 1 is expressed as, e.g. 100 for percentages.
+        decimals (int, optional): Rounds merged rates to this many decimals.
+
+    Returns:
+        EquityRecord: The reused or refined estimate.
+    """
+    record = store.get(key)
+    if record is not None and (record.exact
+                               or (num_samples is not None and record.num_samples >= num_samples)
+                               or (precision is not None and max_standard_error(record, scale) <= precision)):
+        return record
+    missing = None if num_samples is None or record is None else num_samples - record.num_samples
+    return store.merge(key, estimate(missing), scale, decimals)
@@ -1,19 +1,32 @@
-import unittest
+import timeit
 
 import numpy as np
 
+from evaluator import add_cards, card_features, evaluate_five, evaluate_seven, score_features, unpack_score
+from cache import EQUITY_CACHE, EquityRecord, get_store, spot_key, stored_estimate
+from isomorphism import collapse_runouts
+from preflop import equity_error, preflop_equity
+from utils import comb_index, num_combinations, resolve_n_jobs, run_shards, shard_sizes
+
 
 class Card:
     """
     Represents a playing card with a number and a suit color.
+
+    Cards are immutable flyweights: the 52 instances are created and validated once at import time, after which
+    `Card(count, color)` is a dictionary lookup returning the shared instance. Cards compare and hash by their id.
     
     Attributes:
-        count (int): The number on the card, which should be between 1 (Ace) and 13 (King).
+        count (int): The number on the card, which should be between 1 (Two) and 13 (Ace).
         color (int): The suit color of the card, represented as an integer from 1 to 4.
+        id (int): The card id used by the evaluators and the table, from 0 to 51.
     """
-    def __init__(self, count: int, color: int):
+    __slots__ = ("_count", "_color", "_id")
+    _interned = {}
+
+    def __new__(cls, count: int, color: int):
         """
-        Initialize a new Card instance with the specified count and color.
+        Return the Card instance with the specified count and color.
         
         Args:
             count (int): The number of the card.
@@ -22,10 +35,21 @@ class Card:
         Raises:
             ValueError: If the count is not between 1 and 13, or if the color is not between 1 and 4.
         """
-        self._count = None
-        self._color = None
-        self.count = count  # Use the setter to check value
-        self.color = color  # Use the setter to check value
+        card = cls._interned.get((count, color))
+        if card is not None:
+            return card
+        if not 1 <= count <= 13:
+            raise ValueError("Count must be between 1 and 13.")
+        if not 1 <= color <= 4:
+            raise ValueError("Color must be between 1 and 4.")
+
+        # Only reached while the deck below is interned
+        card = object.__new__(cls)
+        object.__setattr__(card, "_count", count)
+        object.__setattr__(card, "_color", color)
+        object.__setattr__(card, "_id", (count - 1) * 4 + color - 1)
+        cls._interned[count, color] = card
+        return card
 
     @property
     def count(self):
@@ -37,21 +61,6 @@ class Card:
         """
         return self._count
 
-    @count.setter
-    def count(self, value):
-        """
-        Sets the number on the card, ensuring it is within the valid range.
-        
-        Args:
-            value (int): The number to set on the card.
-        
-        Raises:
-            ValueError: If the value is not between 1 and 13.
-        """
-        if not 1 <= value <= 13:
-            raise ValueError("Count must be between 1 and 13.")
-        self._count = value
-
     @property
     def color(self):
         """
@@ -62,21 +71,30 @@ class Card:
         """
         return self._color
 
-    @color.setter
-    def color(self, value):
+    @property
+    def id(self):
         """
-        Sets the suit color of the card, ensuring it is within the valid range.
-        
-        Args:
-            value (int): The suit color to set on the card.
-        
-        Raises:
-            ValueError: If the value is not between 1 and 4.
+        Returns the card id used by the evaluators and the table, 4 * (count - 1) + (color - 1).
+
+        Returns:
+            int: The card id, from 0 to 51.
         """
-        if not 1 <= value <= 4:
-            raise ValueError("Color must be between 1 and 4.")
-        self._color = value
+        return self._id
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card instances are immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, Card):
+            return NotImplemented
+        return self._id == other._id
+
+    def __hash__(self):
+        return self._id
 
+    def __reduce__(self):
+        # Unpickling goes back through __new__ and so returns the interned instance
+        return Card, (self._count, self._color)
 
     def __repr__(self):
         """
@@ -87,6 +105,33 @@ class Card:
         """
         return f"Card(count={self.count}, color={self.color})"
 
+# The interned deck, indexed by card id
+_DECK = tuple(Card(card_id // 4 + 1, card_id % 4 + 1) for card_id in range(52))
+
+def card_from_id(card_id):
+    """
+    Creates the Card instance matching a card id.
+
+    Args:
+        card_id (int): The card id, from 0 to 51.
+
+    Returns:
+        Card: The corresponding card.
+    """
+    return _DECK[card_id]
+
+def to_card_ids(cards):
+    """
+    Converts a list of Card instances and/or card ids into card ids.
+
+    Args:
+        cards (list[Card] or list[int]): The cards to convert.
+
+    Returns:
+        list[int]: The card ids, in the same order.
+    """
+    return [card.id if isinstance(card, Card) else int(card) for card in cards]
+
 def set_card():
     """
     Generates a list of Card instances representing a full set of cards.
@@ -99,7 +144,8 @@ def set_card():
 
 class Ranker:
     """
-    Provides static methods to rank poker hands based on traditional poker hand rankings.
+    Provides static methods to rank poker hands based on traditional poker hand rankings. Hands are ranked with the
+    same packed scores as `ranker.Ranker`, and only decoded into a rank and tie breakers for display.
     """
     @staticmethod
     def rank_all_hands(hand_combos, return_all=False):
@@ -108,379 +154,395 @@ class Ranker:
         
         Args:
             hand_combos (list[list[Card]]): A list of lists, where each inner list represents a hand of cards.
-            return_all (bool): If True, returns a list of all ranked hands. If False, returns only the highest ranked hand.
+            return_all (bool): If True, returns the score of every hand. If False, returns only the highest score.
         
         Returns:
-            list or tuple: Depending on `return_all`, returns a list of all hand rankings or a tuple for the highest ranked hand.
+            list or int: Depending on `return_all`, the packed score of every hand or the highest packed score.
         """
-        results = []
-
-        for hand in hand_combos:
-            rank, tie_breakers = Ranker.rank_one_hand(hand)
-            results.append((rank, tie_breakers))
+        scores = [Ranker.score_hand(hand) for hand in hand_combos]
 
         if return_all:
-            return results
+            return scores
         else:
-            # Sort the results based on rank and then tie_breakers, return the highest
-            highest_hand = max(results, key=lambda x: (x[0], x[1]))
-            return highest_hand
+            return max(scores)
 
 
     @staticmethod
     def rank_one_hand(hand):
         """
-        Ranks a single poker hand and returns the rank and tie breakers.
+        Ranks a single poker hand.
 
         Args:
             hand (list[Card]): A list of Card instances representing a single poker hand.
 
         Returns:
-            tuple: A tuple containing the rank of the hand and a list of tie breakers.
+            int: The packed hand score, where score // 16 ** 5 is the hand type.
          """
-        counts = np.array([card.count for card in hand])
-        colors = np.array([card.color for card in hand])
-
-        # Sort the counts to make further operations easier.
-        counts.sort()
-        suit_arr = Ranker.gen_suit_arr(colors)
-        straight_arr = Ranker.gen_straight_arr(counts)
-
-        rank = 0
-        tie_breakers = []
-
-        # The checks return a tuple (rank, tie_breakers), we update both based on the check.
-        rank, tie_breakers = Ranker.straight_flush_check(counts, rank, straight_arr, suit_arr)
-        if rank == 0:  # Continue only if no higher rank was found
-            rank, tie_breakers = Ranker.four_of_a_kind_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.full_house_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.flush_check(rank, suit_arr, counts)
-        if rank == 0:
-            rank, tie_breakers = Ranker.straight_check(counts, rank, straight_arr)
-        if rank == 0:
-            rank, tie_breakers = Ranker.three_of_a_kind_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.two_pairs_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.one_pair_check(counts, rank)
-        if rank == 0:
-            # High card case, return the sorted counts as tie_breakers.
-            tie_breakers = sorted(counts, reverse=True)
-            rank = 0  # Explicit for clarity, high card is the default case.
-
-        return rank, tie_breakers
-
+        return Ranker.score_hand(hand)
 
     @staticmethod
-    def gen_suit_arr(colors):
+    def score_hand(hand):
         """
-        Checks if all cards in a hand are of the same suit.
+        Scores the best five-card hand that can be made from the given cards using the lookup tables in `evaluator`.
 
         Args:
-        colors (list[int]): A list of integers representing the colors (suits) of the cards.
+            hand (list[Card] or list[int]): Five to seven Card instances or card ids.
 
         Returns:
-        bool: True if all cards are of the same suit, otherwise False.
+            int: The packed hand score, higher is better.
         """
-        return np.max(colors) == np.min(colors)
+        card_ids = to_card_ids(hand)
+        if len(card_ids) == 5:
+            return evaluate_five(card_ids)
+        return evaluate_seven(card_ids)
 
     @staticmethod
-    def gen_straight_arr(counts):
+    def decode_score(score):
         """
-        Determines if the hand forms a straight.
+        Converts a packed hand score into a rank and tie breakers expressed in card counts, for display.
 
         Args:
-            counts (list[int]): A list of integers representing the counts (values) of the cards, sorted in ascending order.
+            score (int): A packed hand score.
 
         Returns:
-            bool: True if the cards form a straight, otherwise False.
-        """
-        straight_check = 0
-        for i in range(4):
-            if counts[i] + 1 == counts[i + 1]:
-                straight_check += 1
-        straight_check += ((counts[0] == 2) and (counts[4] == 14))  # Handling Ace as both high and low
-        return straight_check == 4
-
-    @staticmethod
-    def straight_flush_check(counts, rank, straight_arr, suit_arr):
-        """
-        Checks for a straight flush in a poker hand.
-
-        Args:
-            counts (np.array): An array of card counts.
-            rank (int): Current rank of the hand.
-            straight_arr (bool): Whether the hand is a straight.
-            suit_arr (bool): Whether all cards are of the same suit.
-
-        Returns:
-            tuple: Updated rank and tie breakers if a straight flush is found.
+            tuple: A tuple containing the rank of the hand and a list of tie breakers.
         """
-        if rank == 0 and straight_arr and suit_arr:
-            # Handling Ace as both high and low in a straight flush
-            if counts[0] == 2 and counts[4] == 14:
-                # Ace-low straight flush, make Ace '1'
-                return (8, [5])  # Returning 5 as the highest card (Ace is considered low)
-            return (8, [counts[-1]])  # Return rank and highest card of straight flush
-        return (rank, [])
+        rank, tie_breakers = unpack_score(score)
+        return rank, [value - 1 for value in tie_breakers]
 
 
-    @staticmethod
-    def four_of_a_kind_check(counts, rank):
-        """
-        Checks for four of a kind in a poker hand.
 
-        Args:
-            counts (np.array): An array of card counts.
-            rank (int): Current rank of the hand.
-
-        Returns:
-            tuple: Updated rank and tie breakers if four of a kind is found.
-        """
-        if rank > 0:
-            return (rank, [])
-        quad_value = np.where(np.bincount(counts)[1:] == 4)[0]
-        if quad_value.size > 0:
-            quad_value += 1  # Adjusting index to match card value
-            kicker = np.max(np.setdiff1d(counts, quad_value))
-            return (7, [quad_value[0], kicker])  # Returning rank, quad value, and kicker
-        return (rank, [])
-
-    @staticmethod
-    def full_house_check(counts, rank):
-        """
-        Checks for a full house in a poker hand.
-
-        Args:
-            counts (np.array): An array of card counts.
-            rank (int): Current rank of the hand.
-
-        Returns:
-            tuple: Updated rank and tie breakers if a full house is found.
-        """
-        if rank > 0:
-            return (rank, [])
-        count_bin = np.bincount(counts)[1:]
-        if 3 in count_bin and 2 in count_bin:
-            triplet_value = np.where(count_bin == 3)[0][0] + 1
-            pair_value = np.where(count_bin == 2)[0][0] + 1
-            return (6, [triplet_value, pair_value])
-        return (rank, [])
+import random
 
+def input_card():
+    """
+    Prompts the user to input the rank and suit of a card and returns a Card object.
 
-    @staticmethod
-    def flush_check(rank, suit_arr, counts):
-        """
-        Determines if the hand is a flush and returns the appropriate rank and tie breakers.
+    Returns:
+        Card: A new Card object based on user input.
+    """
+    rank = int(input("Enter card rank (1-13 where 1=two, 13=Ace): "))
+    suit = int(input("Enter card suit (1=Hearts, 2=Clubs, 3=Diamonds, 4=Spades): "))
+    return Card(rank, suit)
 
-        Args:
-            rank (int): The current rank of the hand.
-            suit_arr (bool): Boolean indicating whether all cards have the same suit.
-            counts (np.array): Array of card values sorted in ascending order.
+NUM_GAMES = 10000
+# Enumerate every runout instead of sampling when there are at most this many (e.g. 990 on the flop heads-up)
+EXACT_THRESHOLD = 10000
+# Adaptive sampling runs in batches of this many games and never runs more than MAX_GAMES in total
+BATCH_GAMES = 2000
+MAX_GAMES = 1000000
 
-        Returns:
-            tuple: Rank of the hand and tie breakers if the hand is a flush; otherwise, current rank and empty list.
-        """
-        if rank > 0:
-            return (rank, [])
-        if suit_arr:
-            # Return all cards in descending order
-            return (5, sorted(counts, reverse=True))
-        return (rank, [])
 
+def simulate_poker_games(card_objects,num_player, exact_threshold=EXACT_THRESHOLD, precision=None, time_budget=None,
+                         n_jobs=1, seed=None):
+    """
+    Simulates a series of poker games to determine win rates for players based on their initial hands.
 
-    @staticmethod
-    def straight_check(counts, rank, straight_arr):
-        """
-        Checks if the hand contains a straight and returns the updated rank and tie breakers.
+    Args:
+        card_objects (list[Card] or list[int]): Cards or card ids representing the players' initial hands.
+        num_players (int): Number of players in the game.
+        exact_threshold (int): Every possible board is evaluated, giving exact win rates, when there are at most
+            this many of them. Otherwise NUM_GAMES random boards are sampled. Heads-up, the win rates are read from
+            the preflop equity table instead when it has been built.
+        precision (float, optional): Switches to adaptive sampling, which stops once every win rate's standard
+            error is at most this value.
+        time_budget (float, optional): Switches to adaptive sampling, which stops after this many seconds.
+        n_jobs (int): Number of worker processes the sampled games are sharded across, -1 for one per CPU core.
+        seed (int, optional): Seed making the sampled win rates reproducible for a given `n_jobs`.
 
-        Args:
-            counts (np.array): An array of card values sorted in ascending order.
-            rank (int): The current rank of the hand.
-            straight_arr (bool): Boolean indicating whether the hand forms a straight.
+    Returns:
+        list[float]: List of win rates for each player. With adaptive sampling, a tuple of the win rates and the
+            list of their standard errors.
+    """
+    #num_players = int(input("Enter the number of players (1-5): "))
+    #num_players = min(max(num_players, 1), 5)
+    num_players=num_player
+    card_ids = to_card_ids(card_objects)
+    players_hands = np.array([card_ids[i*2:(i+1)*2] for i in range(num_players)], dtype=np.uint8)
+    #for i in range(num_players):
+        #print(f"Define Player {i+1}'s hand:")
+        #players_hands.append([input_card() for _ in range(2)])
 
-        Returns:
-            tuple: Updated rank and tie breakers if the hand is a straight.
-        """
-        if rank > 0:
-            return (rank, [])
-        if straight_arr:
-            if counts[0] == 2 and counts[4] == 14:  # Ace low straight
-                return (4, [5])  # Returning 5 as the highest card
-            return (4, [counts[-1]])
-        return (rank, [])
+    return win_rate_query(players_hands, [], exact_threshold, precision, time_budget, n_jobs, seed)
 
 
-    @staticmethod
-    def three_of_a_kind_check(counts, rank):
-        """
-        Checks for three of a kind in the hand and updates the rank and tie breakers accordingly.
+def simulate_poker_game_with_community_card(card_objects, num_players, community_cards,
+                                            exact_threshold=EXACT_THRESHOLD, precision=None, time_budget=None,
+                                            n_jobs=1, seed=None):
+    """
+        Simulates poker games with predefined community cards.
 
         Args:
-            counts (np.array): An array of card values.
-            rank (int): The current rank of the hand.
+            card_objects (list[Card] or list[int]): Cards or card ids representing the hands of the players.
+            num_players (int): Number of players in the game.
+            community_cards (list[Card] or list[int]): The community cards already dealt, up to five.
+            exact_threshold (int): Every possible runout is evaluated, giving exact win rates, when there are at
+                most this many of them. Otherwise NUM_GAMES random runouts are sampled.
+            precision (float, optional): Switches to adaptive sampling, which stops once every win rate's standard
+                error is at most this value.
+            time_budget (float, optional): Switches to adaptive sampling, which stops after this many seconds.
+            n_jobs (int): Number of worker processes the sampled games are sharded across, -1 for one per CPU core.
+            seed (int, optional): Seed making the sampled win rates reproducible for a given `n_jobs`.
 
         Returns:
-            tuple: Updated rank and tie breakers if three of a kind is found.
-        """
-        if rank > 0:
-            return (rank, [])
-        triplet_value = np.where(np.bincount(counts)[1:] == 3)[0]
-        if triplet_value.size > 0:
-            triplet_value += 1  # Adjust for card value
-            kickers = np.sort(np.setdiff1d(counts, triplet_value))[::-1]  # Highest kickers
-            return (3, [triplet_value[0]] + list(kickers[:2]))  # Include top 2 kickers
-        return (rank, [])
-
-    @staticmethod
-    def two_pairs_check(counts, rank):
-        """
-        Checks for two pairs in the hand and updates the rank and tie breakers accordingly.
+            list[float]: List of win rates for each player. With adaptive sampling, a tuple of the win rates and the
+                list of their standard errors.
+    """
+    card_ids = to_card_ids(card_objects)
+    players_hands = np.array([card_ids[i*2:(i+1)*2] for i in range(num_players)], dtype=np.uint8)
 
-        Args:
-            counts (np.array): An array of card values.
-            rank (int): The current rank of the hand.
+    return win_rate_query(players_hands, to_card_ids(community_cards), exact_threshold, precision, time_budget,
+                          n_jobs, seed)
 
-        Returns:
-            tuple: Updated rank and tie breakers if two pairs are found.
-        """
-        if rank > 0:
-            return (rank, [])
-        pair_values = np.where(np.bincount(counts)[1:] == 2)[0]
-        if pair_values.size == 2:
-            pair_values += 1  # Adjust for card values
-            kicker = np.max(np.setdiff1d(counts, pair_values))  # Highest kicker
-            return (2, sorted(pair_values, reverse=True) + [kicker])
-        return (rank, [])
 
+def win_rate_query(players_hands, community_ids, exact_threshold=EXACT_THRESHOLD, precision=None, time_budget=None,
+                   n_jobs=1, seed=None):
+    """
+    Answers a win rate query from the equity cache, the preflop equity table, the persistent store if one is open
+    (reusing or refining its estimate) or by estimating it, in that order.
 
-    @staticmethod
-    def one_pair_check(counts, rank):
-        """
-        Checks for a single pair in the hand and updates the rank and tie breakers accordingly.
+    Args:
+        players_hands (numpy.ndarray): Hole card ids of shape (num_players, 2).
+        community_ids (list[int]): The community cards already dealt, up to five.
+        exact_threshold (int): Largest number of runouts that is enumerated rather than sampled.
+        precision (float, optional): Target standard error of every win rate.
+        time_budget (float, optional): Time limit of the adaptive sampling, in seconds.
+        n_jobs (int): Number of worker processes sampling games, -1 for one per CPU core.
+        seed (int, optional): Seed of the random streams, fresh entropy if None.
 
-        Args:
-            counts (np.array): An array of card values.
-            rank (int): The current rank of the hand.
+    Returns:
+        list[float]: The win rates as returned by `simulate_poker_games`, with their standard errors if adaptive.
+    """
+    key = spot_key("holdem", players_hands, community_ids, query=(
+        "win_rates", exact_threshold, precision, time_budget, None if seed is None else (seed, n_jobs)))
+    cached = EQUITY_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    preflop_rates = preflop_win_rates(players_hands, precision) if len(community_ids) == 0 else None
+    store = get_store()
+    if preflop_rates is not None:
+        win_rates, std_errors = preflop_rates
+    elif store is None or seed is not None:
+        win_rates, std_errors, _ = estimate_win_rates(players_hands, community_ids, exact_threshold, precision,
+                                                      time_budget, n_jobs, seed)
+    else:
+        num_cards = 5 - len(community_ids)
+        exact = num_cards == 0 or num_combinations(52 - players_hands.size - len(community_ids),
+                                                   num_cards) <= exact_threshold
+
+        def estimate(num_games):
+            win_rates, _, num_games = estimate_win_rates(players_hands, community_ids, exact_threshold, precision,
+                                                         time_budget, n_jobs, num_games=num_games or NUM_GAMES)
+            return EquityRecord([win_rates.tolist()], num_games, exact)
+
+        adaptive = precision is not None or time_budget is not None
+        record = stored_estimate(store, spot_key("holdem", players_hands, community_ids, query=("win_rates",)),
+                                 estimate, None if adaptive or exact else NUM_GAMES, precision)
+        win_rates = np.array(record.rates[0])
+        std_errors = np.zeros(len(win_rates)) if record.exact else np.sqrt(win_rates * (1 - win_rates) /
+                                                                           record.num_samples)
+    if precision is None and time_budget is None:
+        result = win_rates.tolist()
+    else:
+        result = (win_rates.tolist(), std_errors.tolist())
+    EQUITY_CACHE.put(key, result)
+    return result
+
+
+def preflop_win_rates(players_hands, precision=None):
+    """
+    Answers a heads-up preflop query from the precomputed equity table, see `preflop.build_preflop_table`.
 
-        Returns:
-            tuple: Updated rank and tie breakers if one pair is found.
-        """
-        if rank > 0:
-            return (rank, [])
-        pair_value = np.where(np.bincount(counts)[1:] == 2)[0]
-        if pair_value.size > 0:
-            pair_value += 1  # Adjust for card value
-            kickers = np.sort(np.setdiff1d(counts, pair_value))[::-1]  # Highest kickers
-            return (1, [pair_value[0]] + list(kickers[:3]))  # Include top 3 kickers
-        return (rank, [])
+    Args:
+        players_hands (numpy.ndarray): Hole card ids of shape (num_players, 2).
+        precision (float, optional): Largest acceptable standard error of the tabled win rates.
 
+    Returns:
+        tuple: Arrays of the win rates (ties included) and of their standard errors, or None if there are not two
+            players, no table was built or it is not precise enough.
+    """
+    if len(players_hands) != 2:
+        return None
+    equity = preflop_equity(players_hands[0], players_hands[1])
+    if equity is None:
+        return None
+    win, tie, num_boards = equity
+    win_rates = np.array([win + tie, 1 - win])
+    std_errors = np.array([equity_error(rate, num_boards) for rate in win_rates])
+    if precision is not None and std_errors.max() > precision:
+        return None
+    return win_rates, std_errors
+
+
+def estimate_win_rates(players_hands, community_ids, exact_threshold=EXACT_THRESHOLD, precision=None,
+                       time_budget=None, n_jobs=1, seed=None, num_games=NUM_GAMES):
+    """
+    Estimates every player's win rate (ties included) over the possible runouts of the board.
 
+    Runouts are enumerated when there are at most `exact_threshold` of them. Otherwise `num_games` of them are sampled,
+    or, if a precision or time budget is given, batches of BATCH_GAMES are sampled until the largest standard error
+    is at most `precision`, `time_budget` seconds have passed, or MAX_GAMES games have been played.
 
-import random
+    Sampled games are split into one shard per worker, each dealt from its own random stream spawned from `seed`,
+    so results are identical for a given seed and number of workers.
 
-def input_card():
-    """
-    Prompts the user to input the rank and suit of a card and returns a Card object.
+    Args:
+        players_hands (numpy.ndarray): Hole card ids of shape (num_players, 2).
+        community_ids (list[int]): The community cards already dealt, up to five.
+        exact_threshold (int): Largest number of runouts that is enumerated rather than sampled.
+        precision (float, optional): Target standard error of every win rate.
+        time_budget (float, optional): Time limit of the adaptive sampling, in seconds.
+        n_jobs (int): Number of worker processes sampling games, -1 for one per CPU core.
+        seed (int, optional): Seed of the random streams, fresh entropy if None.
+        num_games (int): Number of games sampled without a precision or time budget.
 
     Returns:
-        Card: A new Card object based on user input.
+        tuple: Arrays of the win rates and of their standard errors, which are 0 for enumerated runouts, and the
+            number of games they were computed from.
     """
-    rank = int(input("Enter card rank (1-13 where 1=two, 13=Ace): "))
-    suit = int(input("Enter card suit (1=Hearts, 2=Clubs, 3=Diamonds, 4=Spades): "))
-    return Card(rank, suit)
-
-def simulate_poker_games(card_objects,num_player):
+    community_arr = np.array(community_ids, dtype=np.uint8)
+    # Remove cards that are already in use (player hands + community cards) once, they are the same for every game
+    deck = np.setdiff1d(np.arange(52, dtype=np.uint8), np.concatenate([players_hands.ravel(), community_arr]))
+    num_cards = 5 - len(community_arr)
+
+    if num_cards == 0 or num_combinations(len(deck), num_cards) <= exact_threshold:
+        # Runouts that are the same up to suits no known card tells apart are only played once, with a weight
+        runouts, weights = collapse_runouts(deal_runouts(deck, num_cards, exact_threshold),
+                                            list(players_hands) + [community_arr])
+        weights = np.ones(len(runouts), dtype=np.int64) if weights is None else weights
+        return (count_runout_wins(players_hands, community_arr, runouts, weights) / weights.sum(),
+                np.zeros(len(players_hands)), int(weights.sum()))
+
+    seed_seq = np.random.SeedSequence(seed)
+    num_shards = resolve_n_jobs(n_jobs)
+
+    def play(num_games):
+        shard_args = [(players_hands, community_arr, deck, shard_games, shard_seed)
+                      for shard_games, shard_seed in zip(shard_sizes(num_games, num_shards),
+                                                         seed_seq.spawn(num_shards))]
+        return sum(run_shards(play_games, shard_args, n_jobs)), num_games
+
+    if precision is None and time_budget is None:
+        player_wins, num_games = play(num_games)
+        win_rates = player_wins / num_games
+        return win_rates, np.sqrt(win_rates * (1 - win_rates) / num_games), num_games
+
+    start = timeit.default_timer()
+    player_wins, num_games = np.zeros(len(players_hands), dtype=np.int64), 0
+    while True:
+        batch_wins, batch_games = play(BATCH_GAMES * num_shards)
+        player_wins += batch_wins
+        num_games += batch_games
+        win_rates = player_wins / num_games
+        std_errors = np.sqrt(win_rates * (1 - win_rates) / num_games)
+        if ((precision is not None and std_errors.max() <= precision)
+                or (time_budget is not None and timeit.default_timer() - start >= time_budget)
+                or num_games >= MAX_GAMES):
+            return win_rates, std_errors, num_games
+
+
+def play_games(players_hands, community_arr, deck, num_games, seed_seq):
     """
-    Simulates a series of poker games to determine win rates for players based on their initial hands.
+    Plays one shard of sampled games with its own random stream. Module level so worker processes can run it.
 
     Args:
-        card_objects (list[Card]): List of Card objects representing the players' initial hands.
-        num_players (int): Number of players in the game.
+        players_hands (numpy.ndarray): Hole card ids of shape (num_players, 2).
+        community_arr (numpy.ndarray): The community card ids already dealt.
+        deck (numpy.ndarray): Ids of the cards left to deal.
+        num_games (int): Number of games in the shard.
+        seed_seq (numpy.random.SeedSequence): Seed of the shard's random stream.
 
     Returns:
-        list[float]: List of win rates for each player.
+        numpy.ndarray: Number of games won (ties included) by each player.
     """
-    #num_players = int(input("Enter the number of players (1-5): "))
-    #num_players = min(max(num_players, 1), 5)
-    num_players=num_player
-    player_wins = [0] * num_players
-    players_hands = [card_objects[i*2:(i+1)*2] for i in range(num_players)]
-    #for i in range(num_players):
-        #print(f"Define Player {i+1}'s hand:")
-        #players_hands.append([input_card() for _ in range(2)])
+    runouts = deal_boards(deck, 5 - len(community_arr), num_games, np.random.default_rng(seed_seq))
+    return count_runout_wins(players_hands, community_arr, runouts)
 
 
-    for _ in range(10000):
-        deck = [Card(count, color) for color in range(1, 5) for count in range(1, 14)]
-        flat_player_hands = [card for sublist in players_hands for card in sublist]
-        # Remove the specific cards for Player 1 and Player 2 from the deck
-        deck = [card for card in deck if card not in card_objects]
+def count_runout_wins(players_hands, community_arr, runouts, weights=None):
+    """
+    Completes the board with every runout and counts each player's wins.
 
-        # Shuffle the remaining deck
-        random.shuffle(deck)
+    Args:
+        players_hands (numpy.ndarray): Hole card ids of shape (num_players, 2).
+        community_arr (numpy.ndarray): The community card ids already dealt.
+        runouts (numpy.ndarray): The remaining community cards of every game, shape (num_games, 5 - dealt).
+        weights (numpy.ndarray, optional): Number of games each runout stands for, 1 by default.
 
-        # Assign specific hands to Player 1 and Player 2
-        # Assuming the next five cards are community cards
-        community_cards = deck[:5]
-        # Evaluate hands (assuming Ranker.rank_all_hands and related evaluation logic is properly defined)
+    Returns:
+        numpy.ndarray: Number of games won (ties included) by each player.
+    """
+    boards = np.concatenate([np.tile(community_arr, (len(runouts), 1)), runouts], axis=1)
+    return count_wins(players_hands, boards, weights)
 
-        player_hands_with_community = [hand + community_cards for hand in players_hands]
-        player_best_hands = [Ranker.rank_all_hands([hand], return_all=False) for hand in player_hands_with_community]
 
-        # Compare and record results
-        best_hand_score = max(player_best_hands)
-        winners = [score == best_hand_score for score in player_best_hands]
-        for i in range(num_players):
-            if winners[i]:
-                player_wins[i] += 1
-    # Calculate and return win rates and tie rate
-    win_rates = [wins / 10000 for wins in player_wins]
-    return win_rates
+def deal_runouts(deck, num_cards, exact_threshold=EXACT_THRESHOLD, rng=None):
+    """
+    Lists every possible runout of `num_cards` cards from the deck if there are at most `exact_threshold` of them,
+    otherwise samples NUM_GAMES random ones.
 
+    Args:
+        deck (numpy.ndarray): Card ids still in the deck.
+        num_cards (int): Number of cards missing from the board.
+        exact_threshold (int): Largest number of runouts that is enumerated rather than sampled.
+        rng (numpy.random.Generator, optional): Random generator used when sampling.
 
-def simulate_poker_game_with_community_card(card_objects, num_players, community_cards):
+    Returns:
+        numpy.ndarray: Card ids of shape (num_runouts, num_cards), each runout equally likely.
     """
-        Simulates poker games with predefined community cards.
+    if num_cards == 0:
+        return np.zeros(shape=(1, 0), dtype=np.uint8)
+    if num_combinations(len(deck), num_cards) <= exact_threshold:
+        return deck[comb_index(len(deck), num_cards)]
+    return deal_boards(deck, num_cards, NUM_GAMES, rng)
 
-        Args:
-            card_objects (list[Card]): List of Card objects representing the hands of the players.
-            num_players (int): Number of players in the game.
-            community_cards (list[Card]): List of community cards used in the game.
 
-        Returns:
-            list[float]: List of win rates for each player.
+def deal_boards(deck, num_cards, num_games, rng=None):
     """
-    player_wins = [0] * num_players
-    players_hands = [card_objects[i*2:(i+1)*2] for i in range(num_players)]
+    Deals `num_cards` cards without replacement from the deck for every game at once.
 
-    for _ in range(10000):
-        # Create a full deck
-        deck = [Card(count, color) for color in range(1, 5) for count in range(1, 14)]
-        # Remove cards that are already in use (player hands + community cards)
-        flat_player_hands = [card for sublist in players_hands for card in sublist]
-        used_cards = flat_player_hands + community_cards
-        deck = [card for card in deck if card not in used_cards]
+    Runs the first `num_cards` steps of a Fisher-Yates shuffle on all games together, so each step is one
+    vectorized swap instead of a full shuffle per game.
 
-        # Shuffle the remaining deck
-        random.shuffle(deck)
+    Args:
+        deck (numpy.ndarray): Card ids still in the deck.
+        num_cards (int): Number of cards to deal per game.
+        num_games (int): Number of games to deal.
+        rng (numpy.random.Generator, optional): Random generator to draw from. A fresh one is used by default.
 
-        # The community cards are predefined, no need to draw them from the deck
-        player_hands_with_community = [hand + community_cards for hand in players_hands]
-        player_best_hands = [Ranker.rank_all_hands([hand], return_all=False) for hand in player_hands_with_community]
+    Returns:
+        numpy.ndarray: Card ids of shape (num_games, num_cards).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    shuffled = np.tile(deck, (num_games, 1))
+    games = np.arange(num_games)
+    for position in range(num_cards):
+        swap = rng.integers(position, len(deck), size=num_games)
+        picked = shuffled[games, swap]
+        shuffled[games, swap] = shuffled[:, position]
+        shuffled[:, position] = picked
+    return shuffled[:, :num_cards]
+
+
+def count_wins(players_hands, boards, weights=None):
+    """
+    Evaluates every player's hand on every board and counts the games each player wins or ties for the win.
 
-        # Compare and record results
-        best_hand_score = max(player_best_hands)
-        winners = [score == best_hand_score for score in player_best_hands]
-        for i in range(num_players):
-            if winners[i]:
-                player_wins[i] += 1
+    Args:
+        players_hands (numpy.ndarray): Hole card ids of shape (num_players, 2).
+        boards (numpy.ndarray): Complete five-card boards of shape (num_games, 5).
+        weights (numpy.ndarray, optional): Number of games each board stands for, 1 by default.
 
-    # Calculate and return win rates
-    win_rates = [wins / 10000 for wins in player_wins]
-    return win_rates
+    Returns:
+        numpy.ndarray: Number of games won (ties included) by each player.
+    """
+    # Board features are computed once and every player's hole cards are added to them
+    rank_counts, suit_masks = card_features(boards)
+    scores = np.stack([score_features(*add_cards(rank_counts, suit_masks, hand)) for hand in players_hands])
+    if weights is None:
+        return (scores == scores.max(axis=0)).sum(axis=1)
+    return (scores == scores.max(axis=0)) @ weights
 
 
 def create_deck():
@@ -493,11 +555,27 @@ def create_deck():
     return [Card(count, color) for color in range(1, 5) for count in range(1, 14)]
 
 
+def deal_hands(deck, num_cards=5):
+    """
+    Deals hands from a deck to two players.
+
+    Args:
+        deck (list[Card]): A list of Card instances representing a deck.
+        num_cards (int): Number of cards to deal to each player.
+
+    Returns:
+        tuple: Two lists of Card instances representing the hands dealt to each player.
+    """
+    return deck[:num_cards], deck[num_cards:num_cards*2]
+
+
 
 
 
 
 if __name__ == '__main__':
+    from utils import card_name_to_id
+
     # Function to create a deck of 52 cards
     def create_deck():
         return [Card(count, color) for color in range(1, 5) for count in range(1, 14)]
@@ -507,83 +585,16 @@ if __name__ == '__main__':
         random.shuffle(deck)
         return deck
 
-    # Deal hands to two players
-    def deal_hands(deck, num_cards=5):
-        """
-        Deals hands from a deck to two players.
-
-        Args:
-            deck (list[Card]): A list of Card instances representing a deck.
-            num_cards (int): Number of cards to deal to each player.
-
-        Returns:
-            tuple: Two lists of Card instances representing the hands dealt to each player.
-        """
-        return deck[:num_cards], deck[num_cards:num_cards*2]
-
-
-    def convert_to_card(card_string):
-        """
-        Converts a card string in a specific format to a Card object.
-
-        Args:
-            card_string (str): The string representing a card, formatted as 'Rank_of_Suit'.
-
-        Returns:
-            Card: A Card object initialized with the appropriate rank and suit.
-
-        Raises:
-            ValueError: If the input string does not match the expected format or contains invalid values.
-        """
-        # Split the input string assuming the format "Rank of Suit" with spaces
-        parts = card_string.split('_of_')
-        if len(parts) != 2:
-            raise ValueError(f"Invalid card format: '{card_string}'. Expected format is 'Rank of Suit'.")
-
-        rank, suit = parts  # Unpack the parts directly into rank and suit
-
-        # Define mappings for count and color
-        rank_to_count = {
-            '2': 1, '3': 2, '4': 3, '5': 4, '6': 5, '7': 6, '8': 7, '9': 8, '10': 9,
-            'Jack': 10, 'Queen': 11, 'King': 12, 'Ace': 13
-        }
-        suit_to_color = {
-            'Clubs': 1, 'Diamonds': 2, 'Hearts': 3, 'Spades': 4
-        }
-
-        # Convert rank and suit to count and color, checking if they exist in the dictionary
-        try:
-            count = rank_to_count[rank]
-            color = suit_to_color[suit.capitalize()]  # Capitalize to match key names
-        except KeyError:
-            raise ValueError(f"Unknown rank or suit in card: '{card_string}'.")
-
-        # Create a new Card instance
-        return Card(count, color)
-    
-
-    def convert_strings_to_cards(card_strings):
-        """
-        Converts a list of card strings to a list of Card objects.
-
-        Args:
-            card_strings (list[str]): A list of strings each representing a card in the format 'Rank_of_Suit'.
-
-        Returns:
-            list[Card]: A list of Card objects corresponding to the input card strings.
-        """
-        return [convert_to_card(card_string) for card_string in card_strings]
-
 
-    cards = convert_strings_to_cards([
+    cards = [card_name_to_id(card_name) for card_name in [
         "Ace_of_Spades", "Ace_of_Hearts",
         "King_of_Spades", "King_of_Hearts",
         "Queen_of_Spades", "Queen_of_Hearts",
         "Jack_of_Spades", "Jack_of_Hearts",
         "10_of_Spades", "10_of_Hearts"
-    ])
+    ]]
 
-    win_rates = simulate_poker_games(cards)
+    win_rates = simulate_poker_games(cards, 5)
     for i, rate in enumerate(win_rates):
         print(f"Player {i+1} Win Rate: {rate*100:.2f}%")
 
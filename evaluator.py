@@ -0,0 +1,482 @@
+from itertools import combinations, combinations_with_replacement
+
+import numpy as np
+
+
+# Hand scores are packed as category * 16 ** 5 followed by up to five tie breaker ranks (2-14), one per
+# hexadecimal digit, so comparing two scores as integers compares the hands and `score // 16 ** 5` is the
+# hand type used by `hand_type_dict`. Cards are passed around as ids 4 * rank index + suit index, where the
+# rank index runs from 0 (Two) to 12 (Ace) and suits are ordered clubs, diamonds, hearts, spades.
+CATEGORY_BASE = 16 ** 5
+NUM_RANKS = 13
+RANK_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+TIE_BREAKER_LENGTH = {0: 5, 1: 4, 2: 3, 3: 3, 4: 1, 5: 5, 6: 2, 7: 2, 8: 1}
+# Short deck (6+) hands rank a flush above a full house, so the two swap categories, and A-6-7-8-9 is the wheel
+SHORT_TIE_BREAKER_LENGTH = {**TIE_BREAKER_LENGTH, 5: 2, 6: 5}
+SHORT_WHEEL = 0b1000011110000
+# Scores stay below 9 * 16 ** 5, so batches hold them as int32, and card ids as uint8
+SCORE_DTYPE = np.int32
+
+
+def pack_score(category, tie_breakers):
+    """
+    Packs a hand category and its tie breakers into a single comparable integer.
+
+    Args:
+        category (int): The hand type, from 0 (High Card) to 8 (Straight Flush).
+        tie_breakers (list[int]): Card ranks (2-14) in order of importance, at most five of them.
+
+    Returns:
+        int: The packed hand score.
+    """
+    score = category
+    for i in range(5):
+        score = score * 16 + (tie_breakers[i] if i < len(tie_breakers) else 0)
+    return score
+
+
+def unpack_score(score, short_deck=False):
+    """
+    Splits a packed hand score back into its category and tie breakers.
+
+    Args:
+        score (int): A packed hand score.
+        short_deck (bool): Whether the score was packed with short deck (6+) rules, whose flush and full house
+            categories are swapped.
+
+    Returns:
+        tuple: The hand category and the list of tie breaker ranks (2-14) that are relevant to it.
+    """
+    category = int(score) // CATEGORY_BASE
+    tie_breakers = [(int(score) >> (4 * (4 - i))) & 15 for i in range(5)]
+    return category, tie_breakers[:(SHORT_TIE_BREAKER_LENGTH if short_deck else TIE_BREAKER_LENGTH)[category]]
+
+
+def straight_high(rank_mask, short_deck=False):
+    """
+    Finds the highest straight contained in a set of ranks.
+
+    Args:
+        rank_mask (int): 13-bit mask where bit i is set if rank index i (0 = Two, 12 = Ace) is present.
+        short_deck (bool): Use short deck (6+) rules, where the Ace plays below the Six and A-6-7-8-9 is the wheel.
+
+    Returns:
+        int: The rank (2-14) of the straight's top card, 5 (9 in short deck) for the wheel, or 0 if there is no
+            straight.
+    """
+    for top in range(12, 3, -1):
+        window = 0b11111 << (top - 4)
+        if rank_mask & window == window:
+            return top + 2
+    wheel, wheel_high = (SHORT_WHEEL, 9) if short_deck else (0b1000000001111, 5)
+    return wheel_high if rank_mask & wheel == wheel else 0
+
+
+def top_ranks(rank_mask, num_ranks=5):
+    """
+    Lists the highest ranks present in a rank mask.
+
+    Args:
+        rank_mask (int): 13-bit mask of rank indices.
+        num_ranks (int): Maximum number of ranks to return.
+
+    Returns:
+        list[int]: Up to `num_ranks` ranks (2-14) in descending order.
+    """
+    return [rank + 2 for rank in range(12, -1, -1) if rank_mask >> rank & 1][:num_ranks]
+
+
+def pattern_score(rank_counts):
+    """
+    Scores the best hand that can be made from a multiset of ranks, ignoring suits.
+
+    Works for any number of cards from 5 to 7 and covers every category except flushes.
+
+    Args:
+        rank_counts (list[int]): Number of cards held for each rank index (0 = Two, 12 = Ace).
+
+    Returns:
+        int: The packed score of the best non-flush hand.
+    """
+    groups = sorted(((count, rank + 2) for rank, count in enumerate(rank_counts) if count), reverse=True)
+    counts = [count for count, _ in groups] + [0] * 5
+    ranks = [rank for _, rank in groups] + [0] * 5
+
+    if counts[0] == 4:
+        score = pack_score(7, [ranks[0], max(ranks[1:3])])
+    elif counts[0] == 3 and counts[1] >= 2:
+        score = pack_score(6, ranks[:2])
+    elif counts[0] == 3:
+        score = pack_score(3, ranks[:3])
+    elif counts[0] == 2 and counts[1] == 2:
+        score = pack_score(2, [ranks[0], ranks[1], max(ranks[2:4])])
+    elif counts[0] == 2:
+        score = pack_score(1, ranks[:4])
+    else:
+        score = pack_score(0, ranks[:5])
+
+    rank_mask = sum(1 << rank for rank, count in enumerate(rank_counts) if count)
+    high = straight_high(rank_mask)
+    return max(score, pack_score(4, [high])) if high else score
+
+
+def _build_mask_tables(short_deck=False):
+    flush_table = np.zeros(1 << NUM_RANKS, dtype=SCORE_DTYPE)
+    unique_table = np.zeros(1 << NUM_RANKS, dtype=SCORE_DTYPE)
+    straight_table = np.zeros(1 << NUM_RANKS, dtype=SCORE_DTYPE)
+    for rank_mask in range(1 << NUM_RANKS):
+        if bin(rank_mask).count("1") < 5:
+            continue
+        high = straight_high(rank_mask, short_deck)
+        if high:
+            flush_table[rank_mask] = pack_score(8, [high])
+            unique_table[rank_mask] = straight_table[rank_mask] = pack_score(4, [high])
+        else:
+            flush_table[rank_mask] = pack_score(6 if short_deck else 5, top_ranks(rank_mask))
+            unique_table[rank_mask] = pack_score(0, top_ranks(rank_mask))
+    return flush_table, unique_table, straight_table
+
+
+def _build_paired_table():
+    paired_table = {}
+    for ranks in combinations_with_replacement(range(NUM_RANKS), 5):
+        rank_counts = [ranks.count(rank) for rank in range(NUM_RANKS)]
+        if max(rank_counts) == 1 or max(rank_counts) > 4:
+            continue
+        product = 1
+        for rank in ranks:
+            product *= RANK_PRIMES[rank]
+        paired_table[product] = pattern_score(rank_counts)
+    return paired_table
+
+
+# FLUSH_TABLE / UNIQUE_TABLE: best 5-card score for a suited / offsuit set of at least five distinct ranks,
+# indexed by rank mask. STRAIGHT_TABLE: straight score of a rank mask, 0 if it holds no straight. The SHORT_
+# tables follow short deck rules. `score_features` only reads the flush and straight tables, so no short deck
+# UNIQUE_TABLE is kept.
+# PAIRED_TABLE: score of every 5-card rank multiset with a repeated rank, keyed by the product of its rank
+# primes, which is unique per multiset.
+FLUSH_TABLE, UNIQUE_TABLE, STRAIGHT_TABLE = _build_mask_tables()
+SHORT_FLUSH_TABLE, _, SHORT_STRAIGHT_TABLE = _build_mask_tables(short_deck=True)
+PAIRED_TABLE = _build_paired_table()
+PAIRED_PRODUCTS = np.array(sorted(PAIRED_TABLE), dtype=np.int64)
+PAIRED_SCORES = np.array([PAIRED_TABLE[product] for product in PAIRED_PRODUCTS.tolist()], dtype=SCORE_DTYPE)
+_FLUSH_LIST = FLUSH_TABLE.tolist()
+_UNIQUE_LIST = UNIQUE_TABLE.tolist()
+_RANK_BITS = 1 << np.arange(NUM_RANKS, dtype=np.int32)
+_RANK_PRIMES = np.array(RANK_PRIMES, dtype=np.int64)
+_RANK_VALUES = np.arange(2, NUM_RANKS + 2, dtype=np.uint8)
+_CARD_RANK_BIT = [1 << (card_id >> 2) for card_id in range(4 * NUM_RANKS)]
+_CARD_PRIME = [RANK_PRIMES[card_id >> 2] for card_id in range(4 * NUM_RANKS)]
+
+
+def evaluate_five(card_ids):
+    """
+    Scores a 5-card hand with table lookups only.
+
+    Args:
+        card_ids (list[int]): Five card ids, 4 * rank index + suit index.
+
+    Returns:
+        int: The packed hand score.
+    """
+    rank_mask = 0
+    product = 1
+    for card_id in card_ids:
+        rank_mask |= _CARD_RANK_BIT[card_id]
+        product *= _CARD_PRIME[card_id]
+    paired = PAIRED_TABLE.get(product)
+    if paired is not None:
+        return paired
+    if card_ids[0] & 3 == card_ids[1] & 3 == card_ids[2] & 3 == card_ids[3] & 3 == card_ids[4] & 3:
+        return _FLUSH_LIST[rank_mask]
+    return _UNIQUE_LIST[rank_mask]
+
+
+def evaluate_five_batch(card_arr):
+    """
+    Vectorized `evaluate_five` over arrays of 5-card hands of any leading shape.
+
+    Args:
+        card_arr (numpy.ndarray): Card ids of shape (..., 5).
+
+    Returns:
+        numpy.ndarray: The packed score of each hand, shape (...).
+    """
+    ranks = card_arr >> 2
+    suits = card_arr & 3
+    rank_bits = _RANK_BITS[ranks]
+    rank_mask = np.bitwise_or.reduce(rank_bits, axis=-1)
+    unique = rank_bits.sum(axis=-1) == rank_mask
+    flush = (suits == suits[..., :1]).all(axis=-1)
+
+    paired_index = np.searchsorted(PAIRED_PRODUCTS, _RANK_PRIMES[ranks].prod(axis=-1))
+    paired_score = PAIRED_SCORES[np.minimum(paired_index, len(PAIRED_SCORES) - 1)]
+    return np.where(unique, np.where(flush, FLUSH_TABLE[rank_mask], UNIQUE_TABLE[rank_mask]), paired_score)
+
+
+def evaluate_seven(card_ids):
+    """
+    Scores the best 5-card hand out of 5 to 7 cards directly from rank counts and per-suit rank masks,
+    without enumerating 5-card subsets.
+
+    Args:
+        card_ids (list[int]): Five to seven card ids.
+
+    Returns:
+        int: The packed score of the best hand.
+    """
+    rank_counts = [0] * NUM_RANKS
+    suit_masks = [0, 0, 0, 0]
+    for card_id in card_ids:
+        rank_counts[card_id >> 2] += 1
+        suit_masks[card_id & 3] |= _CARD_RANK_BIT[card_id]
+    flush_score = max(_FLUSH_LIST[suit_mask] for suit_mask in suit_masks)
+    return max(flush_score, pattern_score(rank_counts))
+
+
+def card_features(card_arr):
+    """
+    Computes the features hands are scored from: how many cards of each rank a card set holds and the rank mask
+    of each suit. Features of disjoint card sets add up, so a shared board only needs them computed once.
+
+    Args:
+        card_arr (numpy.ndarray): Card ids of shape (N, C).
+
+    Returns:
+        tuple: The uint8 rank counts, shape (N, 13), and the int32 rank mask of each suit, shape (N, 4).
+    """
+    num_sets = len(card_arr)
+    ranks = card_arr >> 2
+    suits = card_arr & 3
+
+    # Histograms over all card sets in one bincount, offsetting every set into its own block of bins
+    rank_bins = (np.arange(num_sets) * NUM_RANKS)[:, None] + ranks
+    rank_counts = np.bincount(rank_bins.ravel(),
+                              minlength=num_sets * NUM_RANKS).reshape(num_sets, NUM_RANKS).astype(np.uint8)
+
+    # Cards are unique, so summing rank bits per suit gives that suit's rank mask
+    suit_bins = (np.arange(num_sets) * 4)[:, None] + suits
+    suit_masks = np.bincount(suit_bins.ravel(), weights=_RANK_BITS[ranks].ravel(),
+                             minlength=num_sets * 4).reshape(num_sets, 4).astype(np.int32)
+    return rank_counts, suit_masks
+
+
+def add_cards(rank_counts, suit_masks, card_ids):
+    """
+    Updates the features of card sets with extra cards, e.g. a player's hole cards added to many boards.
+
+    Args:
+        rank_counts (numpy.ndarray): Rank counts of shape (N, 13), as returned by `card_features`.
+        suit_masks (numpy.ndarray): Suit rank masks of shape (N, 4).
+        card_ids (numpy.ndarray or list[int]): The cards to add, none of which may already be in the sets: the same
+            cards for every set, shape (K,), or each set's own cards, shape (N, K).
+
+    Returns:
+        tuple: The updated rank counts and suit rank masks.
+    """
+    card_ids = np.asarray(card_ids)
+    if card_ids.ndim == 1:
+        card_rank_counts, card_suit_masks = card_features(card_ids.reshape(1, -1))
+        return rank_counts + card_rank_counts, suit_masks | card_suit_masks
+    # Every set gets its own cards, scattered into copies of the features one card column at a time through flat
+    # indices, each set's bins starting at its own offset
+    rank_counts, suit_masks = rank_counts.copy(), suit_masks.copy()
+    sets = np.arange(len(card_ids))
+    for column in card_ids.T:
+        ranks = column >> 2
+        rank_counts.ravel()[sets * NUM_RANKS + ranks] += 1
+        suit_masks.ravel()[sets * 4 + (column & 3)] |= _RANK_BITS[ranks]
+    return rank_counts, suit_masks
+
+
+def score_features(rank_counts, suit_masks, short_deck=False):
+    """
+    Scores the best 5-card hand of card sets of 5 to 7 cards from their features.
+
+    Args:
+        rank_counts (numpy.ndarray): Rank counts of shape (N, 13), as returned by `card_features`.
+        suit_masks (numpy.ndarray): Suit rank masks of shape (N, 4).
+        short_deck (bool): Use short deck (6+) rules, see SHORT_TIE_BREAKER_LENGTH.
+
+    Returns:
+        numpy.ndarray: The packed score of the best hand in each card set, shape (N,).
+    """
+    if short_deck:
+        flush_table, straight_table, full_house = SHORT_FLUSH_TABLE, SHORT_STRAIGHT_TABLE, 5
+    else:
+        flush_table, straight_table, full_house = FLUSH_TABLE, STRAIGHT_TABLE, 6
+    rank_mask = (rank_counts > 0) @ _RANK_BITS
+    flush_score = flush_table[suit_masks].max(axis=1)
+
+    # Order rank groups by (count, rank) descending; only the top five groups can matter. Keys are at most
+    # 4 * 16 + 14, so they are sorted as uint8
+    keys = np.sort(rank_counts * np.uint8(16) + _RANK_VALUES, axis=1)[:, :-6:-1]
+    counts = keys >> 4
+    group_ranks = np.where(counts > 0, keys & 15, 0).astype(SCORE_DTYPE)
+    c0, c1 = counts[:, 0], counts[:, 1]
+    r0, r1, r2, r3, r4 = group_ranks.T
+
+    pattern = np.select(
+        [c0 == 4, (c0 == 3) & (c1 >= 2), c0 == 3, (c0 == 2) & (c1 == 2), c0 == 2],
+        [(7 << 20) | (r0 << 16) | (np.maximum(r1, r2) << 12),
+         (full_house << 20) | (r0 << 16) | (r1 << 12),
+         (3 << 20) | (r0 << 16) | (r1 << 12) | (r2 << 8),
+         (2 << 20) | (r0 << 16) | (r1 << 12) | (np.maximum(r2, r3) << 8),
+         (1 << 20) | (r0 << 16) | (r1 << 12) | (r2 << 8) | (r3 << 4)],
+        (r0 << 16) | (r1 << 12) | (r2 << 8) | (r3 << 4) | r4)
+
+    return np.maximum(np.maximum(pattern, straight_table[rank_mask]), flush_score)
+
+
+def evaluate_seven_batch(card_arr, short_deck=False):
+    """
+    Vectorized `evaluate_seven` over many card sets at once.
+
+    Args:
+        card_arr (numpy.ndarray): Card ids of shape (N, C) with 5 <= C <= 7.
+        short_deck (bool): Use short deck (6+) rules, see SHORT_TIE_BREAKER_LENGTH.
+
+    Returns:
+        numpy.ndarray: The packed score of the best hand in each card set, shape (N,).
+    """
+    return score_features(*card_features(card_arr), short_deck)
+
+
+# Omaha hands are exactly two hole cards and three board cards. Without a flush, a five-card score only depends on
+# the rank multisets of the board triple and the hole pair, so it is read from a table indexed by both multisets.
+# A flush needs a suited triple and a suited pair of the same suit and is scored from their joint rank mask. Board
+# triples are summarized once per board and hole pairs once per player, so no five-card hand is ever built.
+#
+# Eight-or-better low scores are LOW_BASE minus the five low card values (Ace = 1 to Eight = 8) packed highest
+# first, so a better (lower) low has a higher score, and 0 means no qualifying low. They only depend on ranks, so
+# OMAHA_LOW_TABLE shares the indexing of OMAHA_RANK_TABLE.
+LOW_BASE = 16 ** 5
+
+
+def _multiset_indices(size):
+    # Number every rank multiset of `size` cards and map every ordered rank tuple (as a base-13 number) to it
+    multisets = list(combinations_with_replacement(range(NUM_RANKS), size))
+    number = {ranks: index for index, ranks in enumerate(multisets)}
+    ordered = np.zeros(NUM_RANKS ** size, dtype=np.int32)
+    for code in range(NUM_RANKS ** size):
+        ranks = [code // NUM_RANKS ** position % NUM_RANKS for position in range(size)]
+        ordered[code] = number[tuple(sorted(ranks))]
+    return np.array(multisets), ordered
+
+
+def _omaha_table_ranks():
+    # The five ranks behind every row of the Omaha tables, triple multisets major and pair multisets minor
+    return np.concatenate([np.repeat(TRIPLE_MULTISETS, len(PAIR_MULTISETS), axis=0),
+                           np.tile(PAIR_MULTISETS, (len(TRIPLE_MULTISETS), 1))], axis=1)
+
+
+def _build_omaha_rank_table():
+    ranks = _omaha_table_ranks()
+    rank_bits = _RANK_BITS[ranks]
+    rank_mask = np.bitwise_or.reduce(rank_bits, axis=1)
+    rank_counts = (ranks[:, :, None] == np.arange(NUM_RANKS)).sum(axis=1)
+    paired_index = np.searchsorted(PAIRED_PRODUCTS, _RANK_PRIMES[ranks].prod(axis=1))
+    paired_score = PAIRED_SCORES[np.minimum(paired_index, len(PAIRED_SCORES) - 1)]
+    table = np.where(rank_bits.sum(axis=1) == rank_mask, UNIQUE_TABLE[rank_mask], paired_score)
+    # Five cards of one rank cannot be dealt
+    return np.where(rank_counts.max(axis=1) > 4, 0, table).astype(SCORE_DTYPE)
+
+
+def _build_omaha_low_table():
+    ranks = _omaha_table_ranks()
+    # Aces play low, so rank index 12 counts as 1 and rank index r <= 6 (Two to Eight) as r + 2
+    low_values = np.where(ranks == NUM_RANKS - 1, 1, ranks + 2)
+    qualifies = (((ranks <= 6) | (ranks == NUM_RANKS - 1)).all(axis=1)
+                 & (np.bitwise_or.reduce(_RANK_BITS[ranks], axis=1) == _RANK_BITS[ranks].sum(axis=1)))
+    packed = np.sort(low_values, axis=1)[:, ::-1] @ (16 ** np.arange(4, -1, -1))
+    return np.where(qualifies, LOW_BASE - packed, 0).astype(SCORE_DTYPE)
+
+
+TRIPLE_MULTISETS, _TRIPLE_INDEX = _multiset_indices(3)
+PAIR_MULTISETS, _PAIR_INDEX = _multiset_indices(2)
+# OMAHA_RANK_TABLE / OMAHA_LOW_TABLE[triple multiset * len(PAIR_MULTISETS) + pair multiset]: non-flush high
+# score / low score of the five cards
+OMAHA_RANK_TABLE = _build_omaha_rank_table()
+OMAHA_LOW_TABLE = _build_omaha_low_table()
+# Suit of a card subset whose cards do not all share a suit, never equal to a real suit
+MIXED_SUITS = 4
+
+
+def subset_features(card_arr):
+    """
+    Computes what Omaha scoring needs to know about board triples or hole pairs.
+
+    Args:
+        card_arr (numpy.ndarray): Card ids of shape (..., k) with k = 3 (triples) or k = 2 (pairs).
+
+    Returns:
+        tuple: The rank multiset index, the rank mask and the suit shared by every card (MIXED_SUITS if suits are
+            mixed) of each subset, each of shape (...).
+    """
+    ranks = (card_arr >> 2).astype(np.int32)
+    suits = card_arr & 3
+    code = ranks[..., 0]
+    for position in range(1, card_arr.shape[-1]):
+        code = code + ranks[..., position] * NUM_RANKS ** position
+    multiset = (_TRIPLE_INDEX if card_arr.shape[-1] == 3 else _PAIR_INDEX)[code]
+    rank_mask = np.bitwise_or.reduce(_RANK_BITS[ranks], axis=-1)
+    suit = np.where((suits == suits[..., :1]).all(axis=-1), suits[..., 0], MIXED_SUITS)
+    return multiset, rank_mask, suit
+
+
+def omaha_board_features(boards):
+    """
+    Computes the features of every three-card subset of every board, shared by every player.
+
+    Args:
+        boards (numpy.ndarray): Board card ids of shape (N, C) with 3 <= C <= 5.
+
+    Returns:
+        tuple: The features of `subset_features`, each of shape (N, C choose 3), the multiset indices already
+            scaled to rows of OMAHA_RANK_TABLE.
+    """
+    triples = np.array(list(combinations(range(boards.shape[1]), 3)))
+    multiset, rank_mask, suit = subset_features(boards[:, triples])
+    return multiset * len(PAIR_MULTISETS), rank_mask, suit
+
+
+def score_omaha(board_features, hole_cards, low=False):
+    """
+    Scores the best Omaha hand of the same hole cards on many boards, using exactly two hole cards and three board
+    cards, by combining board triple features with the features of every hole pair.
+
+    Args:
+        board_features (tuple): Board triple features as returned by `omaha_board_features`.
+        hole_cards (numpy.ndarray): The player's hole card ids, at least two of them: the same cards on every board,
+            shape (H,), or the cards held on each board, shape (N, H).
+        low (bool): Also score the best eight-or-better low, read with the same indices as the high hands.
+
+    Returns:
+        numpy.ndarray: The best packed score on each board, shape (N,), followed by the best low score (0 if
+            there is no qualifying low) if `low`.
+    """
+    triple_rows, triple_masks, triple_suits = board_features
+    hole_cards = np.asarray(hole_cards)
+    pairs = np.array(list(combinations(range(hole_cards.shape[-1]), 2)))
+    # Each pair's features, of shape (1,) or (N, 1) so that they broadcast over the board triples
+    pair_features = [np.expand_dims(features, -1) for features in subset_features(hole_cards[..., pairs])]
+
+    best = np.zeros(len(triple_rows), dtype=SCORE_DTYPE)
+    best_low = np.zeros(len(triple_rows), dtype=SCORE_DTYPE)
+    for pair_multiset, pair_mask, pair_suit in zip(*(np.moveaxis(features, -2, 0) for features in pair_features)):
+        rows = triple_rows + pair_multiset
+        scores = OMAHA_RANK_TABLE[rows]
+        suited = pair_suit != MIXED_SUITS
+        if suited.any():
+            # A flush always beats the straight or high card the same five ranks make otherwise
+            flush = triple_suits == pair_suit
+            if hole_cards.ndim == 1:
+                scores[flush] = FLUSH_TABLE[triple_masks[flush] | pair_mask]
+            else:
+                flush &= suited
+                scores[flush] = FLUSH_TABLE[triple_masks[flush] | np.broadcast_to(pair_mask, flush.shape)[flush]]
+        best = np.maximum(best, scores.max(axis=1))
+        if low:
+            best_low = np.maximum(best_low, OMAHA_LOW_TABLE[rows].max(axis=1))
+    return (best, best_low) if low else best
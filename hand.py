@@ -10,7 +10,9 @@ class Hand:
 
     Attributes:
         hand_limit (int): The maximum number of cards that can be held in the hand.
-        card_arr (numpy.ndarray): An array to store card data using integer representations.
+        short_deck (bool): Whether hands are ranked with short deck (6+) rules.
+        card_mask (int): 52-bit mask of the cards in the hand, bit i being set if card id i is held.
+        card_arr (numpy.ndarray): A uint8 array of the card ids in the hand, in the order they were added.
 
     Methods:
         add_cards(cards): Adds cards to the hand and checks for the hand limit.
@@ -19,32 +21,59 @@ class Hand:
         hand_value(community_arr): Calculates the value of the hand with possible combinations.
     """
 
-    def __init__(self, hand_limit=2):
+    def __init__(self, hand_limit=2, short_deck=False):
         """
         Initializes a Hand object with a specified limit for the number of cards.
 
         Args:
             hand_limit (int, optional): The maximum number of cards the hand can hold. Defaults to 2.
+            short_deck (bool, optional): Rank the hand with short deck (6+) rules, where a flush beats a full house
+                and A-6-7-8-9 is the lowest straight. Only two-card hands support it. Defaults to False.
+
+        Raises:
+            HandException: If short deck rules are asked for a hand of more than two cards.
         """
+        if short_deck and hand_limit != 2:
+            raise HandException(f"Short deck rules only rank two-card hands, not {hand_limit}-card hands")
         self.hand_limit = hand_limit
-        self.card_arr = np.zeros(shape=(0, hand_limit), dtype=np.int32)
+        self.short_deck = short_deck
+        self.card_mask = 0
+        self._card_ids = []
+        self._card_arr = None
+
+    @property
+    def card_arr(self):
+        """
+        numpy.ndarray: A uint8 array of the card ids in the hand, only rebuilt after the hand changes.
+        """
+        if self._card_arr is None:
+            self._card_arr = np.array(self._card_ids, dtype=np.uint8)
+        return self._card_arr
+
+    def __contains__(self, card):
+        return bool(self.card_mask & card_bit(card))
 
     def add_cards(self, cards):
         """
-        Adds a list of cards to the hand, formatted as integers. Raises an exception if the limit is exceeded.
+        Adds a list of cards to the hand, given as card ids or strings. Raises an exception if the limit is exceeded.
 
         Args:
-            cards (list[int]): A list of cards to add to the hand.
+            cards (list[int] or list[str]): A list of cards to add to the hand.
 
         Raises:
-            HandException: If adding the cards would exceed the hand limit.
+            HandException: If a card is already in the hand or adding the cards would exceed the hand limit.
         """
         cards = format_cards(cards)
 
         for card in cards:
-            self.card_arr = add_card(card, self.card_arr)
-
-        if len(self.card_arr) > self.hand_limit:
+            card_id = card_to_id(card)
+            if self.card_mask & 1 << card_id:
+                raise HandException(f"Card {card_arr_to_str([card_id])[0]} is already added")
+            self.card_mask |= 1 << card_id
+            self._card_ids.append(card_id)
+            self._card_arr = None
+
+        if len(self._card_ids) > self.hand_limit:
             raise HandException(f"Cannot Have more than {self.hand_limit} cards in hand")
 
     def remove_cards(self, cards):
@@ -52,12 +81,20 @@ class Hand:
         Removes a list of cards from the hand.
 
         Args:
-            cards (list[int]): A list of cards to remove from the hand.
+            cards (list[int] or list[str]): A list of cards to remove from the hand.
+
+        Raises:
+            DeckException: If a card is not in the hand.
         """
         cards = format_cards(cards)
 
         for card in cards:
-            self.card_arr = remove_card(card, self.card_arr)
+            card_id = card_to_id(card)
+            if not self.card_mask & 1 << card_id:
+                raise DeckException(f"Card {card_arr_to_str([card_id])[0]} is not in the Deck")
+            self.card_mask &= ~(1 << card_id)
+            self._card_ids.remove(card_id)
+            self._card_arr = None
 
     def hand_evaluation(self, community_arr):
         """
@@ -69,19 +106,21 @@ class Hand:
         Returns:
             str: The description of the best hand possible with the hand and community cards.
         """
-        all_combos, res_arr = self.hand_value(community_arr)
-        return hand_type_dict[np.max(res_arr) // 16 ** 5] + ' ' + ' '.join(
-            card_arr_to_str(all_combos[0, np.argmax(res_arr), :, :]))
+        score = self.hand_value(community_arr)
+        all_combos = self.hand_combos(community_arr)[0]
+        best_combo = all_combos[np.argmax(Ranker.rank_seven_cards(all_combos, self.short_deck) == score)]
+        hand_types = short_hand_type_dict if self.short_deck else hand_type_dict
+        return hand_types[score // 16 ** 5] + ' ' + ' '.join(card_arr_to_str(best_combo))
 
     def hand_value(self, community_arr):
         """
-        Calculates the value of all possible hand combinations with the community cards.
+        Calculates the value of the best hand that can be made with the community cards.
 
         Args:
             community_arr (numpy.ndarray): An array of community cards.
 
         Returns:
-            tuple: A tuple containing arrays of all combinations and their respective evaluations.
+            int: The packed score of the best hand.
 
         Raises:
             HandException: If not enough community cards are provided to form a valid hand.
@@ -90,15 +129,29 @@ class Hand:
             raise HandException("No valid hand has formed.")
         if self.hand_limit == 2:
             player_valid_hand = np.concatenate([self.card_arr, community_arr], axis=0)
-            all_combos = np.expand_dims(player_valid_hand, axis=0)[:, comb_index(len(player_valid_hand), 5), :]
-        else:
-            community_combos = np.expand_dims(community_arr, axis=0)[:, comb_index(len(community_arr), 3), :]
-            hand_combos = np.expand_dims(self.card_arr, axis=0)[:, comb_index(4, 2), :]
-            all_combos = np.concatenate(
-                [np.repeat(hand_combos, repeats=num_combinations(len(community_arr), 3), axis=1),
-                 np.concatenate(6 * [community_combos], axis=1)], axis=2)
-        res_arr = Ranker.rank_all_hands(all_combos, return_all=True)
-        return all_combos, res_arr
+            return int(Ranker.rank_seven_cards(np.expand_dims(player_valid_hand, axis=0), self.short_deck)[0])
+        board_features = Ranker.omaha_board_features(np.expand_dims(community_arr, axis=0))
+        return int(Ranker.rank_omaha_hole_cards(board_features, self.card_arr)[0])
+
+    def hand_combos(self, community_arr):
+        """
+        Lists every valid five-card combination of the hand and the community cards: any five of them for a two-card
+        hand, otherwise (Omaha) exactly two hole cards with three community cards.
+
+        Args:
+            community_arr (numpy.ndarray): An array of community cards.
+
+        Returns:
+            numpy.ndarray: Array of shape (1, K, 5) holding the K valid combinations of card ids.
+        """
+        if self.hand_limit == 2:
+            player_valid_hand = np.concatenate([self.card_arr, community_arr], axis=0)
+            return np.expand_dims(player_valid_hand, axis=0)[:, comb_index(len(player_valid_hand), 5)]
+        community_combos = np.expand_dims(community_arr, axis=0)[:, comb_index(len(community_arr), 3)]
+        hand_combos = np.expand_dims(self.card_arr, axis=0)[:, comb_index(len(self.card_arr), 2)]
+        return np.concatenate(
+            [np.repeat(hand_combos, repeats=num_combinations(len(community_arr), 3), axis=1),
+             np.concatenate(num_combinations(len(self.card_arr), 2) * [community_combos], axis=1)], axis=2)
 
     def __str__(self):
         """
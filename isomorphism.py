@@ -0,0 +1,118 @@
+from itertools import permutations
+
+import numpy as np
+
+
+# A suit map is a tuple where suit_map[suit] is the suit it is relabelled to. Relabelling suits never changes who
+# wins a spot, so every spot only needs to be solved once per class of spots that are the same up to suits.
+SUIT_MAPS = list(permutations(range(4)))
+_CARD_MAPS = {suit_map: np.array([card_id - (card_id & 3) + suit_map[card_id & 3] for card_id in range(52)],
+                                 dtype=np.uint8)
+              for suit_map in SUIT_MAPS}
+
+
+def permute_suits(card_arr, suit_map):
+    """
+    Relabels the suits of cards.
+
+    Args:
+        card_arr (numpy.ndarray or list[int]): Card ids of any shape.
+        suit_map (tuple[int]): The suit each suit is relabelled to.
+
+    Returns:
+        numpy.ndarray: The relabelled card ids, same shape.
+    """
+    return _CARD_MAPS[tuple(suit_map)][np.asarray(card_arr, dtype=np.int64)]
+
+
+def invert_suit_map(suit_map):
+    """
+    Finds the suit map undoing `suit_map`.
+
+    Args:
+        suit_map (tuple[int]): The suit each suit is relabelled to.
+
+    Returns:
+        tuple[int]: The inverse suit map.
+    """
+    inverse = [0] * 4
+    for suit, new_suit in enumerate(suit_map):
+        inverse[new_suit] = suit
+    return tuple(inverse)
+
+
+def canonicalize(card_groups):
+    """
+    Relabels suits so that every spot that only differs by a permutation of suits gets the same canonical form.
+
+    Args:
+        card_groups (list): Ordered groups of card ids, e.g. each player's hole cards followed by the board. The
+            order of the groups matters, the order of the cards within a group does not.
+
+    Returns:
+        tuple: The canonical groups, as a tuple of sorted tuples of card ids, and the suit map that produced them.
+    """
+    card_groups = [[int(card_id) for card_id in group] for group in card_groups]
+    best_groups, best_map = None, None
+    for suit_map in SUIT_MAPS:
+        card_map = _CARD_MAPS[suit_map]
+        groups = tuple(tuple(sorted(int(card_map[card_id]) for card_id in group)) for group in card_groups)
+        if best_groups is None or groups < best_groups:
+            best_groups, best_map = groups, suit_map
+    return best_groups, best_map
+
+
+def restore(canonical_groups, suit_map):
+    """
+    Maps canonical card groups back to the original suits.
+
+    Args:
+        canonical_groups (tuple): Groups of card ids as returned by `canonicalize`.
+        suit_map (tuple[int]): The suit map returned along with them.
+
+    Returns:
+        list[list[int]]: The groups with their original suits.
+    """
+    card_map = _CARD_MAPS[invert_suit_map(suit_map)]
+    return [[int(card_map[card_id]) for card_id in group] for group in canonical_groups]
+
+
+def stabilizer(card_groups):
+    """
+    Lists the suit maps that leave every group of cards unchanged, such as swapping two suits no one holds.
+
+    Args:
+        card_groups (list): Groups of card ids, e.g. each player's hole cards and the board.
+
+    Returns:
+        list[tuple[int]]: The suit maps, always including the identity.
+    """
+    card_sets = [set(int(card_id) for card_id in group) for group in card_groups]
+    return [suit_map for suit_map in SUIT_MAPS
+            if all(set(_CARD_MAPS[suit_map][list(cards)].tolist()) == cards for cards in card_sets if cards)]
+
+
+def collapse_runouts(runouts, card_groups):
+    """
+    Keeps one runout per class of runouts that are the same up to the suit maps leaving the known cards unchanged,
+    weighted by the size of its class.
+
+    Args:
+        runouts (numpy.ndarray): Every runout, card ids of shape (num_runouts, num_cards).
+        card_groups (list): The known groups of cards, e.g. each player's hole cards and the board.
+
+    Returns:
+        tuple: The distinct runouts and how many runouts each one stands for, or the runouts unchanged and None if
+            no suit map other than the identity applies.
+    """
+    suit_maps = stabilizer(card_groups)
+    if len(suit_maps) == 1 or runouts.shape[1] == 0:
+        return runouts, None
+
+    place_values = 52 ** np.arange(runouts.shape[1] - 1, -1, -1, dtype=np.int64)
+    codes = None
+    for suit_map in suit_maps:
+        mapped_code = np.sort(_CARD_MAPS[suit_map][runouts], axis=1).astype(np.int64) @ place_values
+        codes = mapped_code if codes is None else np.minimum(codes, mapped_code)
+    _, first_idx, counts = np.unique(codes, return_index=True, return_counts=True)
+    return runouts[first_idx], counts
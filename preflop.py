@@ -0,0 +1,294 @@
+import argparse
+import os
+
+import numpy as np
+
+from evaluator import SCORE_DTYPE, evaluate_seven_batch
+from isomorphism import collapse_runouts
+from utils import comb_index, num_combinations, resolve_n_jobs, run_shards, shard_sizes
+
+
+# Heads-up preflop equities are stored per pair of starting-hand classes (13 x 13 grid: pairs on the diagonal,
+# suited hands above it, offsuit hands below it) and per suit pattern, which tells how the suits of the two hands
+# relate to each other and is what separates e.g. AhKh vs QhJh from AhKh vs QsJs. The last axis holds the first
+# player's win rate, the tie rate and the number of boards each matchup was evaluated on.
+PREFLOP_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preflop_equity.npy")
+NUM_CLASSES = 169
+NUM_SUIT_PATTERNS = 15
+EXACT_BOARDS = num_combinations(48, 5)
+# Boards are compared against every pair of hands this many at a time, bounding memory to ~30 MB per chunk
+BOARD_CHUNK = 16
+
+
+def _suit_pattern_codes():
+    # Relabel the suits of (hand a high, hand a low, hand b high, hand b low) in order of first appearance and number
+    # the resulting 15 patterns, for every 4-suit code s0 * 64 + s1 * 16 + s2 * 4 + s3
+    patterns = {}
+    codes = np.zeros(256, dtype=np.int64)
+    for code in range(256):
+        suits = [(code >> shift) & 3 for shift in (6, 4, 2, 0)]
+        labels = {}
+        pattern = tuple(labels.setdefault(suit, len(labels)) for suit in suits)
+        codes[code] = patterns.setdefault(pattern, len(patterns))
+    return codes
+
+
+_PATTERN_CODES = _suit_pattern_codes()
+_loaded_tables = {}
+
+
+def _pattern_index(suits_a, suits_b, pair_a, pair_b):
+    # The two cards of a pair have no rank order, so take the smallest pattern over both orders of their suits. That
+    # gives matchups that are the same up to suits the same pattern, and the table one cell per class of matchups.
+    best = None
+    for swap_a in (False, True):
+        for swap_b in (False, True):
+            high_a, low_a = suits_a[::-1] if swap_a else suits_a
+            high_b, low_b = suits_b[::-1] if swap_b else suits_b
+            pattern = _PATTERN_CODES[high_a * 64 + low_a * 16 + high_b * 4 + low_b]
+            pattern = np.where((pair_a | (not swap_a)) & (pair_b | (not swap_b)), pattern, NUM_SUIT_PATTERNS)
+            best = pattern if best is None else np.minimum(best, pattern)
+    return best
+
+
+def order_hand(hand):
+    """
+    Orders two hole cards by rank, highest first, then by suit, which is the order suit patterns are read in.
+
+    Args:
+        hand (list[int]): Two card ids.
+
+    Returns:
+        list[int]: The same card ids, ordered.
+    """
+    return sorted((int(card_id) for card_id in hand), key=lambda card_id: (-(card_id >> 2), card_id & 3))
+
+
+def hand_class(hand):
+    """
+    Finds the starting-hand class of two hole cards.
+
+    Args:
+        hand (list[int]): Two card ids.
+
+    Returns:
+        int: The class index (0-168), high rank * 13 + low rank for suited hands and low rank * 13 + high rank for
+            offsuit hands and pairs.
+    """
+    high, low = order_hand(hand)
+    if high & 3 == low & 3:
+        return (high >> 2) * 13 + (low >> 2)
+    return (low >> 2) * 13 + (high >> 2)
+
+
+def suit_pattern(hand_a, hand_b):
+    """
+    Numbers the way the suits of two hands relate to each other.
+
+    Args:
+        hand_a (list[int]): The first player's two card ids.
+        hand_b (list[int]): The second player's two card ids.
+
+    Returns:
+        int: The suit pattern index (0-14).
+    """
+    hand_a, hand_b = order_hand(hand_a), order_hand(hand_b)
+    return int(_pattern_index([card_id & 3 for card_id in hand_a], [card_id & 3 for card_id in hand_b],
+                              hand_a[0] >> 2 == hand_a[1] >> 2, hand_b[0] >> 2 == hand_b[1] >> 2))
+
+
+def _all_hands():
+    hands = np.array([order_hand(hand) for hand in comb_index(52, 2)], dtype=np.uint8)
+    classes = np.array([hand_class(hand) for hand in hands], dtype=np.int64)
+    masks = (np.uint64(1) << hands[:, 0].astype(np.uint64)) | (np.uint64(1) << hands[:, 1].astype(np.uint64))
+    return hands, classes, masks
+
+
+# Every starting hand, its class and its 52-bit card mask
+_HANDS, _HAND_CLASSES, _HAND_MASKS = _all_hands()
+
+
+def count_board_outcomes(boards, weights=None):
+    """
+    Plays every pair of starting hands on every given board that shares no card with them.
+
+    Args:
+        boards (numpy.ndarray): Five-card boards of shape (num_boards, 5).
+        weights (numpy.ndarray, optional): How many boards each board stands for, 1 each by default.
+
+    Returns:
+        tuple: Matrices of shape (1326, 1326) counting, for every first and second hand, the boards won by the first
+            hand, the tied boards and the boards played.
+    """
+    weights = np.ones(len(boards), dtype=np.int64) if weights is None else weights
+    hands, hand_masks = _HANDS, _HAND_MASKS
+    num_hands = len(hands)
+    wins = np.zeros((num_hands, num_hands), dtype=np.int64)
+    ties = np.zeros((num_hands, num_hands), dtype=np.int64)
+    played = np.zeros((num_hands, num_hands), dtype=np.int64)
+
+    for start in range(0, len(boards), BOARD_CHUNK):
+        chunk = boards[start:start + BOARD_CHUNK]
+        board_masks = np.bitwise_or.reduce(np.uint64(1) << chunk.astype(np.uint64), axis=1)
+        valid = (board_masks[:, None] & hand_masks) == 0
+        cards = np.concatenate([np.broadcast_to(chunk[:, None, :], (len(chunk), num_hands, 5)),
+                                np.broadcast_to(hands, (len(chunk), num_hands, 2))], axis=2)
+        scores = np.zeros((len(chunk), num_hands), dtype=SCORE_DTYPE)
+        scores[valid] = evaluate_seven_batch(cards[valid])
+
+        both = valid[:, :, None] & valid[:, None, :]
+        chunk_weights = weights[start:start + BOARD_CHUNK]
+        wins += np.einsum('b,bij->ij', chunk_weights, both & (scores[:, :, None] > scores[:, None, :]))
+        ties += np.einsum('b,bij->ij', chunk_weights, both & (scores[:, :, None] == scores[:, None, :]))
+        played += np.einsum('b,bij->ij', chunk_weights, both)
+    return wins, ties, played
+
+
+def canonical_boards():
+    """
+    Lists one board per class of boards that are the same up to suits, with the size of its class.
+
+    Every matchup cell of the preflop table holds all the matchups that are the same up to suits, so every board of
+    a class adds the same counts to a cell, and playing one board per class weighted by its size gives the exact
+    counts of playing all C(52, 5) boards.
+
+    Returns:
+        tuple: The 134,459 canonical boards, shape (num_classes, 5), and how many boards each one stands for.
+    """
+    return collapse_runouts(comb_index(52, 5).astype(np.uint8), [])
+
+
+def _count_shard(boards, weights, num_boards, seed_seq):
+    if boards is None:
+        rng = np.random.default_rng(seed_seq)
+        boards = np.argpartition(rng.random((num_boards, 52)), 5, axis=1)[:, :5].astype(np.uint8)
+    return count_board_outcomes(boards, weights)
+
+
+def build_preflop_table(num_boards=None, n_jobs=1, seed=None):
+    """
+    Computes the heads-up equity of every pair of starting-hand classes and suit patterns.
+
+    Every board is shared by all the matchups it does not conflict with, so enumerating every board gives the exact
+    equities. Only one board per class of boards that are the same up to suits is played (see `canonical_boards`),
+    which takes under half an hour on one core, and `num_boards` trades it for a sampled table built in seconds.
+
+    Args:
+        num_boards (int, optional): Number of random boards to sample. All boards are enumerated if None.
+        n_jobs (int): Number of worker processes the boards are sharded across, -1 for one per CPU core.
+        seed (int, optional): Seed of the sampled boards.
+
+    Returns:
+        numpy.ndarray: Table of shape (169, 169, 15, 3) holding the first hand's win rate, the tie rate and the
+            number of boards per matchup, NaN for impossible matchups.
+    """
+    num_shards = resolve_n_jobs(n_jobs)
+    if num_boards is None:
+        boards, weights = canonical_boards()
+        bounds = np.cumsum([0] + shard_sizes(len(boards), num_shards))
+        shard_args = [(boards[bounds[shard]:bounds[shard + 1]], weights[bounds[shard]:bounds[shard + 1]], None, None)
+                      for shard in range(num_shards)]
+    else:
+        shard_args = [(None, None, shard_boards, shard_seed) for shard_boards, shard_seed in
+                      zip(shard_sizes(num_boards, num_shards), np.random.SeedSequence(seed).spawn(num_shards))]
+    shard_counts = run_shards(_count_shard, shard_args, n_jobs)
+    return pool_matchups(*(sum(counts) for counts in zip(*shard_counts)))
+
+
+def pool_matchups(wins, ties, played):
+    """
+    Pools the board counts of every pair of starting hands into the cells of the preflop table.
+
+    Args:
+        wins (numpy.ndarray): Boards won by the first hand, as returned by `count_board_outcomes`.
+        ties (numpy.ndarray): Tied boards.
+        played (numpy.ndarray): Boards played.
+
+    Returns:
+        numpy.ndarray: Table of shape (169, 169, 15, 3), as returned by `build_preflop_table`.
+    """
+    # Matchups that only differ by a relabelling of suits share a class pair and suit pattern, so pool them
+    hands, classes, hand_masks = _HANDS, _HAND_CLASSES, _HAND_MASKS
+    first, second = np.nonzero((hand_masks[:, None] & hand_masks) == 0)
+    suits = (hands & 3).astype(np.int64)
+    pairs = hands[:, 0] >> 2 == hands[:, 1] >> 2
+    patterns = _pattern_index(suits[first].T, suits[second].T, pairs[first], pairs[second])
+    cells = (classes[first] * NUM_CLASSES + classes[second]) * NUM_SUIT_PATTERNS + patterns
+
+    size = NUM_CLASSES * NUM_CLASSES * NUM_SUIT_PATTERNS
+    matchups = np.bincount(cells, minlength=size)
+    win_sum = np.bincount(cells, weights=wins[first, second], minlength=size)
+    tie_sum = np.bincount(cells, weights=ties[first, second], minlength=size)
+    played_sum = np.bincount(cells, weights=played[first, second], minlength=size)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table = np.stack([win_sum / played_sum, tie_sum / played_sum, played_sum / matchups], axis=1)
+    table[played_sum == 0] = np.nan
+    return table.reshape(NUM_CLASSES, NUM_CLASSES, NUM_SUIT_PATTERNS, 3).astype(np.float32)
+
+
+def load_preflop_table(path=None):
+    """
+    Memory-maps a preflop equity table built by `build_preflop_table`, once per path.
+
+    Args:
+        path (str, optional): Location of the .npy table, PREFLOP_TABLE_PATH by default.
+
+    Returns:
+        numpy.ndarray: The read-only table, or None if it has not been built.
+    """
+    path = PREFLOP_TABLE_PATH if path is None else path
+    if path not in _loaded_tables:
+        if not os.path.exists(path):
+            return None
+        _loaded_tables[path] = np.load(path, mmap_mode='r')
+    return _loaded_tables[path]
+
+
+def preflop_equity(hand_a, hand_b, path=None):
+    """
+    Looks up the heads-up preflop equity of two starting hands.
+
+    Args:
+        hand_a (list[int]): The first player's two card ids.
+        hand_b (list[int]): The second player's two card ids.
+        path (str, optional): Location of the .npy table, PREFLOP_TABLE_PATH by default.
+
+    Returns:
+        tuple: The first player's win rate, the tie rate and the number of boards they were computed on, or None if
+            no table has been built or it does not cover the matchup.
+    """
+    table = load_preflop_table(path)
+    if table is None:
+        return None
+    win, tie, num_boards = table[hand_class(hand_a), hand_class(hand_b), suit_pattern(hand_a, hand_b)].tolist()
+    if np.isnan(win):
+        return None
+    return win, tie, num_boards
+
+
+def equity_error(rate, num_boards):
+    """
+    Standard error of a rate read from the preflop table, 0 if the table was built exactly.
+
+    Args:
+        rate (float): A win or tie rate.
+        num_boards (float): Number of boards the rate was computed on.
+
+    Returns:
+        float: The standard error of the rate.
+    """
+    if num_boards >= EXACT_BOARDS:
+        return 0.0
+    return float(np.sqrt(rate * (1 - rate) / num_boards))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the heads-up preflop equity table.")
+    parser.add_argument("--boards", type=int, default=None,
+                        help="Number of random boards to sample (default: enumerate all boards exactly)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Number of worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the sampled boards")
+    parser.add_argument("--output", default=PREFLOP_TABLE_PATH, help="Where to write the .npy table")
+    args = parser.parse_args()
+    np.save(args.output, build_preflop_table(args.boards, args.n_jobs, args.seed))
@@ -1,6 +1,6 @@
-
 import numpy as np
-from card import Card
+from evaluator import add_cards, card_features, evaluate_five, evaluate_five_batch, evaluate_seven_batch, omaha_board_features, \
+    score_features, score_omaha
 
 class Ranker:
     @staticmethod
@@ -9,197 +9,104 @@ class Ranker:
         Evaluates all combinations of hands provided and ranks them. Can return all rankings or only the highest one.
 
         Args:
-            hand_combos (list[list[Card]]): A list containing lists of Card objects, each list representing a hand.
-            return_all (bool): If True, returns a list of all rankings. If False, returns only the highest ranked hand.
+            hand_combos (numpy.ndarray): Array of shape (N, K, 5) holding K five-card combinations of card ids for each
+                of N scenarios.
+            return_all (bool): If True, returns the score of every combination. If False, returns only the highest score
+                of each scenario.
 
         Returns:
-            list or tuple: Depending on 'return_all', a list of all rankings or a tuple for the highest ranked hand.
+            numpy.ndarray: Scores of shape (N, K) if 'return_all', otherwise the best score of each scenario, shape
+                (N,).
         """
-        rank_res_arr = np.zeros(shape=(len(hand_combos), len(hand_combos[0])))
-        for i, hand in enumerate(hand_combos):
-            for j, card_combo in enumerate(hand):
-                rank_res_arr[i, j] = Ranker.rank_one_hand(card_combo)
-        results = []
-
-        for hand in hand_combos:
-            rank, tie_breakers = Ranker.rank_one_hand(hand)
-            results.append((rank, tie_breakers))
+        rank_res_arr = evaluate_five_batch(hand_combos)
 
         if return_all:
-            return results
+            return rank_res_arr
         else:
-            highest_hand = max(results, key=lambda x: (x[0], x[1]))
-            return highest_hand
+            return np.max(rank_res_arr, axis=1)
 
     @staticmethod
     def rank_one_hand(hand):
         """
-        Ranks a single poker hand.
-
-        Args:
-            hand (list[Card]): A list of Card objects.
-
-        Returns:
-            tuple: A tuple containing the rank of the hand and list of tie breakers.
-        """
-        counts = np.array([card.count for card in hand])
-        colors = np.array([card.color for card in hand])
-        counts.sort()
-        suit_arr = Ranker.gen_suit_arr(colors)
-        straight_arr = Ranker.gen_straight_arr(counts)
-
-        rank = 0
-        tie_breakers = []
-
-        rank, tie_breakers = Ranker.straight_flush_check(counts, rank, straight_arr, suit_arr)
-        if rank == 0:
-            rank, tie_breakers = Ranker.four_of_a_kind_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.full_house_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.flush_check(rank, suit_arr, counts)
-        if rank == 0:
-            rank, tie_breakers = Ranker.straight_check(counts, rank, straight_arr)
-        if rank == 0:
-            rank, tie_breakers = Ranker.three_of_a_kind_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.two_pairs_check(counts, rank)
-        if rank == 0:
-            rank, tie_breakers = Ranker.one_pair_check(counts, rank)
-        if rank == 0:
-            tie_breakers = sorted(counts, reverse=True)
-            rank = 0
-
-        return rank, tie_breakers
-
-    @staticmethod
-    def gen_suit_arr(colors):
-        """
-        Checks if all cards in the hand have the same suit.
+        Ranks a single poker hand with the precomputed lookup tables.
 
         Args:
-            colors (numpy.ndarray): Array of card color codes.
+            hand (numpy.ndarray): Array of five card ids.
 
         Returns:
-            bool: True if all cards have the same suit, otherwise False.
+            int: The packed hand score, where score // 16 ** 5 is the hand type.
         """
-        return np.max(colors) == np.min(colors)
+        return evaluate_five(hand.tolist())
 
     @staticmethod
-    def gen_straight_arr(counts):
+    def rank_seven_cards(card_sets, short_deck=False):
         """
-        Determines if the hand is a straight.
+        Ranks the best five-card hand of each card set directly, without expanding its five-card subsets.
 
         Args:
-            counts (numpy.ndarray): Sorted array of card counts.
+            card_sets (numpy.ndarray): Card ids of shape (N, C) with 5 <= C <= 7.
+            short_deck (bool): Rank with short deck (6+) rules, where a flush beats a full house.
 
         Returns:
-            bool: True if the cards form a straight, otherwise False.
+            numpy.ndarray: The best packed score of each card set, shape (N,).
         """
-        straight_check = 0
-        for i in range(4):
-            if counts[i] + 1 == counts[i + 1]:
-                straight_check += 1
-        straight_check += ((counts[0] == 2) and (counts[4] == 14))
-        return straight_check == 4
+        return evaluate_seven_batch(card_sets, short_deck)
 
     @staticmethod
-    def straight_flush_check(counts, rank, straight_arr, suit_arr):
+    def board_features(boards):
         """
-        Evaluates whether the hand is a straight flush.
+        Computes the rank histogram and suit rank masks of every board once, to be shared by every player.
 
         Args:
-            counts (numpy.ndarray): Array of card values sorted in ascending order.
-            rank (int): Current rank of the hand.
-            straight_arr (bool): Indicates if the hand is a straight.
-            suit_arr (bool): Indicates if all cards are of the same suit.
+            boards (numpy.ndarray): Card ids of shape (N, C), the board of each scenario.
 
         Returns:
-            int: The updated rank of the hand if a straight flush is found; otherwise, the original rank.
+            tuple: The rank counts, shape (N, 13), and the rank mask of each suit, shape (N, 4).
         """
-        if rank == 0 and straight_arr and suit_arr:
-            if counts[0] == 2 and counts[4] == 14:
-                counts[:] = np.roll(counts, -1)
-            return 8
-        return rank
+        return card_features(boards)
 
     @staticmethod
-    def four_of_a_kind_check(counts, rank):
+    def rank_hole_cards(board_features, hole_cards, short_deck=False):
         """
-        Checks if the hand contains four of a kind.
+        Ranks hole cards on many boards, adding them to the boards' precomputed features.
 
         Args:
-            counts (numpy.ndarray): Array of card values.
-            rank (int): Current rank of the hand.
+            board_features (tuple): Board features as returned by `board_features`.
+            hole_cards (numpy.ndarray): The player's card ids, which together with a board make 5 to 7 cards: the
+                same cards on every board, shape (K,), or the cards held on each board, shape (N, K).
+            short_deck (bool): Rank with short deck (6+) rules, where a flush beats a full house.
 
         Returns:
-            int: Returns 7 (rank for four of a kind) if found, otherwise returns the current rank.
+            numpy.ndarray: The best packed score on each board, shape (N,).
         """
-        if rank > 0:
-            return rank
-        if np.any(np.bincount(counts)[1:] == 4):
-            for i in range(3):
-                if counts[i] == counts[i+1]:
-                    if counts[0] != counts[i]:
-                        counts[:] = np.roll(counts, 4-i-1)
-                        break
-            return 7
-        return rank
+        return score_features(*add_cards(*board_features, hole_cards), short_deck)
 
     @staticmethod
-    def full_house_check(counts, rank):
+    def omaha_board_features(boards):
         """
-        Checks if the hand is a full house.
+        Computes the features of every three-card subset of every board once, to be shared by every Omaha player.
 
         Args:
-            counts (numpy.ndarray): Array of card values.
-            rank (int): Current rank of the hand.
+            boards (numpy.ndarray): Card ids of shape (N, C) with 3 <= C <= 5, the board of each scenario.
 
         Returns:
-            int: Returns 6 (rank for full house) if a full house is detected, otherwise returns the current rank.
+            tuple: The OMAHA_RANK_TABLE row offsets of the rank multisets, the rank masks and the suits of the board
+                triples, each of shape (N, C choose 3).
         """
-        if rank > 0:
-            return rank
-        count_bin = np.bincount(counts)[1:]
-        if 3 in count_bin and 2 in count_bin:
-            return 6
-        return rank
+        return omaha_board_features(boards)
 
     @staticmethod
-    def flush_check(rank, suit_arr, counts):
+    def rank_omaha_hole_cards(board_features, hole_cards, low=False):
         """
-        Evaluates if the hand is a flush.
+        Ranks Omaha hole cards on many boards, playing exactly two of them with three board cards.
 
         Args:
-            rank (int): Current rank of the hand.
-            suit_arr (bool): Indicates if all cards are of the same suit.
-            counts (numpy.ndarray): Array of card values.
+            board_features (tuple): Board features as returned by `omaha_board_features`.
+            hole_cards (numpy.ndarray): The player's hole card ids, shape (H,), or per board, shape (N, H).
+            low (bool): Also rank the best eight-or-better low.
 
         Returns:
-            int: Returns 5 (rank for flush) if a flush is found, otherwise returns the current rank.
+            numpy.ndarray: The best packed score on each board, shape (N,), followed by the best low score (0 if
+                there is no qualifying low) if `low`.
         """
-        if rank > 0:
-            return rank
-        return 5 if suit_arr else rank
-
-    @staticmethod
-    def straight_check(counts, rank, straight_arr):
-        """
-        Checks if the hand is a straight.
-
-        Args:
-            counts (numpy.ndarray): Array of card values sorted in ascending order.
-            rank (int): Current rank of the hand.
-            straight_arr (bool): Indicates if the hand is a straight.
-
-        Returns:
-            int: Returns 4 (rank for straight) if a straight is found, otherwise returns the current rank.
-        """
-        if rank > 0:
-            return rank
-        if straight_arr:
-            if counts[0] == 2 and counts[4] == 14:
-                counts[:] = np.roll(counts, -1)
-            return 4
-        return rank
-
+        return score_omaha(board_features, hole_cards, low)
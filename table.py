@@ -1,8 +1,8 @@
-import multiprocessing
 from joblib import Parallel, delayed
 import random
 import timeit
 import logging
+from collections import namedtuple
 
 import numpy as np
 
@@ -10,120 +10,651 @@ from exceptions import *
 from utils import *
 from hand import Hand
 from ranker import *
+from evaluator import SCORE_DTYPE
+from preflop import equity_error, preflop_equity
+from isomorphism import collapse_runouts
+from cache import EQUITY_CACHE, EquityRecord, get_store, spot_key, stored_estimate
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
 
+# Adaptive simulations run in batches of this many scenarios and never run more than MAX_SCENARIOS in total
+BATCH_SCENARIOS = 10000
+MAX_SCENARIOS = 1000000
+# Default bytes of working memory per worker, scenarios are simulated in chunks that fit it
+MEMORY_BUDGET = 1024 ** 3
+
+
+class Tally(namedtuple("Tally", ["outcomes", "hand_types", "num_outcomes", "num_scenarios"])):
+    """
+    Running counts of simulated runouts: the weighted count of every outcome, the weighted count of every final
+    hand type per player (shape (num_players, 9)), the number of runouts they stand for and the number of runouts
+    actually simulated.
+    """
+
+    @staticmethod
+    def merge(tallies):
+        tallies = list(tallies)
+        return Tally({outcome: sum(tally.outcomes[outcome] for tally in tallies) for outcome in tallies[0].outcomes},
+                     sum(tally.hand_types for tally in tallies),
+                     sum(tally.num_outcomes for tally in tallies),
+                     sum(tally.num_scenarios for tally in tallies))
+
 
 class Table:
+    # Five-card combinations evaluated per player and scenario, only used to report the amount of work done
+    combos_per_scenario = 1
+    # Name of the game in equity cache keys
+    game_type = "poker"
+    # Peak working memory per player and scenario simulated at once, measured with tracemalloc and rounded up
+    scenario_bytes = 512
+    # Peak memory per card left in the deck of every scenario dealt at once when some hands are not dealt: the random
+    # keys and their argsort, see `sample_deals`
+    deal_bytes = 12
+    # Whether pots are split between the best high and the best low hand, which makes scores of shape
+    # (scenarios, players, 2) holding each player's high then low score
+    hi_lo = False
+    # Whether a short deck is played with short deck (6+) hand rankings, where a flush beats a full house and
+    # A-6-7-8-9 is the lowest straight, rather than only with fewer cards
+    short_deck_rules = False
 
     def __init__(self, num_players, hand_limit, deck_type='full'):
 
-        self.deck_arr = self.generate_deck(deck_type)
-        self.player_hands = {player_num: Hand(hand_limit) for player_num in range(1, num_players + 1)}
+        # Cards are tracked as 52-bit masks (bit i set if card id i is present), so adding, removing and looking up
+        # a card never touches an array. Arrays are only built when a simulation reads them.
+        self.deck_type = deck_type
+        self.deck_mask = self.generate_deck_mask(deck_type)
+        self.hand_limit = hand_limit
+        self.short_deck = deck_type == "short" and self.short_deck_rules
+        self.hand_type_dict = short_hand_type_dict if self.short_deck else hand_type_dict
+        self.player_hands = {player_num: Hand(hand_limit, short_deck=self.short_deck)
+                             for player_num in range(1, num_players + 1)}
         self.num_players = num_players
-        self.community_arr = np.zeros(shape=(0, 2), dtype=np.int)
+        self.community_mask = 0
+        self._community_ids = []
+        self._deck_arr = None
+        self._community_arr = None
 
-    def generate_deck(self, deck_type):
+    def generate_deck_mask(self, deck_type):
 
         if deck_type == "full":
-            num = ["2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K", "A"]
+            lowest_rank = 2
         elif deck_type == "short":
-            num = ["6", "7", "8", "9", "T", "J", "Q", "K", "A"]
+            lowest_rank = 6
         else:
             raise DeckException("Invalid Deck Type. Valid options are: Full/Short ")
 
-        suit = ["d", "c", "s", "h"]
-        return card_str_to_arr([n + s for n in num for s in suit])
+        return (1 << NUM_CARDS) - (1 << (lowest_rank - 2) * 4)
+
+    @property
+    def deck_arr(self):
+        """
+        numpy.ndarray: The uint8 ids of the cards left in the deck, in ascending order, rebuilt after the deck changes.
+        """
+        if self._deck_arr is None:
+            self._deck_arr = mask_to_arr(self.deck_mask)
+        return self._deck_arr
+
+    @property
+    def community_arr(self):
+        """
+        numpy.ndarray: The uint8 ids of the community cards, in the order they were dealt.
+        """
+        if self._community_arr is None:
+            self._community_arr = np.array(self._community_ids, dtype=np.uint8)
+        return self._community_arr
+
+    def in_deck(self, card):
+        return bool(self.deck_mask & card_bit(card))
+
+    def draw_card(self, card):
+        card_id = card_to_id(card)
+        if not self.deck_mask & 1 << card_id:
+            raise DeckException(f"Card {card_arr_to_str([card_id])[0]} is not in the Deck")
+        self.deck_mask &= ~(1 << card_id)
+        self._deck_arr = None
 
     def add_to_hand(self, player_num, cards):
 
         cards = format_cards(cards)
         for card in cards:
             self.player_hands[player_num].add_cards(card)
-            self.deck_arr = remove_card(card, self.deck_arr)
+            self.draw_card(card)
 
     def add_to_community(self, cards):
         cards = format_cards(cards)
 
         for card in cards:
-            self.community_arr = add_card(card, self.community_arr)
-            self.deck_arr = remove_card(card, self.deck_arr)
-
-    def simulation_preparation(self, num_scenarios):
-
-        for player in self.player_hands:
-            if len(self.player_hands[player].card_arr) < self.player_hands[player].hand_limit:
-                raise HandException(f"Please Deal a Starting Hand to Player {player}")
-
-        total_idx = comb_index(len(self.deck_arr), 5 - len(self.community_arr))
-        undrawn_combos = self.deck_arr[total_idx]
-        if num_scenarios != 'all':
-            if len(undrawn_combos) > num_scenarios:
-                undrawn_combos = undrawn_combos[np.array(random.sample(range(len(undrawn_combos)), num_scenarios))]
-
+            card_id = card_to_id(card)
+            if self.community_mask & 1 << card_id:
+                raise HandException(f"Card {card_arr_to_str([card_id])[0]} is already added")
+            self.draw_card(card_id)
+            self.community_mask |= 1 << card_id
+            self._community_ids.append(card_id)
+            self._community_arr = None
+
+    def check_hands(self):
+        if sum(self.deal_sizes()) > len(self.deck_arr):
+            raise HandException("Not enough cards left in the deck to deal every player's hand")
+
+    def deal_sizes(self):
+        """
+        Counts the cards every scenario deals: the rest of the board, then the unknown hole cards of every player in
+        seat order. Players may be dealt any number of their hole cards beforehand, including none.
+
+        Returns:
+            list[int]: The number of cards dealt to the board and to each player.
+        """
+        return [5 - len(self.community_arr)] + [hand.hand_limit - len(hand.card_arr)
+                                                 for hand in self.player_hands.values()]
+
+    def hands_dealt(self):
+        return not any(self.deal_sizes()[1:])
+
+    def num_runouts(self):
+        """
+        Counts the distinct scenarios: the runouts of the board, times the deals of every player's unknown hole
+        cards from the cards left.
+
+        Returns:
+            int: The exact number of scenarios.
+        """
+        return num_deals(len(self.deck_arr), self.deal_sizes())
+
+    def runout_ranks(self, num_scenarios, rng=None):
+        """
+        Picks the runouts to simulate, as ranks of combinations of the undrawn cards (see `unrank_combinations`), or
+        of deals of the board and the unknown hole cards (see `unrank_deals`) if some hands are not dealt.
+
+        Args:
+            num_scenarios (int or str): Number of runouts to sample, or 'all' to enumerate every runout.
+            rng (numpy.random.Generator, optional): Random generator used to sample. A fresh one is used by default.
+
+        Returns:
+            numpy.ndarray or range: The runouts of `sample_runouts`, or the range of every rank if there are no more
+                than `num_scenarios` runouts.
+        """
+        self.check_hands()
+        num_runouts = self.num_runouts()
+        if num_scenarios == 'all' or num_runouts <= num_scenarios:
+            return range(num_runouts)
+        rng = np.random.default_rng() if rng is None else rng
+        return self.sample_runouts(range(num_scenarios), permutation_key(rng), rng)
+
+    def sample_runouts(self, positions, key, rng=None):
+        """
+        Samples the runouts at `positions` of a shard's sample, so that a shard can draw them chunk by chunk and get
+        the same runouts as drawing them at once. Runouts are distinct ranks of the permutation chosen by `key`, or
+        if some hands are not dealt, deals drawn independently of each other from `rng`, which may repeat.
+
+        Args:
+            positions (range): Positions of the runouts in the shard's sample.
+            key (numpy.ndarray): Round keys of the shard's permutation of runout ranks, see `permutation_key`.
+            rng (numpy.random.Generator, optional): Random generator dealing unknown hands. A fresh one is used by
+                default.
+
+        Returns:
+            numpy.ndarray: The sampled ranks or, if some hands are not dealt, the sampled deals, the deck positions
+                of every dealt card in an array of shape (len(positions), cards dealt), drawn in one go for the board
+                and the hole cards.
+        """
+        if not self.hands_dealt():
+            return sample_deals(len(self.deck_arr), sum(self.deal_sizes()), len(positions), rng)
+        return permuted_ranks(self.num_runouts(), positions, key)
+
+    def build_runouts(self, ranks):
+        """
+        Decodes runout ranks into the undrawn cards of each runout. Enumerated runouts that are the same up to suits
+        no known card tells apart are kept once, with a weight.
+
+        Args:
+            ranks (numpy.ndarray or range): Sampled ranks or deals, or a range of enumerated ranks, as returned by
+                `runout_ranks`.
+
+        Returns:
+            tuple: The undrawn cards of every runout, the rest of the board followed by the unknown hole cards of
+                every player (see `deal_sizes`), and how many runouts each one stands for (None if they were
+                sampled).
+        """
+        enumerated = isinstance(ranks, range)
+        if not enumerated and ranks.ndim == 2:
+            return self.deck_arr[ranks], None
+        rank_arr = np.arange(ranks.start, ranks.stop) if enumerated else ranks
+        if not self.hands_dealt():
+            undrawn_combos = self.deck_arr[unrank_deals(rank_arr, len(self.deck_arr), self.deal_sizes())]
+            # Unknown hole cards are told apart by seat, so suit classes of the undrawn cards are not collapsed
+            return undrawn_combos, np.ones(len(undrawn_combos), dtype=np.int64) if enumerated else None
+        undrawn_combos = self.deck_arr[unrank_combinations(rank_arr, len(self.deck_arr), 5 - len(self.community_arr))]
+        if not enumerated:
+            return undrawn_combos, None
+        known_cards = [self.player_hands[player].card_arr for player in self.player_hands] + [self.community_arr]
+        undrawn_combos, weights = collapse_runouts(undrawn_combos, known_cards)
+        return undrawn_combos, np.ones(len(undrawn_combos), dtype=np.int64) if weights is None else weights
+
+    def simulation_preparation(self, num_scenarios, rng=None):
+        """
+        Lists the runouts to simulate: every runout, or a sample of `num_scenarios` of them, distinct unless some
+        hands are not dealt (see `sample_runouts`). Only the runouts to simulate are ever built, and enumerated
+        runouts that are the same up to suits are simulated once.
+
+        Args:
+            num_scenarios (int or str): Number of runouts to sample, or 'all' to enumerate every runout.
+            rng (numpy.random.Generator, optional): Random generator used to sample. A fresh one is used by default.
+
+        Returns:
+            tuple: The dealt community cards repeated per runout (None before the flop), the undrawn cards of
+                every runout and how many runouts each one stands for (None if they were sampled).
+        """
+        undrawn_combos, weights = self.build_runouts(self.runout_ranks(num_scenarios, rng))
+        return self.community_repeat(len(undrawn_combos)), undrawn_combos, weights
+
+    def hole_cards(self, player, undrawn_combos):
+        """
+        Gets a player's hole cards in every runout.
+
+        Args:
+            player (int): The player's index, from 0.
+            undrawn_combos (numpy.ndarray): The undrawn cards of every runout, as returned by `build_runouts`.
+
+        Returns:
+            numpy.ndarray: The player's card ids, shape (hand_limit,), if the hand is dealt, otherwise the known
+                cards followed by the ones dealt in each runout, shape (runouts, hand_limit).
+        """
+        hand = self.player_hands[player + 1]
+        deal_sizes = self.deal_sizes()
+        if not deal_sizes[player + 1]:
+            return hand.card_arr
+        start = sum(deal_sizes[:player + 1])
+        dealt = undrawn_combos[:, start:start + deal_sizes[player + 1]]
+        return np.concatenate([np.broadcast_to(hand.card_arr, (len(dealt), len(hand.card_arr))), dealt], axis=1)
+
+    def boards(self, community_cards, undrawn_combos):
+        undrawn_board = undrawn_combos[:, :5 - len(self.community_arr)]
+        return undrawn_board if community_cards is None else np.concatenate([community_cards, undrawn_board], axis=1)
+
+    def community_repeat(self, num_runouts):
         if len(self.community_arr) > 0:
-            community_cards = np.repeat([self.community_arr], len(undrawn_combos), axis=0)
+            return np.repeat([self.community_arr], num_runouts, axis=0)
+        return None
+
+    def simulate(self, num_scenarios=150000, odds_type="tie_win", final_hand=False, precision=None, time_budget=None,
+                 n_jobs=1, seed=None, memory_budget=MEMORY_BUDGET):
+        """
+        Simulates the remaining runouts and reports how often each player wins or ties. Players whose hands are not
+        (fully) dealt get their missing hole cards dealt along with every runout, as random opponents.
+
+        Args:
+            num_scenarios (int or str): Number of runouts to sample, or 'all' to enumerate every runout.
+            odds_type (str): How ties are reported, one of 'win_any', 'tie_win', 'precise' or 'pot_share', which
+                splits tied pots evenly between the winners, or 'hi_lo' for split-pot games. Other odds types only
+                look at high hands.
+            final_hand (bool or str): Also report the distribution of each player's final hand type, or with 'joint'
+                the joint distribution of each player's final hand type and the winning hand type.
+            precision (float, optional): Switches to adaptive sampling, which ignores `num_scenarios` and samples
+                batches until the standard error of every outcome is at most this many percentage points.
+            time_budget (float, optional): Switches to adaptive sampling, which stops after this many seconds.
+            n_jobs (int): Number of worker processes the scenarios are sharded across, -1 for one per CPU core.
+            seed (int, optional): Seed making sampled results reproducible for a given `n_jobs`.
+            memory_budget (int, optional): Bytes of working memory per worker. Scenarios are simulated in chunks
+                that fit it, which gives the same results as simulating them at once. Unbounded if None.
+
+        Returns:
+            dict: The outcome percentages, followed by the final hand dict if `final_hand` and by the standard error
+                of every outcome (in percentage points) if sampling adaptively. Results are reused from the equity
+                cache, and from the persistent store if one is open, which unseeded simulations also refine.
+        """
+        key = self.cache_key(("outcomes", num_scenarios, odds_type, final_hand, precision, time_budget,
+                              None if seed is None else (seed, n_jobs)))
+        cached = EQUITY_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        adaptive = precision is not None or time_budget is not None
+        store = get_store()
+        if store is None or seed is not None:
+            record = self.estimate_outcomes(num_scenarios, odds_type, final_hand, precision, time_budget, n_jobs, seed,
+                                            memory_budget)
         else:
-            community_cards = None
-        return community_cards, undrawn_combos
+            num_runouts = self.num_runouts()
+            enumerates = num_scenarios == 'all' or num_runouts <= num_scenarios
+            record = stored_estimate(
+                store, self.cache_key(("outcomes", odds_type, final_hand)),
+                lambda missing: self.estimate_outcomes(missing or num_scenarios, odds_type, final_hand, precision,
+                                                       time_budget, n_jobs, memory_budget=memory_budget),
+                None if adaptive or enumerates else num_scenarios, precision, scale=100, decimals=2)
+
+        output = list(record.rates)
+        if adaptive:
+            output.append({outcome: 0.0 for outcome in output[0]} if record.exact
+                          else self.standard_errors(output[0], record.num_samples))
+        output = output[0] if len(output) == 1 else tuple(output)
+        EQUITY_CACHE.put(key, output)
+        return output
+
+    def estimate_outcomes(self, num_scenarios, odds_type="tie_win", final_hand=False, precision=None,
+                          time_budget=None, n_jobs=1, seed=None, memory_budget=None):
+        """
+        Simulates the remaining runouts, as described in `simulate`, without going through any cache.
+
+        Returns:
+            EquityRecord: The outcome dict, followed by the final hand dict if `final_hand`, the number of runouts
+                they were computed from and whether every runout was enumerated.
+        """
+        start = timeit.default_timer()
+        seed_seq = np.random.SeedSequence(seed)
+        chunk_size = self.chunk_size(memory_budget)
+        if precision is not None or time_budget is not None:
+            tally, exact = self.adaptive_calculation(odds_type, precision, time_budget, n_jobs, seed_seq, chunk_size)
+        else:
+            tally, exact = self.sharded_calculation(odds_type, num_scenarios, n_jobs, seed_seq, chunk_size)
 
-    def simulate(self, num_scenarios=150000, odds_type="tie_win", final_hand=False):
+        output = [self.outcome_percentages(tally)]
+        if final_hand:
+            output.append(self.final_hand_percentages(tally, joint=final_hand == "joint"))
+        num_simulations = tally.num_scenarios * self.combos_per_scenario * self.num_players
+        logging.info(f"{num_simulations} Simulations in {np.round(timeit.default_timer() - start, 2)}s")
+        return EquityRecord(output, tally.num_outcomes, exact)
+
+    def chunk_size(self, memory_budget):
+        """
+        Finds how many scenarios can be simulated at once within a memory budget.
+
+        Args:
+            memory_budget (int, optional): Bytes of working memory, unbounded if None.
+
+        Returns:
+            int: The number of scenarios per chunk, None if unbounded.
+        """
+        if memory_budget is None:
+            return None
+        bytes_per_scenario = self.scenario_bytes * self.num_players
+        if not self.hands_dealt():
+            bytes_per_scenario += self.deal_bytes * len(self.deck_arr)
+        return max(1, int(memory_budget // bytes_per_scenario))
+
+    def cache_key(self, query):
+        """
+        Builds the equity cache key of the current spot.
+
+        Args:
+            query (tuple): Everything else the result depends on, such as the number of scenarios or the precision.
+
+        Returns:
+            tuple: The key, shared by every spot that only differs by a permutation of suits. Hands may be partly
+                dealt, so the number of hole cards is part of the game name.
+        """
+        player_hands = [self.player_hands[player].card_arr for player in self.player_hands]
+        known_mask = self.community_mask | self.deck_mask
+        for player in self.player_hands:
+            known_mask |= self.player_hands[player].card_mask
+        dead_cards = mask_to_arr(self.generate_deck_mask(self.deck_type) & ~known_mask)
+        return spot_key(f"{self.game_type}{self.hand_limit}-{self.deck_type}", player_hands, self.community_arr,
+                        dead_cards, query)
+
+    def sharded_calculation(self, odds_type, num_scenarios, n_jobs=1, seed_seq=None, chunk_size=None):
+        """
+        Simulates `num_scenarios` runouts (or 'all') split into one shard per worker process.
+
+        Sampled shards each draw their runouts from their own random stream spawned from `seed_seq`, and shard
+        counts are added up, so the result only depends on the seed and the number of workers.
+
+        Args:
+            odds_type (str): How ties are reported, as in `simulate`.
+            num_scenarios (int or str): Number of runouts to sample, or 'all' to enumerate every runout.
+            n_jobs (int): Number of worker processes, -1 for one per CPU core.
+            seed_seq (numpy.random.SeedSequence, optional): Seed of the shards' random streams.
+            chunk_size (int, optional): Largest number of scenarios a worker simulates at once.
+
+        Returns:
+            tuple: The Tally of every simulated runout and whether every runout was enumerated.
+        """
+        self.check_hands()
+        seed_seq = np.random.SeedSequence() if seed_seq is None else seed_seq
+        num_shards = resolve_n_jobs(n_jobs)
+        num_runouts = self.num_runouts()
+        # Every worker process already keeps a core busy, so players are only ranked in a thread pool when the
+        # scenarios are not sharded, otherwise each worker would start one thread per core
+        player_jobs = -1 if num_shards == 1 else 1
+
+        if num_scenarios == 'all' or num_runouts <= num_scenarios:
+            all_ranks = self.runout_ranks('all')
+            bounds = np.cumsum([0] + shard_sizes(num_runouts, num_shards))
+            shard_args = [(odds_type, all_ranks[bounds[shard]:bounds[shard + 1]], None, chunk_size, player_jobs)
+                          for shard in range(num_shards)]
+            return Tally.merge(run_shards(self.simulate_shard, shard_args, n_jobs)), True
+
+        shard_args = [(odds_type, shard_scenarios, shard_seed, chunk_size, player_jobs)
+                      for shard_scenarios, shard_seed
+                      in zip(shard_sizes(num_scenarios, num_shards), seed_seq.spawn(num_shards))]
+        return Tally.merge(run_shards(self.simulate_shard, shard_args, n_jobs)), False
+
+    def simulate_shard(self, odds_type, runouts, seed_seq=None, chunk_size=None, player_jobs=-1):
+        """
+        Simulates one shard of runouts chunk by chunk, only keeping running outcome counts.
+
+        Args:
+            odds_type (str): How ties are reported, as in `simulate`.
+            runouts (int or range): Number of runouts to sample with the shard's own random stream, or the range of
+                runout ranks to enumerate.
+            seed_seq (numpy.random.SeedSequence, optional): Seed of the shard's random stream.
+            chunk_size (int, optional): Largest number of scenarios simulated at once.
+            player_jobs (int): Number of threads players are ranked in, -1 for one per CPU core.
+
+        Returns:
+            Tally: The outcome counts of the shard.
+        """
+        self.check_hands()
+        enumerated = isinstance(runouts, range)
+        num_runouts = len(runouts) if enumerated else runouts
+        chunk_size = max(num_runouts, 1) if chunk_size is None else chunk_size
+        rng = np.random.default_rng(seed_seq)
+        key = None if enumerated else permutation_key(rng)
+        tally = self.tally(odds_type, np.zeros((0, self.num_players, 2) if self.hi_lo else (0, self.num_players),
+                                               dtype=SCORE_DTYPE))
+        for start in range(0, num_runouts, chunk_size):
+            # Sampled runouts are drawn chunk by chunk too, so that memory does not grow with the number of scenarios
+            ranks = (runouts[start:start + chunk_size] if enumerated
+                     else self.sample_runouts(range(start, min(start + chunk_size, num_runouts)), key, rng))
+            undrawn_combos, weights = self.build_runouts(ranks)
+            res_arr = self.simulate_calculation(self.community_repeat(len(undrawn_combos)), undrawn_combos,
+                                                player_jobs)
+            tally = Tally.merge([tally, self.tally(odds_type, res_arr, weights)])
+        return tally
+
+    def adaptive_calculation(self, odds_type, precision=None, time_budget=None, n_jobs=1, seed_seq=None,
+                             chunk_size=None):
+        """
+        Samples batches of BATCH_SCENARIOS runouts per worker until the standard error of every outcome is at most
+        `precision` percentage points, `time_budget` seconds have passed or MAX_SCENARIOS runouts have been simulated.
+        Runouts are enumerated instead when a single batch can cover all of them.
+
+        Args:
+            odds_type (str): How ties are reported, as in `simulate`.
+            precision (float, optional): Target standard error, in percentage points.
+            time_budget (float, optional): Time limit, in seconds.
+            n_jobs (int): Number of worker processes, -1 for one per CPU core.
+            seed_seq (numpy.random.SeedSequence, optional): Seed of the batches' random streams.
+            chunk_size (int, optional): Largest number of scenarios a worker simulates at once.
+
+        Returns:
+            tuple: The Tally of every simulated runout and whether every runout was enumerated.
+        """
+        start = timeit.default_timer()
+        batch_scenarios = BATCH_SCENARIOS * resolve_n_jobs(n_jobs)
+        if self.num_runouts() <= batch_scenarios:
+            return self.sharded_calculation(odds_type, 'all', n_jobs, chunk_size=chunk_size)
+
+        seed_seq = np.random.SeedSequence() if seed_seq is None else seed_seq
+        tally = None
+        while True:
+            batch_tally, _ = self.sharded_calculation(odds_type, batch_scenarios, n_jobs, seed_seq, chunk_size)
+            tally = batch_tally if tally is None else Tally.merge([tally, batch_tally])
+            error_dict = self.standard_errors(self.outcome_percentages(tally), tally.num_outcomes)
+            if ((precision is not None and max(error_dict.values()) <= precision)
+                    or (time_budget is not None and timeit.default_timer() - start >= time_budget)
+                    or tally.num_outcomes >= MAX_SCENARIOS):
+                return tally, False
+
+    @staticmethod
+    def standard_errors(outcome_dict, num_outcomes):
+        """
+        Computes the standard error of every outcome percentage estimated from `num_outcomes` sampled runouts.
+
+        Args:
+            outcome_dict (dict): Outcome percentages as returned by `simulation_analysis`.
+            num_outcomes (int): Number of sampled runouts.
+
+        Returns:
+            dict: The standard error of each outcome, in percentage points.
+        """
+        return {outcome: np.round(np.sqrt(percent / 100 * (1 - percent / 100) / num_outcomes) * 100, 2)
+                for outcome, percent in outcome_dict.items()}
+
+    def simulate_calculation(self, community_cards, undrawn_combos, n_jobs=-1):
         raise NotImplementedError
 
-    def simulate_calculation(self, community_cards, undrawn_combos):
+    def gen_single_hand(self, board_features, player, undrawn_combos, res_arr):
         raise NotImplementedError
 
-    def gen_single_hand(self, community_cards, player, undrawn_combos, res_arr):
-        raise NotImplementedError
+    def tally(self, odds_type, res_arr, weights=None):
+        """
+        Counts the outcomes and final hand types of simulated runouts, so that they can be added up over chunks,
+        shards and batches.
+
+        Args:
+            odds_type (str): How ties are reported, as in `simulate`.
+            res_arr (numpy.ndarray): The score of every player in every runout, with a high and a low score each if
+                the table is hi/lo.
+            weights (numpy.ndarray, optional): How many runouts each one stands for, 1 by default.
+
+        Returns:
+            Tally: The counts.
+        """
+        weights = np.ones(len(res_arr), dtype=np.int64) if weights is None else weights
+        # Count every (player, final hand type, winning hand type) triple in one bincount
+        num_types = len(hand_type_dict)
+        hand_types = (res_arr[:, :, 0] if res_arr.ndim == 3 else res_arr) // 16 ** 5
+        winning_types = hand_types.max(axis=1, initial=0)[:, None]
+        cells = (np.arange(self.num_players) * num_types + hand_types) * num_types + winning_types
+        hand_counts = np.bincount(cells.ravel(), weights=np.repeat(weights, self.num_players),
+                                  minlength=self.num_players * num_types ** 2).astype(np.int64)
+        return Tally(self.outcome_counts(odds_type, res_arr, weights),
+                     hand_counts.reshape(self.num_players, num_types, num_types), int(weights.sum()), len(res_arr))
+
+    def outcome_counts(self, odds_type, res_arr, weights):
+        if odds_type == "hi_lo":
+            return self.hi_lo_counts(res_arr, weights)
+        res_arr = res_arr[:, :, 0] if res_arr.ndim == 3 else res_arr
+        # Encode the set of players sharing the best score in every runout as a bitmask (bit p for player p + 1) and
+        # count every winner set at once, each runout counting as many times as its weight
+        winner_masks = (res_arr == np.max(res_arr, axis=1, initial=0)[:, None]) @ (1 << np.arange(self.num_players))
+        winner_sets = np.bincount(winner_masks, weights=weights, minlength=1 << self.num_players).astype(np.int64)
+        players = np.arange(self.num_players)
+        in_set = (np.arange(1 << self.num_players)[:, None] >> players & 1).astype(bool)
+        set_sizes = in_set.sum(axis=1)
+        all_players = (1 << self.num_players) - 1
 
-    def hand_strength_analysis(self, res_arr):
-        final_hand_dict = {}
-        for player in range(self.num_players):
-            hand_type, hand_freq = np.unique((res_arr // 16 ** 5)[:, player], return_counts=True)
-            final_hand_dict[player + 1] = dict(
-                zip(np.vectorize(hand_type_dict.get)(hand_type), np.round(hand_freq / hand_freq.sum() * 100, 2)))
-        return final_hand_dict
-
-    def simulation_analysis(self, odds_type, res_arr):
-        # Result Analysis
-        outcome_arr = (res_arr == np.expand_dims(np.max(res_arr, axis=1), axis=1))
-        num_outcomes = len(outcome_arr)
         outcome_dict = {}
         # Any Tied Win counts as a Win
         if odds_type == "win_any":
-            tie_indices = np.all(outcome_arr, axis=1)  # multi-way tie
-            outcome_dict['Tie'] = np.round(np.mean(tie_indices) * 100, 2)
-
-            for player in range(self.num_players):
-                outcome_dict["Player " + str(player + 1)] = np.round(
-                    np.sum(outcome_arr[~tie_indices, player]) / num_outcomes * 100, 2)
+            outcome_dict['Tie'] = int(winner_sets[all_players])
+            for player in players:
+                outcome_dict["Player " + str(player + 1)] = int(winner_sets[in_set[:, player]].sum()
+                                                                - winner_sets[all_players])
         # Any Multi-way Tie/Tied Win counts as a Tie, Win must be exclusive
         elif odds_type == "tie_win":
-            for player in range(self.num_players):
-                tie_win_scenarios = outcome_arr[outcome_arr[:, player] == 1].sum(axis=1)
-                outcome_dict["Player " + str(player + 1) + " Win"] = np.round(
-                    np.sum(tie_win_scenarios == 1) / num_outcomes * 100, 2)
-                outcome_dict["Player " + str(player + 1) + " Tie"] = np.round(
-                    np.sum(tie_win_scenarios > 1) / num_outcomes * 100, 2)
+            for player in players:
+                outcome_dict["Player " + str(player + 1) + " Win"] = int(winner_sets[1 << player])
+                outcome_dict["Player " + str(player + 1) + " Tie"] = int(
+                    winner_sets[in_set[:, player] & (set_sizes > 1)].sum())
+        # Every exact set of winners
         elif odds_type == "precise":
-
             for num_player in range(1, self.num_players + 1):
                 for player_arr in comb_index(self.num_players, num_player):
-                    temp_arr = np.ones(shape=(outcome_arr.shape[0]), dtype=bool)
-                    for player in player_arr:
-                        temp_arr = (temp_arr & (outcome_arr[:, player] == 1))
-                    for non_player in [player for player in range(self.num_players) if player not in player_arr]:
-                        temp_arr = (temp_arr & (outcome_arr[:, non_player] == 0))
-
                     if len(player_arr) == 1:
                         outcome_key = f"Player {player_arr[0] + 1} Win"
                     else:
                         outcome_key = f"Player {','.join([str(player + 1) for player in player_arr])} Tie"
+                    outcome_dict[outcome_key] = int(winner_sets[(1 << player_arr.astype(np.int64)).sum()])
+        # Tied pots are split evenly, so each player's count is the number of pots they win
+        elif odds_type == "pot_share":
+            shares = winner_sets[1:] / set_sizes[1:]
+            for player in players:
+                outcome_dict["Player " + str(player + 1) + " Share"] = float(shares[in_set[1:, player]].sum())
+        return outcome_dict
 
-                    outcome_dict[outcome_key] = np.round(temp_arr.sum() / num_outcomes * 100, 2)
+    def hi_lo_counts(self, res_arr, weights):
+        """
+        Counts how often each player scoops the whole pot, gets three quarters, half or a quarter of it or any other
+        split of it (e.g. a third in a three-way tie), and the pots they win overall. Half the pot goes to the best
+        high hand and half to the best qualifying low, split evenly between tied hands, and the high hand takes the
+        whole pot if no low qualifies.
+
+        Args:
+            res_arr (numpy.ndarray): The high and low score of every player in every runout, shape
+                (runouts, players, 2). Without low scores, no low ever qualifies.
+            weights (numpy.ndarray): How many runouts each one stands for.
+
+        Returns:
+            dict: The weighted count of every outcome.
+        """
+        high = res_arr[:, :, 0] if res_arr.ndim == 3 else res_arr
+        low = res_arr[:, :, 1] if res_arr.ndim == 3 else np.zeros_like(high)
+        high_winners = high == np.max(high, axis=1, initial=0)[:, None]
+        low_winners = (low == np.max(low, axis=1, initial=0)[:, None]) & (low > 0)
+        low_pot = np.where(low_winners.any(axis=1), 0.5, 0)[:, None]
+        shares = (high_winners * (1 - low_pot) / np.maximum(high_winners.sum(axis=1, keepdims=True), 1)
+                  + low_winners * low_pot / np.maximum(low_winners.sum(axis=1, keepdims=True), 1))
+
+        outcome_dict = {}
+        for player in range(self.num_players):
+            bucketed = np.zeros(len(shares), dtype=bool)
+            for outcome, share in (("Scoop", 1), ("Three Quarters", 0.75), ("Half", 0.5), ("Quarter", 0.25)):
+                matches = np.isclose(shares[:, player], share)
+                bucketed |= matches
+                outcome_dict["Player " + str(player + 1) + " " + outcome] = int(np.sum(weights[matches]))
+            outcome_dict["Player " + str(player + 1) + " Split"] = int(
+                np.sum(weights[~bucketed & (shares[:, player] > 0)]))
+            outcome_dict["Player " + str(player + 1) + " Share"] = float(shares[:, player] @ weights)
         return outcome_dict
 
+    @staticmethod
+    def outcome_percentages(tally):
+        return {outcome: np.round(count / tally.num_outcomes * 100, 2) for outcome, count in tally.outcomes.items()}
+
+    def final_hand_percentages(self, tally, joint=False):
+        """
+        Converts the final hand type counts of a tally into percentages.
+
+        Args:
+            tally (Tally): The counts.
+            joint (bool): Report how often each player makes each hand type while the winning hand is of each type,
+                instead of only each player's hand types.
+
+        Returns:
+            dict: For every player, the percentage of runouts ending with each hand type name, or with each
+                (hand type name, winning hand type name) pair if `joint`.
+        """
+        counts = tally.hand_types if joint else tally.hand_types.sum(axis=2)
+        percentages = np.round(counts / max(tally.num_outcomes, 1) * 100, 2)
+        final_hand_dict = {}
+        for player in range(self.num_players):
+            if joint:
+                final_hand_dict[player + 1] = {
+                    (self.hand_type_dict[hand_type], self.hand_type_dict[winning_type]):
+                        percentages[player, hand_type, winning_type]
+                    for hand_type, winning_type in zip(*np.nonzero(counts[player]))}
+            else:
+                final_hand_dict[player + 1] = {self.hand_type_dict[hand_type]: percentages[player, hand_type]
+                                               for hand_type in np.nonzero(counts[player])[0]}
+        return final_hand_dict
+
+    def hand_strength_analysis(self, res_arr, weights=None, joint=False):
+        return self.final_hand_percentages(self.tally("win_any", res_arr, weights), joint)
+
+    def simulation_analysis(self, odds_type, res_arr, weights=None):
+        return self.outcome_percentages(self.tally(odds_type, res_arr, weights))
+
     def next_round(self, verbose=True):
 
         hand_player_cards = True
@@ -141,7 +672,8 @@ class Table:
                 added_card = self.random_card(1)
 
             if verbose:
-                logging.info(f"{'Flop' if len(self.community_arr) == 0 else 'Turn' if len(self.community_arr) == 3 else 'River'} card:  {' '.join(card_arr_to_str(added_card))}")
+                street = 'Flop' if len(self.community_arr) == 0 else 'Turn' if len(self.community_arr) == 3 else 'River'
+                logging.info(f"{street} card:  {' '.join(card_arr_to_str(added_card))}")
             self.add_to_community(added_card)
 
 
@@ -168,130 +700,154 @@ class Table:
         return output_dict
 
     def view_result(self):
-        player_rank = np.zeros(self.num_players, dtype=np.int)
-        player_hand_type = np.zeros(self.num_players, dtype=np.int)
-
-        for player in range(self.num_players):
-            player_combos, player_res_arr = self.player_hands[player + 1].hand_value(self.community_arr)
-            player_rank[player] = np.max(player_res_arr)
-            player_hand_type[player] = np.max(player_res_arr) // 16 ** 5
+        player_rank = np.array([self.player_hands[player + 1].hand_value(self.community_arr)
+                                for player in range(self.num_players)])
+        player_hand_type = player_rank // 16 ** 5
 
         if (np.max(player_rank) == player_rank).sum() == 1:
-            return f"Player {np.argmax(player_rank) + 1} wins with a {hand_type_dict[player_hand_type[np.argmax(player_rank)]]}"
+            winner = np.argmax(player_rank)
+            return f"Player {winner + 1} wins with a {self.hand_type_dict[player_hand_type[winner]]}"
         else:
             winners, = np.where(np.max(player_rank) == player_rank)
-            return f"Player {', '.join((winners + 1).astype(str))} ties with a {hand_type_dict[player_hand_type[winners[0]]]}"
+            return (f"Player {', '.join((winners + 1).astype(str))} ties with a "
+                    f"{self.hand_type_dict[player_hand_type[winners[0]]]}")
 
 
 
 class HoldemTable(Table):
+    game_type = "holdem"
+    short_deck_rules = True
 
     def __init__(self, num_players, deck_type='full'):
         super(HoldemTable, self).__init__(num_players=num_players,
                                           hand_limit=2,
                                           deck_type=deck_type)
 
-    def simulate(self, num_scenarios=150000, odds_type="tie_win", final_hand=False):
-
-        start = timeit.default_timer()
-        community_cards, undrawn_combos = self.simulation_preparation(num_scenarios)
-        # end = timeit.default_timer()
-        # logging.info(f"Generate Hand Combinations Time Cost: {end - start}s")
-
-        # start = timeit.default_timer()
-        res_arr = self.simulate_calculation(community_cards, undrawn_combos)
-        # end = timeit.default_timer()
-        # logging.info(f"Calculation Time Cost: {end - start}s")
-        outcome_dict = self.simulation_analysis(odds_type, res_arr)
-
-        if final_hand:
-            final_hand_dict = self.hand_strength_analysis(res_arr)
-            logging.info(f"{min([len(undrawn_combos), num_scenarios]) * 21 * self.num_players} Simulations in {np.round(timeit.default_timer() - start, 2)}s")
-            return outcome_dict, final_hand_dict
-
-        logging.info(f"{min([len(undrawn_combos), num_scenarios]) * 21 * self.num_players} Simulations in {np.round(timeit.default_timer() - start, 2)}s")
-        return outcome_dict
-
-    def simulate_calculation(self, community_cards, undrawn_combos):
-        res_arr = np.zeros(shape=(len(undrawn_combos), self.num_players), dtype=np.int)
-        if self.num_players >= 2:
-            Parallel(n_jobs=multiprocessing.cpu_count(), backend="threading") \
-                (delayed(self.gen_single_hand)(community_cards, player, undrawn_combos, res_arr) for player in range(self.num_players))
+    def simulate(self, num_scenarios=None, odds_type="tie_win", final_hand=False, precision=None, time_budget=None,
+                 n_jobs=1, seed=None, memory_budget=MEMORY_BUDGET):
+        # A short deck leaves few enough runouts to enumerate them all in about the time 150000 samples take, so
+        # results there are exact by default
+        if num_scenarios is None:
+            num_runouts = self.num_runouts()
+            num_scenarios = 'all' if self.short_deck and num_runouts <= MAX_SCENARIOS else 150000
+        if not final_hand:
+            preflop_output = self.preflop_lookup(odds_type, precision, time_budget)
+            if preflop_output is not None:
+                return preflop_output
+        return super(HoldemTable, self).simulate(num_scenarios, odds_type, final_hand, precision, time_budget, n_jobs,
+                                                 seed, memory_budget)
+
+    def preflop_lookup(self, odds_type, precision=None, time_budget=None):
+        """
+        Answers a heads-up preflop query with a full deck from the precomputed equity table instead of simulating.
+
+        Args:
+            odds_type (str): How ties are reported, as in `simulate`.
+            precision (float, optional): Largest acceptable standard error, in percentage points.
+            time_budget (float, optional): Whether the caller asked for adaptive sampling, which also reports errors.
+
+        Returns:
+            dict: The outcome percentages as returned by `simulate`, followed by their standard errors if `precision`
+                or `time_budget` is given, or None if the table cannot answer the query, e.g. for 'hi_lo' outcomes.
+        """
+        if self.num_players != 2 or len(self.community_arr) > 0 or len(self.deck_arr) != NUM_CARDS - 4:
+            return None
+        equity = preflop_equity(self.player_hands[1].card_arr, self.player_hands[2].card_arr)
+        if equity is None:
+            return None
+        win, tie, num_boards = equity
+        win, tie, loss = np.round(win * 100, 2), np.round(tie * 100, 2), np.round((1 - win - tie) * 100, 2)
+        if odds_type == "win_any":
+            outcome_dict = {'Tie': tie, 'Player 1': win, 'Player 2': loss}
+        elif odds_type == "tie_win":
+            outcome_dict = {'Player 1 Win': win, 'Player 1 Tie': tie, 'Player 2 Win': loss, 'Player 2 Tie': tie}
+        elif odds_type == "pot_share":
+            outcome_dict = {'Player 1 Share': np.round(win + tie / 2, 2), 'Player 2 Share': np.round(loss + tie / 2, 2)}
+        elif odds_type == "precise":
+            outcome_dict = {'Player 1 Win': win, 'Player 2 Win': loss, 'Player 1,2 Tie': tie}
+        else:
+            return None
+
+        if precision is None and time_budget is None:
+            return outcome_dict
+        error_dict = {outcome: np.round(equity_error(percent / 100, num_boards) * 100, 2)
+                      for outcome, percent in outcome_dict.items()}
+        if precision is not None and max(error_dict.values()) > precision:
+            return None
+        return outcome_dict, error_dict
+
+    def simulate_calculation(self, community_cards, undrawn_combos, n_jobs=-1):
+        # The board is shared by every player, so its rank histogram and suit masks are computed once per scenario
+        # and each player's hole cards are added to them
+        boards = self.boards(community_cards, undrawn_combos)
+        board_features = Ranker.board_features(boards)
+        res_arr = np.zeros(shape=(len(undrawn_combos), self.num_players), dtype=SCORE_DTYPE)
+        if self.num_players >= 2 and resolve_n_jobs(n_jobs) != 1:
+            Parallel(n_jobs=n_jobs, backend="threading") \
+                (delayed(self.gen_single_hand)(board_features, player, undrawn_combos, res_arr)
+                 for player in range(self.num_players))
         else:
             for player in range(self.num_players):
-                self.gen_single_hand(community_cards, player, undrawn_combos, res_arr)
+                self.gen_single_hand(board_features, player, undrawn_combos, res_arr)
         return res_arr
 
-    def gen_single_hand(self, community_cards, player, undrawn_combos, res_arr):
-        if community_cards is None:
-            cur_player_cards = np.concatenate(
-                [np.repeat([self.player_hands[player + 1].card_arr], len(undrawn_combos), axis=0),
-                 undrawn_combos], axis=1)
-        else:
-            cur_player_cards = np.concatenate(
-                [np.repeat([self.player_hands[player + 1].card_arr], len(undrawn_combos), axis=0),
-                 community_cards,
-                 undrawn_combos], axis=1)
-        res_arr[:, player] =  Ranker.rank_all_hands(cur_player_cards[:, comb_index(7, 5), :])
+    def gen_single_hand(self, board_features, player, undrawn_combos, res_arr):
+        res_arr[:, player] = Ranker.rank_hole_cards(board_features, self.hole_cards(player, undrawn_combos),
+                                                    self.short_deck)
 
 
 
 class OmahaTable(Table):
-
-    def __init__(self, num_players, deck_type='full'):
+    game_type = "omaha"
+
+    def __init__(self, num_players, deck_type='full', hand_limit=4, hi_lo=False):
+        """
+        Args:
+            num_players (int): Number of players.
+            deck_type (str): 'full' or 'short'.
+            hand_limit (int): Number of hole cards, 4 for Omaha, 5 for PLO5 and 6 for PLO6. Hands always play
+                exactly two of them, so the cost grows with the number of hole pairs.
+            hi_lo (bool): Play Omaha Hi/Lo eight-or-better, where the best low hand wins half the pot. Simulate
+                with odds_type='hi_lo' to get scoop, half and quarter pot frequencies and pot shares.
+
+        Raises:
+            HandException: If there are fewer than four hole cards.
+        """
+        # Hands are told apart from Hold'em ones by their number of hole cards, see `Hand.hand_value`
+        if hand_limit < 4:
+            raise HandException("Omaha hands need at least 4 hole cards")
         super(OmahaTable, self).__init__(num_players=num_players,
-                                          hand_limit=4,
+                                          hand_limit=hand_limit,
                                           deck_type=deck_type)
-
-    def simulate(self, num_scenarios=25000, odds_type="tie_win", final_hand=False):
-
-        start = timeit.default_timer()
-        community_cards, undrawn_combos = self.simulation_preparation(num_scenarios)
-        res_arr = self.simulate_calculation(community_cards, undrawn_combos)
-        outcome_dict = self.simulation_analysis(odds_type, res_arr)
-
-        if final_hand:
-            final_hand_dict = self.hand_strength_analysis(res_arr)
-            logging.info(f"{min([len(undrawn_combos), num_scenarios]) * 60 * self.num_players} Simulations in {np.round(timeit.default_timer() - start, 2)}s")
-            return outcome_dict, final_hand_dict
-        logging.info(f"{min([len(undrawn_combos), num_scenarios]) * 60 * self.num_players} Simulations in {np.round(timeit.default_timer() - start, 2)}s")
-        return outcome_dict
-
-    def simulate_calculation(self, community_cards, undrawn_combos):
-        res_arr = np.zeros(shape=(len(undrawn_combos), self.num_players), dtype=np.int)
-
-        if self.num_players >= 2:
-            Parallel(n_jobs=multiprocessing.cpu_count(), backend="threading") \
-                (delayed(self.gen_single_hand)(community_cards, player, undrawn_combos, res_arr) for player in
+        # Every hole pair with every board triple
+        self.combos_per_scenario = num_combinations(hand_limit, 2) * 10
+        self.hi_lo = hi_lo
+        if hi_lo:
+            self.game_type = "omaha-hi-lo"
+
+    def simulate_calculation(self, community_cards, undrawn_combos, n_jobs=-1):
+        # Every board triple is shared by every player, so its features are computed once per scenario and combined
+        # with each player's hole pairs without building the five-card hands
+        boards = self.boards(community_cards, undrawn_combos)
+        board_features = Ranker.omaha_board_features(boards)
+        res_arr = np.zeros(shape=(len(undrawn_combos), self.num_players) + ((2,) if self.hi_lo else ()),
+                           dtype=SCORE_DTYPE)
+
+        if self.num_players >= 2 and resolve_n_jobs(n_jobs) != 1:
+            Parallel(n_jobs=n_jobs, backend="threading") \
+                (delayed(self.gen_single_hand)(board_features, player, undrawn_combos, res_arr) for player in
                  range(self.num_players))
         else:
             for player in range(self.num_players):
-                self.gen_single_hand(community_cards, player, undrawn_combos, res_arr)
+                self.gen_single_hand(board_features, player, undrawn_combos, res_arr)
         return res_arr
 
-    def gen_single_hand(self, community_cards, player, undrawn_combos, res_arr):
-
-
-        if community_cards is None:
-            community_combos = undrawn_combos[:, comb_index(5, 3), :]
+    def gen_single_hand(self, board_features, player, undrawn_combos, res_arr):
+        if self.hi_lo:
+            res_arr[:, player, 0], res_arr[:, player, 1] = Ranker.rank_omaha_hole_cards(
+                board_features, self.hole_cards(player, undrawn_combos), low=True)
         else:
-            community_combos = np.concatenate(
-                [np.repeat([self.community_arr], len(undrawn_combos), axis=0),
-                 undrawn_combos], axis=1)[:, comb_index(5, 3), :]
-
-        hand_combos = np.repeat([self.player_hands[player + 1].card_arr], len(undrawn_combos), axis=0)[:,
-                      comb_index(4, 2), :]
-
-        cur_player_cards = np.concatenate(
-            [np.repeat(hand_combos, repeats=10, axis=1), np.concatenate(6 * [community_combos], axis=1)], axis=2)
-
-        # cur_player_cards = np.zeros(shape=(len(undrawn_combos), 60, 5, 2), dtype=np.int)
-        # for scenario in range(len(undrawn_combos)):
-        #     for i, comm in enumerate(community_combos[scenario, :, :, :]):
-        #         for j, hand in enumerate(hand_combos[scenario, :, :, :]):
-        #             cur_player_cards[scenario, i * 6 + j, :, :] = np.concatenate([comm, hand])
-
-        res_arr[:, player] = Ranker.rank_all_hands(cur_player_cards)
+            res_arr[:, player] = Ranker.rank_omaha_hole_cards(board_features, self.hole_cards(player, undrawn_combos))
 
 
 
@@ -4,6 +4,8 @@ import sys
 from dropDown import dropDownMenu
 import random
 import card
+from cache import open_store
+from utils import card_name_to_id
 
 # Pygame setup
 pygame.init()
@@ -12,6 +14,8 @@ clock = pygame.time.Clock()
 running = True
 convert = False
 num_players = int(sys.argv[1])
+# Every table window runs in its own process, so share simulation results between them and across restarts
+open_store()
 runFlop= False
 current_flop_cards=None
 win_rates= None
@@ -32,35 +36,8 @@ dropdown_menu = dropDownMenu(card_images_path, screen)
 selected_cards = []  # List to hold selected cards and their positions
 s_cards = []
 
-def convert_to_card(card_string):
-    # Split the input string assuming the format "Rank of Suit" with spaces
-    parts = card_string.split('_of_')
-    if len(parts) != 2:
-        raise ValueError(f"Invalid card format: '{card_string}'. Expected format is 'Rank of Suit'.")
-
-    rank, suit = parts  # Unpack the parts directly into rank and suit
-
-    # Define mappings for count and color
-    rank_to_count = {
-        '2': 1, '3': 2, '4': 3, '5': 4, '6': 5, '7': 6, '8': 7, '9': 8, '10': 9,
-        'Jack': 10, 'Queen': 11, 'King': 12, 'Ace': 13
-    }
-    suit_to_color = {
-        'Clubs': 1, 'Diamonds': 2, 'Hearts': 3, 'Spades': 4
-    }
-
-    # Convert rank and suit to count and color, checking if they exist in the dictionary
-    try:
-        count = rank_to_count[rank]
-        color = suit_to_color[suit.capitalize()]  # Capitalize to match key names
-    except KeyError:
-        raise ValueError(f"Unknown rank or suit in card: '{card_string}'.")
-
-    # Create a new Card instance
-    return card.Card(count, color)
-
 def convert_strings_to_cards(card_strings):
-    return [convert_to_card(card_string) for card_string in card_strings]
+    return [card_name_to_id(card_string) for card_string in card_strings]
 
 
 
@@ -102,11 +79,11 @@ while running:
                 cards = convert_strings_to_cards(s_cards)
                 # Constructing each player's hand combined with the community cards
                 player_hands = [cards[i * 2:(i + 1) * 2] for i in range(num_players)]
-                community_cards = [convert_to_card(card_name) for _, card_name in current_flop_cards]
+                community_cards = [card_name_to_id(card_name) for _, card_name in current_flop_cards]
                 hands_with_community = [hand + community_cards for hand in player_hands]
                 # Rank all hands and find the highest ranking hand
-                player_results = [card.Ranker.rank_all_hands([hand], return_all=False) for hand in hands_with_community]
-                highest_rank = max(player_results, key=lambda x: (x[0],x[1]))  # Find the highest rank
+                player_results = [card.Ranker.score_hand(hand) for hand in hands_with_community]
+                highest_rank = max(player_results)  # Find the highest rank
                 winner_index = player_results.index(highest_rank)  # Get the index of the winning hand
                 winner_message = f"Player {winner_index + 1} is the winner with the highest rank!"
             elif calculation_button_rect.collidepoint(event.pos):
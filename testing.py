@@ -3,46 +3,825 @@ from card import Ranker
 import card
 from card import create_deck, deal_hands
 from hand import Hand
+from evaluator import FLUSH_TABLE, UNIQUE_TABLE, PAIRED_TABLE, LOW_BASE, unpack_score, evaluate_five, evaluate_five_batch, evaluate_seven, evaluate_seven_batch
+from ranker import Ranker as ArrayRanker
+from utils import resolve_n_jobs, mask_to_arr, card_str_to_arr, card_arr_to_str, card_name_to_id, card_id_to_name, comb_index, num_combinations, unrank_combinations, permutation_key, permuted_ranks, num_deals, unrank_deals, sample_deals
+from table import HoldemTable, OmahaTable
+import preflop
+import isomorphism
+from cache import EquityCache, EQUITY_CACHE, EquityRecord, EquityStore, spot_key, open_store, close_store, get_store
+import multiprocessing
+import os
+import tempfile
+import tracemalloc
+from unittest import mock
+from itertools import combinations
 import numpy as np
+from exceptions import DeckException, HandException
 
 class TestPokerHandRanking(unittest.TestCase):
 
     def test_straight_flush(self):
         hand = [card.Card(10, 1), card.Card(11, 1), card.Card(12, 1), card.Card(13, 1), card.Card(9, 1)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (8, [13]), "Failed to recognize straight flush")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (8, [13]),
+                         "Failed to recognize straight flush")
 
     def test_four_of_a_kind(self):
         hand = [card.Card(3, 1), card.Card(3, 2), card.Card(3, 3), card.Card(3, 4), card.Card(5, 1)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (7, [3, 5]), "Failed to recognize four of a kind")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (7, [3, 5]),
+                         "Failed to recognize four of a kind")
 
     def test_full_house(self):
         hand = [card.Card(6, 1), card.Card(6, 2), card.Card(6, 3), card.Card(9, 1), card.Card(9, 2)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (6, [6, 9]), "Failed to recognize full house")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (6, [6, 9]), "Failed to recognize full house")
 
     def test_flush(self):
         hand = [card.Card(2, 2), card.Card(5, 2), card.Card(7, 2), card.Card(8, 2), card.Card(10, 2)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (5, [10, 8, 7, 5, 2]), "Failed to recognize flush")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (5, [10, 8, 7, 5, 2]),
+                         "Failed to recognize flush")
 
     def test_straight(self):
         hand = [card.Card(4, 1), card.Card(5, 2), card.Card(6, 3), card.Card(7, 4), card.Card(8, 1)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (4, [8]), "Failed to recognize straight")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (4, [8]), "Failed to recognize straight")
 
     def test_three_of_a_kind(self):
         hand = [card.Card(12, 1), card.Card(12, 2), card.Card(12, 3), card.Card(5, 4), card.Card(8, 1)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (3, [12, 8, 5]), "Failed to recognize three of a kind")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (3, [12, 8, 5]),
+                         "Failed to recognize three of a kind")
 
     def test_two_pairs(self):
         hand = [card.Card(9, 1), card.Card(9, 2), card.Card(5, 3), card.Card(5, 4), card.Card(7, 1)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (2, [9, 5, 7]), "Failed to recognize two pairs")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (2, [9, 5, 7]),
+                         "Failed to recognize two pairs")
 
     def test_one_pair(self):
         hand = [card.Card(4, 1), card.Card(4, 2), card.Card(6, 3), card.Card(7, 4), card.Card(8, 1)]
-        self.assertEqual(Ranker.rank_one_hand(hand), (1, [4, 8, 7, 6]), "Failed to recognize one pair")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (1, [4, 8, 7, 6]),
+                         "Failed to recognize one pair")
 
     def test_high_card(self):
         hand = [card.Card(2, 1), card.Card(4, 2), card.Card(6, 3), card.Card(8, 4), card.Card(10, 1)]
         # Note: For high card, the entire hand acts as kickers, sorted in descending order.
-        self.assertEqual(Ranker.rank_one_hand(hand), (0, [10, 8, 6, 4, 2]), "Failed to correctly identify high card")
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (0, [10, 8, 6, 4, 2]),
+                         "Failed to correctly identify high card")
+
+class TestLookupEvaluator(unittest.TestCase):
+    def test_distinct_hand_classes(self):
+        five_rank_masks = [mask for mask in range(1 << 13) if bin(mask).count("1") == 5]
+        scores = set(FLUSH_TABLE[five_rank_masks]) | set(UNIQUE_TABLE[five_rank_masks]) | set(PAIRED_TABLE.values())
+        self.assertEqual(len(scores), 7462)
+
+    def test_batch_matches_single_hand(self):
+        card_ids = np.argsort(np.random.default_rng(5).random((3000, 52)), axis=1)[:, :5].reshape(300, 10, 5)
+        hand_combos = card_ids.astype(np.uint8)
+        batch_scores = ArrayRanker.rank_all_hands(hand_combos, return_all=True)
+        expected = [[ArrayRanker.rank_one_hand(combo) for combo in hand] for hand in hand_combos]
+        np.testing.assert_array_equal(batch_scores, expected)
+        np.testing.assert_array_equal(ArrayRanker.rank_all_hands(hand_combos), np.max(expected, axis=1))
+
+    def test_wheel_is_lowest_straight(self):
+        wheel = evaluate_five(card_str_to_arr(["Ac", "2d", "3h", "4s", "5c"]).tolist())
+        six_high = evaluate_five(card_str_to_arr(["2c", "3d", "4h", "5s", "6c"]).tolist())
+        self.assertEqual(wheel // 16 ** 5, 4)
+        self.assertLess(wheel, six_high)
+
+    def test_best_of_seven_cards(self):
+        hand = [card.Card(13, 1), card.Card(13, 2), card.Card(12, 1), card.Card(12, 2),
+                card.Card(12, 3), card.Card(2, 4), card.Card(3, 1)]
+        self.assertEqual(Ranker.decode_score(Ranker.rank_one_hand(hand)), (6, [12, 13]),
+                         "Failed to pick the best full house")
+
+    def test_card_and_array_rankers_share_scores(self):
+        hand = [card.Card(13, 1), card.Card(13, 2), card.Card(12, 1), card.Card(12, 2), card.Card(2, 4)]
+        score = Ranker.rank_one_hand(hand)
+        self.assertEqual(score, ArrayRanker.rank_one_hand(np.array(card.to_card_ids(hand), dtype=np.uint8)))
+        full_house = hand[:4] + [card.Card(12, 3)]
+        self.assertEqual(Ranker.rank_all_hands([hand, full_house]), Ranker.score_hand(full_house))
+        self.assertEqual(Ranker.decode_score(Ranker.rank_all_hands([hand, full_house])), (6, [12, 13]))
+
+class TestSevenCardEvaluator(unittest.TestCase):
+    def test_matches_best_five_card_subset(self):
+        card_ids = np.argsort(np.random.default_rng(7).random((2000, 52)), axis=1)[:, :7]
+        batch_scores = evaluate_seven_batch(card_ids)
+        for i in range(len(card_ids)):
+            expected = max(evaluate_five(card_ids[i, list(combo)].tolist()) for combo in combinations(range(7), 5))
+            self.assertEqual(evaluate_seven(card_ids[i].tolist()), expected)
+            self.assertEqual(batch_scores[i], expected)
+
+    def test_view_result(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7s", "8s"])
+        table.add_to_community(["2s", "9s", "Ts", "Ac", "3d"])
+        self.assertEqual(table.view_result(), "Player 2 wins with a Flush")
+
+    def test_board_features_plus_hole_cards_match_full_evaluation(self):
+        rng = np.random.default_rng(1)
+        card_ids = np.argpartition(rng.random((2000, 52)), 7, axis=1)[:, :7].astype(np.uint8)
+        hole_cards = card_ids[0, 5:]
+        boards = card_ids[:, :5][~np.isin(card_ids[:, :5], hole_cards).any(axis=1)]
+        board_features = ArrayRanker.board_features(boards)
+        full_scores = evaluate_seven_batch(np.concatenate([boards, np.tile(hole_cards, (len(boards), 1))], axis=1))
+        np.testing.assert_array_equal(ArrayRanker.rank_hole_cards(board_features, hole_cards), full_scores)
+
+class TestOmahaEvaluator(unittest.TestCase):
+    def test_matches_best_two_plus_three_combination(self):
+        card_ids = np.argsort(np.random.default_rng(8).random((300, 52)), axis=1)[:, :9].astype(np.uint8)
+        for board_size in (3, 4, 5):
+            boards, hole_cards = card_ids[:, :board_size], card_ids[:, 5:]
+            for i in range(len(card_ids)):
+                scores = ArrayRanker.rank_omaha_hole_cards(ArrayRanker.omaha_board_features(boards[i:i + 1]),
+                                                           hole_cards[i])
+                expected = max(evaluate_five(list(pair) + list(triple))
+                               for pair in combinations(hole_cards[i].tolist(), 2)
+                               for triple in combinations(boards[i].tolist(), 3))
+                self.assertEqual(scores[0], expected)
+
+    def test_table_scores_match_combination_tensor(self):
+        table = OmahaTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad", "Kh", "Qh"])
+        table.add_to_hand(2, ["7h", "8h", "9d", "Tc"])
+        community_cards, undrawn_combos, _ = table.simulation_preparation(500, np.random.default_rng(9))
+        res_arr = table.simulate_calculation(community_cards, undrawn_combos)
+        hole_pairs = comb_index(4, 2)
+        for player in range(2):
+            pair_combos = np.repeat(table.player_hands[player + 1].card_arr[hole_pairs][None], len(undrawn_combos),
+                                    axis=0)
+            hand_combos = np.concatenate([pair_combos.repeat(10, axis=1),
+                                          np.tile(undrawn_combos[:, comb_index(5, 3)], (1, 6, 1))], axis=2)
+            np.testing.assert_array_equal(res_arr[:, player], ArrayRanker.rank_all_hands(hand_combos))
+
+    def test_five_and_six_card_omaha(self):
+        for hand_limit, hands in ((5, (["As", "Ad", "Kh", "Qh", "2c"], ["7h", "8h", "9d", "Tc", "Js"])),
+                                  (6, (["As", "Ad", "Kh", "Qh", "2c", "3c"], ["7h", "8h", "9d", "Tc", "Js", "4d"]))):
+            table = OmahaTable(num_players=2, hand_limit=hand_limit)
+            self.assertEqual(table.combos_per_scenario, num_combinations(hand_limit, 2) * 10)
+            table.add_to_hand(1, hands[0])
+            table.add_to_hand(2, hands[1])
+            community_cards, undrawn_combos, _ = table.simulation_preparation(200, np.random.default_rng(10))
+            res_arr = table.simulate_calculation(community_cards, undrawn_combos)
+            for scenario in range(len(undrawn_combos)):
+                for player in range(2):
+                    hand_combos = table.player_hands[player + 1].hand_combos(undrawn_combos[scenario])
+                    self.assertEqual(hand_combos.shape[1], num_combinations(hand_limit, 2) * 10)
+                    self.assertEqual(res_arr[scenario, player], ArrayRanker.rank_all_hands(hand_combos)[0])
+                    self.assertEqual(table.player_hands[player + 1].hand_value(undrawn_combos[scenario]),
+                                     res_arr[scenario, player])
+        for hand_limit in (1, 2, 3):
+            with self.assertRaises(HandException):
+                OmahaTable(num_players=2, hand_limit=hand_limit)
+
+class TestOmahaHiLo(unittest.TestCase):
+    @staticmethod
+    def best_low(hole_cards, board):
+        lows = []
+        for pair in combinations(hole_cards, 2):
+            for triple in combinations(board, 3):
+                values = sorted((1 if card >> 2 == 12 else (card >> 2) + 2 for card in pair + triple), reverse=True)
+                if len(set(values)) == 5 and values[0] <= 8:
+                    lows.append(values)
+        return min(lows) if lows else None
+
+    def test_low_scores_match_brute_force(self):
+        rng = np.random.default_rng(12)
+        # Deal mostly low cards so that most boards make a low
+        low_deck = np.concatenate([np.arange(28), np.arange(48, 52)])
+        for _ in range(300):
+            card_ids = rng.permutation(low_deck if rng.random() < 0.7 else np.arange(52))[:9].astype(np.uint8)
+            board, hole_cards = card_ids[:5], card_ids[5:]
+            high, low = ArrayRanker.rank_omaha_hole_cards(ArrayRanker.omaha_board_features(board[None]), hole_cards,
+                                                          low=True)
+            expected = self.best_low(hole_cards.tolist(), board.tolist())
+            if expected is None:
+                self.assertEqual(low[0], 0)
+            else:
+                self.assertEqual(low[0], LOW_BASE - int(''.join(map(str, expected)), 16))
+            self.assertEqual(high[0], ArrayRanker.rank_omaha_hole_cards(
+                ArrayRanker.omaha_board_features(board[None]), hole_cards)[0])
+
+    def test_scoop_half_and_quarter(self):
+        table = OmahaTable(num_players=3, hi_lo=True)
+        # Player 1 scoops, then players 1 and 2 split the high while player 2 wins the low alone, then player 3
+        # wins the high while players 1 and 2 tie for the low, then no low qualifies and player 2 wins the high, then
+        # every player ties for the high and no low qualifies
+        res_arr = np.array([[[9, 5], [3, 1], [1, 0]],
+                            [[9, 1], [9, 5], [1, 0]],
+                            [[1, 4], [2, 4], [9, 0]],
+                            [[1, 0], [9, 0], [2, 0]],
+                            [[9, 0], [9, 0], [9, 0]]], dtype=np.int32)
+        counts = table.tally("hi_lo", res_arr).outcomes
+        self.assertEqual(counts["Player 1 Scoop"], 1)
+        self.assertEqual(counts["Player 1 Quarter"], 2)
+        self.assertEqual(counts["Player 2 Scoop"], 1)
+        self.assertEqual(counts["Player 2 Three Quarters"], 1)
+        self.assertEqual(counts["Player 2 Quarter"], 1)
+        self.assertEqual(counts["Player 3 Half"], 1)
+        for player in range(1, 4):
+            self.assertEqual(counts[f"Player {player} Split"], 1)
+        self.assertAlmostEqual(counts["Player 2 Share"], 0.75 + 0.25 + 1 + 1 / 3)
+        self.assertAlmostEqual(sum(counts[f"Player {player} Share"] for player in range(1, 4)), 5)
+
+    def test_high_and_tied_low_is_three_quarters(self):
+        table = OmahaTable(num_players=2, hi_lo=True)
+        table.add_to_hand(1, ["Kh", "Kd", "As", "4s"])
+        table.add_to_hand(2, ["Ac", "4c", "9h", "Td"])
+        table.add_to_community(["2c", "3d", "7h", "Kc", "Ks"])
+        outcome_dict = table.simulate(odds_type="hi_lo")
+        self.assertEqual(outcome_dict["Player 1 Three Quarters"], 100)
+        self.assertEqual(outcome_dict["Player 2 Quarter"], 100)
+        self.assertEqual(outcome_dict["Player 1 Share"], 75)
+
+    def test_simulated_pot_shares(self):
+        table = OmahaTable(num_players=2, hi_lo=True)
+        table.add_to_hand(1, ["As", "2s", "3d", "Kh"])
+        table.add_to_hand(2, ["Ks", "Kd", "Qh", "Jc"])
+        outcome_dict = table.simulate(num_scenarios=5000, odds_type="hi_lo", seed=4)
+        self.assertAlmostEqual(outcome_dict["Player 1 Share"] + outcome_dict["Player 2 Share"], 100, delta=0.05)
+        self.assertEqual(outcome_dict["Player 2 Quarter"], 0)
+        self.assertNotEqual(table.cache_key(()), OmahaTable(num_players=2).cache_key(()))
+
+class TestShortDeck(unittest.TestCase):
+    def score(self, cards, short_deck=True):
+        return int(evaluate_seven_batch(card_str_to_arr(cards.split())[None], short_deck)[0])
+
+    def test_flush_beats_full_house(self):
+        flush, full_house = "Ah Kh 9h 7h 6h 6c 6d", "6s 6c 6d 7c 7d 8s 9s"
+        self.assertGreater(self.score(flush), self.score(full_house))
+        self.assertLess(self.score(flush, short_deck=False), self.score(full_house, short_deck=False))
+        self.assertEqual(unpack_score(self.score(flush), short_deck=True), (6, [14, 13, 9, 7, 6]))
+        self.assertEqual(unpack_score(self.score(full_house), short_deck=True), (5, [6, 7]))
+
+    def test_ace_six_wheel(self):
+        wheel = self.score("As 6c 7d 8h 9s")
+        self.assertEqual(wheel // 16 ** 5, 4)
+        self.assertLess(wheel, self.score("6s 7c 8d 9h Ts"))
+        self.assertGreater(wheel, self.score("As Ac Ad Kh Qs"))
+        self.assertEqual(self.score("As 6c 7d 8h 9h 9c 9d") // 16 ** 5, 4)
+        self.assertEqual(self.score("Ah 6h 7h 8h 9h") // 16 ** 5, 8)
+
+    def test_hand_names(self):
+        table = HoldemTable(num_players=2, deck_type="short")
+        table.add_to_hand(1, ["Ah", "Kh"])
+        table.add_to_hand(2, ["6s", "6c"])
+        table.add_to_community(["6d", "Kd", "Kc", "9h", "7h"])
+        self.assertEqual(table.view_result(), "Player 2 wins with a Full House")
+        self.assertTrue(table.player_hands[2].hand_evaluation(table.community_arr).startswith("Full House"))
+
+    def test_simulate_enumerates_by_default(self):
+        EQUITY_CACHE.clear()
+        table = HoldemTable(num_players=2, deck_type="short")
+        table.add_to_hand(1, ["As", "Ks"])
+        table.add_to_hand(2, ["7h", "7d"])
+        table.add_to_community(["Ah"])
+        outcome_dict = table.simulate()
+        EQUITY_CACHE.clear()
+        self.assertEqual(outcome_dict, table.simulate(num_scenarios="all"))
+        self.assertAlmostEqual(outcome_dict["Player 1 Win"] + outcome_dict["Player 2 Win"]
+                               + outcome_dict["Player 1 Tie"], 100, delta=0.02)
+
+class TestCardEncoding(unittest.TestCase):
+    def test_every_layer_agrees_on_card_ids(self):
+        card_strs = ["2c", "2d", "Th", "As"]
+        card_ids = card_str_to_arr(card_strs)
+        self.assertEqual(card_ids.dtype, np.uint8)
+        self.assertEqual(card_ids.tolist(), [0, 1, 34, 51])
+        self.assertEqual(card_arr_to_str(card_ids), card_strs)
+        self.assertEqual([card_name_to_id(card_id_to_name(card_id)) for card_id in range(52)], list(range(52)))
+        self.assertEqual(card_name_to_id("10_of_hearts"), 34)
+        self.assertEqual(sorted(deck_card.id for deck_card in create_deck()), list(range(52)))
+        self.assertEqual(card.Card(13, 4).id, 51)
+
+class TestCompactDtypes(unittest.TestCase):
+    def test_simulation_arrays_are_compact(self):
+        self.assertEqual(comb_index(52, 5).dtype, np.uint8)
+        self.assertEqual(unrank_combinations(np.arange(10), 48, 5).dtype, np.uint8)
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        community_cards, undrawn_combos, _ = table.simulation_preparation(100, np.random.default_rng(0))
+        self.assertEqual(undrawn_combos.dtype, np.uint8)
+        self.assertEqual(table.simulate_calculation(community_cards, undrawn_combos).dtype, np.int32)
+        self.assertEqual(evaluate_seven_batch(card_str_to_arr(["As", "Ks", "Qs", "Js", "Ts"])[None]).dtype, np.int32)
+
+class TestCardFlyweight(unittest.TestCase):
+    def test_cards_are_interned(self):
+        self.assertIs(card.Card(13, 4), card.Card(13, 4))
+        self.assertIs(card.card_from_id(51), card.Card(13, 4))
+        self.assertEqual(len(set(create_deck())), 52)
+        self.assertEqual({card.Card(1, 1): "2c"}[card.Card(1, 1)], "2c")
+
+    def test_cards_are_immutable_and_validated(self):
+        with self.assertRaises(AttributeError):
+            card.Card(1, 1).count = 2
+        with self.assertRaises(ValueError):
+            card.Card(14, 1)
+        with self.assertRaises(ValueError):
+            card.Card(1, 5)
+
+class TestMonteCarlo(unittest.TestCase):
+    def test_deal_boards_without_replacement(self):
+        deck = np.arange(4, 52, dtype=np.uint8)
+        boards = card.deal_boards(deck, 5, 2000, rng=np.random.default_rng(1))
+        self.assertEqual(boards.shape, (2000, 5))
+        self.assertTrue(np.isin(boards, deck).all())
+        self.assertTrue((np.diff(np.sort(boards, axis=1), axis=1) > 0).all())
+
+    def test_simulate_poker_games(self):
+        aces_vs_seven_deuce = card_str_to_arr(["As", "Ah", "7c", "2d"]).tolist()
+        win_rates = card.simulate_poker_games(aces_vs_seven_deuce, 2)
+        self.assertAlmostEqual(win_rates[0], 0.88, delta=0.03)
+        self.assertAlmostEqual(win_rates[1], 0.12, delta=0.03)
+
+    def test_complete_board_is_deterministic(self):
+        hands = card_str_to_arr(["As", "Ah", "7c", "2d"]).tolist()
+        board = card_str_to_arr(["7s", "7h", "2c", "Kd", "3s"]).tolist()
+        self.assertEqual(card.simulate_poker_game_with_community_card(hands, 2, board), [0.0, 1.0])
+
+    def test_exact_mode_on_the_turn(self):
+        hands = card_str_to_arr(["As", "Ah", "Ks", "Kh"]).tolist()
+        board = card_str_to_arr(["2c", "7d", "9s", "Kc"]).tolist()
+        win_rates = card.simulate_poker_game_with_community_card(hands, 2, board)
+        self.assertEqual([win_rate * 44 for win_rate in win_rates], [2, 42])
+        flop_win_rates = card.simulate_poker_game_with_community_card(hands, 2, board[:3])
+        self.assertAlmostEqual(flop_win_rates[0], 907 / 990)
+
+class TestAdaptiveSampling(unittest.TestCase):
+    def test_card_simulation_reaches_precision(self):
+        hands = card_str_to_arr(["As", "Kh", "Qc", "Jd"]).tolist()
+        win_rates, std_errors = card.simulate_poker_games(hands, 2, precision=0.005)
+        self.assertEqual(len(win_rates), 2)
+        self.assertLessEqual(max(std_errors), 0.005)
+        self.assertAlmostEqual(win_rates[0], 0.64, delta=0.03)
+
+    def test_table_reports_error_bars(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        outcome_dict, error_dict = table.simulate(precision=1)
+        self.assertEqual(outcome_dict.keys(), error_dict.keys())
+        self.assertLessEqual(max(error_dict.values()), 1)
+        table.add_to_community(["Ks", "9d", "3c"])
+        outcome_dict, error_dict = table.simulate(precision=1)
+        self.assertEqual(set(error_dict.values()), {0.0})
+
+class TestShardedSimulation(unittest.TestCase):
+    # The estimates are computed directly, as going through `simulate` would answer repeated queries from the equity
+    # cache without running the shards again
+    def test_card_simulation_is_reproducible(self):
+        hands = card_str_to_arr(["As", "Ad", "7h", "2c"]).reshape(2, 2)
+        first, _, _ = card.estimate_win_rates(hands, [], n_jobs=2, seed=11)
+        np.testing.assert_array_equal(first, card.estimate_win_rates(hands, [], n_jobs=2, seed=11)[0])
+        self.assertFalse(np.array_equal(first, card.estimate_win_rates(hands, [], n_jobs=2, seed=12)[0]))
+        self.assertAlmostEqual(first[0], 0.88, delta=0.02)
+
+    def test_table_shards_are_reproducible(self):
+        for table_type, hands in ((HoldemTable, (["As", "Ad"], ["7h", "2c"])),
+                                  (OmahaTable, (["As", "Ad", "Kh", "Qh"], ["7h", "2c", "8d", "9s"]))):
+            table = table_type(num_players=2)
+            table.add_to_hand(1, hands[0])
+            table.add_to_hand(2, hands[1])
+            first = table.estimate_outcomes(num_scenarios=4000, n_jobs=2, seed=3)
+            self.assertEqual(first, table.estimate_outcomes(num_scenarios=4000, n_jobs=2, seed=3))
+            self.assertNotEqual(first, table.estimate_outcomes(num_scenarios=4000, n_jobs=2, seed=4))
+            self.assertEqual(table.estimate_outcomes(num_scenarios=4000, seed=3),
+                             table.estimate_outcomes(num_scenarios=4000, seed=3))
+
+    def test_sharded_enumeration_matches_single_process(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        table.add_to_community(["Ks", "9d", "3c"])
+        self.assertEqual(table.estimate_outcomes(num_scenarios='all', n_jobs=2),
+                         table.estimate_outcomes(num_scenarios='all'))
+
+    def test_sharded_workers_rank_players_in_one_thread(self):
+        table = HoldemTable(num_players=3)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        table.add_to_hand(3, ["Kc", "Qc"])
+        threaded = table.simulate_shard("tie_win", 500, np.random.SeedSequence(5))
+        with mock.patch("table.Parallel") as pool:
+            single = table.simulate_shard("tie_win", 500, np.random.SeedSequence(5), player_jobs=1)
+        pool.assert_not_called()
+        self.assertEqual(threaded.num_scenarios, single.num_scenarios)
+        for outcome, count in threaded.outcomes.items():
+            np.testing.assert_array_equal(count, single.outcomes[outcome])
+
+    def test_resolve_n_jobs_follows_joblib(self):
+        cpus = multiprocessing.cpu_count()
+        self.assertEqual(resolve_n_jobs(3), 3)
+        self.assertEqual(resolve_n_jobs(-1), cpus)
+        self.assertEqual(resolve_n_jobs(-2), max(cpus - 1, 1))
+        self.assertEqual(resolve_n_jobs(-cpus - 5), 1)
+        with self.assertRaises(ValueError):
+            resolve_n_jobs(0)
+
+class TestPreflopTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.default_path = preflop.PREFLOP_TABLE_PATH
+        EQUITY_CACHE.clear()
+        preflop.PREFLOP_TABLE_PATH = os.path.join(cls.temp_dir.name, "preflop_equity.npy")
+        np.save(preflop.PREFLOP_TABLE_PATH, preflop.build_preflop_table(num_boards=100, seed=0))
+
+    @classmethod
+    def tearDownClass(cls):
+        preflop._loaded_tables.clear()
+        EQUITY_CACHE.clear()
+        preflop.PREFLOP_TABLE_PATH = cls.default_path
+        cls.temp_dir.cleanup()
+
+    def test_classes_and_suit_patterns(self):
+        hands = [list(hand) for hand in combinations(range(52), 2)]
+        self.assertEqual(len({preflop.hand_class(hand) for hand in hands}), 169)
+        ak_hearts, qj_hearts, qj_spades = (card_str_to_arr(cards).tolist() for cards in
+                                           (["Ah", "Kh"], ["Qh", "Jh"], ["Qs", "Js"]))
+        self.assertNotEqual(preflop.suit_pattern(ak_hearts, qj_hearts), preflop.suit_pattern(ak_hearts, qj_spades))
+        self.assertEqual(preflop.suit_pattern(ak_hearts, qj_spades),
+                         preflop.suit_pattern(card_str_to_arr(["Ac", "Kc"]).tolist(), qj_hearts))
+        aces, kings, relabelled_aces, relabelled_kings = (card_str_to_arr(cards).tolist() for cards in
+                                                          (["Ac", "Ad"], ["Kd", "Kh"], ["Ah", "Ad"], ["Kc", "Kd"]))
+        self.assertEqual(preflop.suit_pattern(aces, kings), preflop.suit_pattern(relabelled_aces, relabelled_kings))
+
+    def test_board_outcomes_match_direct_evaluation(self):
+        boards = np.argsort(np.random.default_rng(2).random((20, 52)), axis=1)[:, :5].astype(np.uint8)
+        wins, ties, played = preflop.count_board_outcomes(boards)
+        first = preflop._HANDS.tolist().index(preflop.order_hand(card_str_to_arr(["As", "Ad"]).tolist()))
+        second = preflop._HANDS.tolist().index(preflop.order_hand(card_str_to_arr(["7h", "2c"]).tolist()))
+        expected = [0, 0, 0]
+        for board in boards.tolist():
+            if set(board) & set(preflop._HANDS[first].tolist() + preflop._HANDS[second].tolist()):
+                continue
+            score_a = evaluate_seven(preflop._HANDS[first].tolist() + board)
+            score_b = evaluate_seven(preflop._HANDS[second].tolist() + board)
+            expected = [expected[0] + (score_a > score_b), expected[1] + (score_a == score_b), expected[2] + 1]
+        self.assertEqual([wins[first, second], ties[first, second], played[first, second]], expected)
+
+    def test_canonical_boards_count_like_every_board(self):
+        boards = card_str_to_arr(["As", "Ks", "7h", "7d", "2c", "Qh", "Jh", "Th", "3h", "3c"]).reshape(2, 5)
+        orbits = [np.unique(np.sort([isomorphism.permute_suits(board, suit_map) for suit_map in isomorphism.SUIT_MAPS],
+                                    axis=1), axis=0) for board in boards]
+        every_board = preflop.pool_matchups(*preflop.count_board_outcomes(np.concatenate(orbits).astype(np.uint8)))
+        weights = np.array([len(orbit) for orbit in orbits])
+        weighted = preflop.pool_matchups(*preflop.count_board_outcomes(boards, weights))
+        np.testing.assert_allclose(weighted, every_board, equal_nan=True)
+
+    def test_simulators_answer_from_table(self):
+        win, tie, _ = preflop.preflop_equity(card_str_to_arr(["As", "Ad"]).tolist(),
+                                             card_str_to_arr(["7h", "2c"]).tolist())
+        self.assertAlmostEqual(win, 0.88, delta=0.05)
+        win_rates = card.simulate_poker_games(card_str_to_arr(["As", "Ad", "7h", "2c"]).tolist(), 2)
+        self.assertAlmostEqual(win_rates[0], win + tie, places=6)
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        outcome_dict = table.simulate()
+        self.assertEqual(outcome_dict["Player 1 Win"], np.round(win * 100, 2))
+        self.assertEqual(table.simulate(precision=10), (outcome_dict, table.preflop_lookup("tie_win", 10)[1]))
+
+    def test_hi_lo_queries_are_simulated(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        self.assertEqual(list(table.preflop_lookup("precise")), ['Player 1 Win', 'Player 2 Win', 'Player 1,2 Tie'])
+        self.assertIsNone(table.preflop_lookup("hi_lo"))
+        self.assertEqual(table.simulate(20000, odds_type="hi_lo").keys(),
+                         table.estimate_outcomes(20000, odds_type="hi_lo").rates[0].keys())
+
+class TestSuitIsomorphism(unittest.TestCase):
+    def test_canonical_form_ignores_suit_labels(self):
+        spot = [card_str_to_arr(["Ah", "Kh"]).tolist(), card_str_to_arr(["Qs", "Qd"]).tolist(),
+                card_str_to_arr(["2h", "7c", "9s"]).tolist()]
+        relabelled = [isomorphism.permute_suits(group, (3, 2, 0, 1)).tolist() for group in spot]
+        canonical_groups, suit_map = isomorphism.canonicalize(spot)
+        self.assertEqual(isomorphism.canonicalize(relabelled)[0], canonical_groups)
+        self.assertEqual([sorted(group) for group in isomorphism.restore(canonical_groups, suit_map)],
+                         [sorted(group) for group in spot])
+        self.assertEqual(len(isomorphism.stabilizer(spot)), 1)
+        self.assertEqual(len(isomorphism.stabilizer(spot[:1])), 6)
+
+    def test_collapsed_enumeration_matches_full_enumeration(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["Ks", "Kd"])
+        table.add_to_community(["2h", "7h", "9c"])
+        community_cards, undrawn_combos, weights = table.simulation_preparation('all')
+        self.assertLess(len(undrawn_combos), 990)
+        self.assertEqual(weights.sum(), 990)
+
+        all_combos = table.deck_arr[np.array(list(combinations(range(len(table.deck_arr)), 2)))]
+        res_arr = table.simulate_calculation(np.repeat([table.community_arr], 990, axis=0), all_combos)
+        for odds_type in ("win_any", "tie_win", "precise"):
+            self.assertEqual(table.simulate(num_scenarios='all', odds_type=odds_type),
+                             table.simulation_analysis(odds_type, res_arr))
+        self.assertEqual(table.simulate(num_scenarios='all', final_hand=True)[1],
+                         table.hand_strength_analysis(res_arr))
+
+class TestEquityCache(unittest.TestCase):
+    def setUp(self):
+        EQUITY_CACHE.clear()
+
+    def test_lru_eviction_and_limits(self):
+        cache = EquityCache(max_entries=2)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        self.assertEqual(cache.get("a"), [1.0])
+        cache.put("c", [3.0])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+        cache = EquityCache(max_bytes=200)
+        for key in range(10):
+            cache.put(key, [0.5] * 5)
+        self.assertLessEqual(cache.stats()["bytes"], 200)
+        self.assertGreater(cache.evictions, 0)
+        cache.get(9).append(1.0)
+        self.assertEqual(cache.get(9), [0.5] * 5)
+
+    def test_equivalent_spots_share_a_key(self):
+        self.assertEqual(spot_key("holdem", [[48, 49], [20, 21]], [0, 5, 10]),
+                         spot_key("holdem", [[50, 51], [22, 23]], [2, 7, 8]))
+        self.assertNotEqual(spot_key("holdem", [[48, 49], [20, 21]]), spot_key("holdem", [[20, 21], [48, 49]]))
+
+    def test_engines_reuse_cached_results(self):
+        win_rates = card.simulate_poker_games(card_str_to_arr(["As", "Ad", "7h", "2c"]).tolist(), 2)
+        self.assertEqual(card.simulate_poker_games(card_str_to_arr(["Ah", "Ac", "7d", "2s"]).tolist(), 2), win_rates)
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Kd"])
+        table.add_to_hand(2, ["7h", "7c"])
+        outcome_dict = table.simulate(num_scenarios=2000)
+        self.assertEqual(table.simulate(num_scenarios=2000), outcome_dict)
+        self.assertEqual(EQUITY_CACHE.stats()["hits"], 2)
+
+def merge_into_store(path, num_merges):
+    store = EquityStore(path)
+    for _ in range(num_merges):
+        store.merge(("spot",), EquityRecord([[0.5]], 100, False))
+    store.close()
+
+
+class TestEquityStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "equity.sqlite3")
+        open_store(self.path)
+        EQUITY_CACHE.clear()
+
+    def tearDown(self):
+        close_store()
+        EQUITY_CACHE.clear()
+        self.temp_dir.cleanup()
+
+    def test_table_results_are_reused_and_refined(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Kd"])
+        table.add_to_hand(2, ["7h", "7c"])
+        outcome_dict = table.simulate(num_scenarios=2000)
+        EQUITY_CACHE.clear()
+        self.assertEqual(table.simulate(num_scenarios=2000), outcome_dict)
+        store_key = table.cache_key(("outcomes", "tie_win", False))
+        self.assertEqual(get_store().get(store_key).num_samples, 2000)
+        table.simulate(num_scenarios=5000)
+        self.assertEqual(get_store().get(store_key).num_samples, 5000)
+
+    def test_win_rates_keep_error_bars(self):
+        hands = card_str_to_arr(["As", "Ad", "7h", "2c"]).tolist()
+        card.simulate_poker_games(hands, 2)
+        EQUITY_CACHE.clear()
+        win_rates, std_errors = card.simulate_poker_games(hands, 2, precision=0.01)
+        record = get_store().get(spot_key("holdem", np.array([hands[:2], hands[2:]]), [], query=("win_rates",)))
+        self.assertEqual(record.num_samples, card.NUM_GAMES)
+        self.assertLessEqual(max(std_errors), 0.01)
+        self.assertEqual(win_rates, record.rates[0])
+
+        flop = card_str_to_arr(["Ks", "9d", "3c"]).tolist()
+        card.simulate_poker_game_with_community_card(hands, 2, flop)
+        self.assertTrue(get_store().get(spot_key("holdem", np.array([hands[:2], hands[2:]]), flop,
+                                                 query=("win_rates",))).exact)
+
+    def test_concurrent_writers_add_up(self):
+        processes = [multiprocessing.Process(target=merge_into_store, args=(self.path, 10)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(get_store().get(("spot",)).num_samples, 4000)
+
+class TestCombinationSampling(unittest.TestCase):
+    def test_unranking_matches_enumeration(self):
+        all_combos = unrank_combinations(np.arange(792), 12, 5)
+        self.assertEqual(sorted(map(tuple, all_combos.tolist())), list(map(tuple, comb_index(12, 5).tolist())))
+
+    def test_samples_are_distinct_combinations(self):
+        for n, num_samples in ((48, 50000), (12, 700)):
+            total = num_combinations(n, 5)
+            ranks = permuted_ranks(total, range(num_samples), permutation_key(np.random.default_rng(4)))
+            self.assertEqual(len(np.unique(ranks)), num_samples)
+            self.assertTrue(0 <= ranks.min() and ranks.max() < total)
+            combos = unrank_combinations(ranks, n, 5)
+            self.assertTrue((np.diff(combos, axis=1) > 0).all())
+
+    def test_permuted_ranks_cover_every_rank_once(self):
+        key = permutation_key(np.random.default_rng(7))
+        for total in (1, 2, 792, 1000):
+            np.testing.assert_array_equal(np.sort(permuted_ranks(total, range(total), key)), np.arange(total))
+        np.testing.assert_array_equal(permuted_ranks(792, range(300), key),
+                                      np.concatenate([permuted_ranks(792, range(0, 120), key),
+                                                      permuted_ranks(792, range(120, 300), key)]))
+        self.assertFalse(np.array_equal(permuted_ranks(792, range(300), key),
+                                        permuted_ranks(792, range(300), permutation_key(np.random.default_rng(8)))))
+        self.assertAlmostEqual(permuted_ranks(10 ** 6, range(20000), key).mean() / 10 ** 6, 0.5, delta=0.01)
+
+    def test_preparation_only_builds_sampled_runouts(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        community_cards, undrawn_combos, weights = table.simulation_preparation(1000, np.random.default_rng(0))
+        self.assertEqual(undrawn_combos.shape, (1000, 5))
+        self.assertIsNone(weights)
+        self.assertTrue(np.isin(undrawn_combos, table.deck_arr).all())
+
+    def test_sampled_runouts_are_distinct_across_chunks(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        table.add_to_community(["Ks", "9d", "3c"])
+        key = permutation_key(np.random.default_rng(1))
+        ranks = np.concatenate([table.sample_runouts(range(start, start + 100), key) for start in range(0, 900, 100)])
+        self.assertEqual(len(np.unique(ranks)), 900)
+        np.testing.assert_array_equal(ranks, table.sample_runouts(range(900), key))
+
+class TestUnknownHands(unittest.TestCase):
+    def test_deals_are_enumerated_once(self):
+        deals = unrank_deals(np.arange(num_deals(7, [2, 1, 2])), 7, [2, 1, 2])
+        self.assertEqual(len(deals), 21 * 5 * 6)
+        groups = {(tuple(deal[:2]), deal[2], tuple(deal[3:])) for deal in deals.tolist()}
+        self.assertEqual(len(groups), len(deals))
+        self.assertTrue(all(len(set(deal)) == 5 for deal in deals.tolist()))
+        sampled = sample_deals(50, 21, 2000, np.random.default_rng(2))
+        self.assertEqual(sampled.shape, (2000, 21))
+        self.assertTrue((np.diff(np.sort(sampled, axis=1), axis=1) > 0).all())
+
+    def test_river_against_unknown_hand_is_exact(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Kd"])
+        table.add_to_community(["Ah", "7c", "2d", "9s", "Tc"])
+        self.assertEqual(table.num_runouts(), 990)
+        hero = evaluate_seven_batch(np.concatenate([table.player_hands[1].card_arr, table.community_arr])[None])[0]
+        villains = evaluate_seven_batch(np.array([np.concatenate([hole_cards, table.community_arr])
+                                                  for hole_cards in combinations(table.deck_arr, 2)]))
+        expected = np.round(((hero > villains).sum() + (hero == villains).sum() / 2) / len(villains) * 100, 2)
+        self.assertEqual(table.simulate(odds_type="pot_share")["Player 1 Share"], expected)
+
+    def test_hero_against_random_hands(self):
+        table = HoldemTable(num_players=9)
+        table.add_to_hand(1, ["As", "Ad"])
+        outcome_dict = table.simulate(num_scenarios=20000, odds_type="pot_share", seed=3)
+        self.assertAlmostEqual(sum(outcome_dict.values()), 100, delta=0.05)
+        self.assertAlmostEqual(outcome_dict["Player 1 Share"], 34.7, delta=1.5)
+        self.assertAlmostEqual(outcome_dict["Player 2 Share"], outcome_dict["Player 9 Share"], delta=1.5)
+
+    def test_partially_known_omaha_hands(self):
+        table = OmahaTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad", "Kh", "Qh"])
+        table.add_to_hand(2, ["7c", "8c"])
+        community_cards, undrawn_combos, _ = table.simulation_preparation(300, np.random.default_rng(5))
+        self.assertEqual(undrawn_combos.shape, (300, 7))
+        res_arr = table.simulate_calculation(community_cards, undrawn_combos)
+        hole_cards = table.hole_cards(1, undrawn_combos)
+        for scenario in range(len(undrawn_combos)):
+            board_features = ArrayRanker.omaha_board_features(undrawn_combos[scenario:scenario + 1, :5])
+            self.assertEqual(res_arr[scenario, 1],
+                             ArrayRanker.rank_omaha_hole_cards(board_features, hole_cards[scenario])[0])
+        with self.assertRaises(HandException):
+            OmahaTable(num_players=9, deck_type="short", hand_limit=6).simulate(1000)
+
+    def test_hole_card_count_is_part_of_the_cache_key(self):
+        EQUITY_CACHE.clear()
+        tables = {}
+        for hand_limit in (4, 5):
+            table = OmahaTable(num_players=2, hand_limit=hand_limit)
+            table.add_to_hand(1, ["As", "Ad", "Kh", "Qh"])
+            table.add_to_hand(2, ["7c", "8c", "9d", "Td"])
+            table.add_to_community(["Jc", "Qd", "6s", "3h", "9c"])
+            tables[hand_limit] = table
+        plo4 = tables[4].simulate(odds_type="pot_share")
+        plo5 = tables[5].simulate(odds_type="pot_share")
+        self.assertNotEqual(tables[4].cache_key(()), tables[5].cache_key(()))
+        self.assertNotEqual(plo4, plo5)
+        EQUITY_CACHE.clear()
+        self.assertEqual(tables[5].simulate(odds_type="pot_share"), plo5)
+
+class TestChunkedSimulation(unittest.TestCase):
+    def test_chunked_sampling_matches_single_chunk(self):
+        for table_type, hands in ((HoldemTable, (["As", "Ad"], ["7h", "2c"])),
+                                  (OmahaTable, (["As", "Ad", "Kh", "Qh"], ["7h", "2c", "8d", "9s"]))):
+            table = table_type(num_players=2)
+            table.add_to_hand(1, hands[0])
+            table.add_to_hand(2, hands[1])
+            chunked = table.estimate_outcomes(3000, "precise", final_hand=True, seed=5, memory_budget=100000)
+            self.assertEqual(chunked, table.estimate_outcomes(3000, "precise", final_hand=True, seed=5))
+
+    def test_chunked_enumeration_matches_single_chunk(self):
+        table = HoldemTable(num_players=3)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        table.add_to_hand(3, ["Kh", "Qh"])
+        table.add_to_community(["Ks", "9d", "3c"])
+        chunked = table.estimate_outcomes('all', "tie_win", final_hand=True, memory_budget=10000)
+        self.assertTrue(chunked.exact)
+        self.assertEqual(chunked, table.estimate_outcomes('all', "tie_win", final_hand=True))
+
+    def test_sampled_peak_memory_does_not_grow_with_scenarios(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        peaks = []
+        for num_scenarios in (20000, 200000):
+            tracemalloc.start()
+            table.estimate_outcomes(num_scenarios, seed=1, memory_budget=2 * 1024 ** 2)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], 1.5 * peaks[0])
+
+    def test_chunk_size_follows_memory_budget(self):
+        table = OmahaTable(num_players=3)
+        budget = 3 * OmahaTable.scenario_bytes * 100
+        # Undealt hands also count the memory of dealing them
+        self.assertLess(table.chunk_size(budget), 100)
+        for player, hand in enumerate((["As", "Ad", "Kh", "Qh"], ["7h", "2c", "8d", "9s"], ["Jc", "Td", "3s", "4s"])):
+            table.add_to_hand(player + 1, hand)
+        self.assertIsNone(table.chunk_size(None))
+        self.assertEqual(table.chunk_size(budget), 100)
+        self.assertEqual(table.chunk_size(1), 1)
+
+    def test_chunked_unknown_hands_match_single_chunk(self):
+        table = HoldemTable(num_players=4)
+        table.add_to_hand(1, ["As", "Kd"])
+        table.add_to_hand(2, ["7h"])
+        chunked = table.estimate_outcomes(3000, "precise", seed=6, memory_budget=100000)
+        self.assertEqual(chunked, table.estimate_outcomes(3000, "precise", seed=6))
+
+class TestWinnerSetAggregation(unittest.TestCase):
+    def test_outcomes_match_per_runout_winner_sets(self):
+        table = HoldemTable(num_players=4)
+        res_arr = np.random.default_rng(2).integers(1, 4, size=(500, 4)).astype(np.int32)
+        weights = np.random.default_rng(3).integers(1, 5, size=500)
+        winners = [tuple(np.nonzero(scores == scores.max())[0] + 1) for scores in res_arr]
+        counts = table.tally("precise", res_arr, weights).outcomes
+        for num_winners in range(1, 5):
+            for winner_set in combinations(range(1, 5), num_winners):
+                key = f"Player {winner_set[0]} Win" if num_winners == 1 else \
+                    f"Player {','.join(map(str, winner_set))} Tie"
+                self.assertEqual(counts[key], sum(w for w, s in zip(weights, winners) if s == winner_set))
+
+        counts = table.tally("tie_win", res_arr, weights).outcomes
+        self.assertEqual(counts["Player 2 Tie"], sum(w for w, s in zip(weights, winners) if 2 in s and len(s) > 1))
+        counts = table.tally("win_any", res_arr, weights).outcomes
+        self.assertEqual(counts["Tie"], sum(w for w, s in zip(weights, winners) if len(s) == 4))
+        self.assertEqual(counts["Player 3"], sum(w for w, s in zip(weights, winners) if 3 in s and len(s) < 4))
+
+    def test_pot_shares_add_up_to_every_pot(self):
+        table = HoldemTable(num_players=3)
+        table.add_to_hand(1, ["As", "Ks"])
+        table.add_to_hand(2, ["Ad", "Kd"])
+        table.add_to_hand(3, ["7h", "2c"])
+        shares = table.simulate(num_scenarios='all', odds_type="pot_share")
+        self.assertAlmostEqual(sum(shares.values()), 100, delta=0.05)
+        self.assertAlmostEqual(shares["Player 1 Share"], shares["Player 2 Share"], delta=0.01)
+
+class TestHandStrengthAnalysis(unittest.TestCase):
+    def test_joint_distribution_sums_to_marginals(self):
+        table = HoldemTable(num_players=3)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "8h"])
+        table.add_to_hand(3, ["Kc", "Qd"])
+        community_cards, undrawn_combos, _ = table.simulation_preparation(5000, np.random.default_rng(6))
+        res_arr = table.simulate_calculation(community_cards, undrawn_combos)
+        marginal = table.hand_strength_analysis(res_arr)
+        joint = table.hand_strength_analysis(res_arr, joint=True)
+        for player in range(1, 4):
+            for hand_name, percent in marginal[player].items():
+                self.assertAlmostEqual(sum(joint_percent for (name, _), joint_percent in joint[player].items()
+                                           if name == hand_name), percent, delta=0.1)
+            expected = np.mean(res_arr[:, player - 1] // 16 ** 5 == 1) * 100
+            self.assertAlmostEqual(marginal[player].get('One Pair', 0), expected, delta=0.01)
+        winning_types = (res_arr.max(axis=1) // 16 ** 5)
+        self.assertAlmostEqual(sum(percent for (_, winning), percent in joint[1].items() if winning == 'Flush'),
+                               np.mean(winning_types == 5) * 100, delta=0.1)
+
+    def test_simulate_reports_joint_distribution(self):
+        table = HoldemTable(num_players=2)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_hand(2, ["7h", "2c"])
+        table.add_to_community(["Ks", "9d", "3c", "3s"])
+        outcome_dict, joint = table.simulate(num_scenarios='all', final_hand="joint")
+        self.assertAlmostEqual(sum(joint[1].values()), 100, delta=0.05)
+        # The winning hand is two pairs, or a full house when the river is an ace or a three
+        self.assertEqual(set(winning for _, winning in joint[2]), {'Two Pairs', 'Full House'})
+        self.assertEqual(outcome_dict["Player 1 Win"], 100.0)
 
 class TestDeckAndHands(unittest.TestCase):
     def test_deck_length(self):
@@ -71,17 +850,53 @@ class TestHand(unittest.TestCase):
         self.assertEqual(self.hand.hand_limit, 2)
 
     def test_add_cards_within_limit(self):
-        cards = np.array([[1, 1], [2, 2]], dtype=np.int32)  # Ensure dtype matches initialization
+        cards = np.array([1, 2], dtype=np.uint8)  # Ensure dtype matches initialization
         self.hand.add_cards(cards)
         self.assertEqual(self.hand.card_arr.shape[0], 2)
 
     def test_add_cards_exceed_limit(self):
-        self.hand.add_cards(np.array([[1, 1]], dtype=np.int32))
-        self.hand.add_cards(np.array([[2, 2]], dtype=np.int32))
+        self.hand.add_cards(np.array([1], dtype=np.uint8))
+        self.hand.add_cards(np.array([2], dtype=np.uint8))
         with self.assertRaises(Exception) as context:
-            self.hand.add_cards(np.array([[3, 3]], dtype=np.int32))
+            self.hand.add_cards(np.array([3], dtype=np.uint8))
         self.assertIn('Cannot Have more than 2 cards in hand', str(context.exception))
 
+    def test_card_mask_tracks_cards_in_order(self):
+        self.hand.add_cards(["Kd", "As"])
+        self.assertIn("As", self.hand)
+        self.assertNotIn("Ad", self.hand)
+        self.assertEqual(card_arr_to_str(self.hand.card_arr), ["Kd", "As"])
+        with self.assertRaises(HandException):
+            Hand(hand_limit=2).add_cards(["As", "As"])
+        self.hand.remove_cards("Kd")
+        self.assertEqual(self.hand.card_mask, 1 << 51)
+        with self.assertRaises(DeckException):
+            self.hand.remove_cards("Kd")
+
+    def test_short_deck_needs_two_card_hands(self):
+        with self.assertRaises(HandException):
+            Hand(hand_limit=4, short_deck=True)
+
+class TestTableCardMasks(unittest.TestCase):
+    def test_deck_and_community_masks(self):
+        table = HoldemTable(num_players=2, deck_type='short')
+        self.assertEqual(len(table.deck_arr), 36)
+        table.add_to_hand(1, ["As", "Ad"])
+        table.add_to_community(["Ks", "9d", "6c"])
+        self.assertFalse(table.in_deck("As"))
+        self.assertTrue(table.in_deck("Ah"))
+        self.assertEqual(card_arr_to_str(table.community_arr), ["Ks", "9d", "6c"])
+        short_deck = mask_to_arr(table.generate_deck_mask('short'))
+        np.testing.assert_array_equal(table.deck_arr, np.setdiff1d(short_deck,
+                                                                   card_str_to_arr(["As", "Ad", "Ks", "9d", "6c"])))
+        self.assertEqual(table.deck_arr.dtype, np.uint8)
+        with self.assertRaises(HandException):
+            table.add_to_community("Ks")
+        with self.assertRaises(DeckException):
+            table.add_to_hand(2, ["Ad", "Ah"])
+        with self.assertRaises(DeckException):
+            table.add_to_community("2c")
+
 class TestPokerGameLogic(unittest.TestCase):
     def setUp(self):
         # Setup a game scenario with five players, each with a hand
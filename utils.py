@@ -1,15 +1,27 @@
+import multiprocessing
 import numpy as np
 from math import factorial
 from itertools import combinations, chain
+from joblib import Parallel, delayed
 from scipy.special import comb
 from exceptions import *
 
 
+# Every card is a uint8 id, 4 * (rank - 2) + suit, so the deck is simply 0-51 ordered 2c 2d 2h 2s 3c ... As.
+# Strings like "As" (tables) or "Ace_of_spades" (GUI) are only converted to and from ids at the edges.
 num_dict = {"2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8, "9": 9, "T": 10, "J": 11, "Q": 12, "K": 13, "A": 14}
-suit_dict = {"d": 0, "c": 1, "s": 2, "h": 3}
+suit_dict = {"c": 0, "d": 1, "h": 2, "s": 3}
 rev_num_dict = {v: k for k, v in num_dict.items()}
 rev_suit_dict = {v: k for k, v in suit_dict.items()}
+name_num_dict = {"2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7, "8": 8, "9": 9, "10": 10, "Jack": 11, "Queen": 12, "King": 13, "Ace": 14}
+name_suit_dict = {"clubs": 0, "diamonds": 1, "hearts": 2, "spades": 3}
+rev_name_num_dict = {v: k for k, v in name_num_dict.items()}
+rev_name_suit_dict = {v: k for k, v in name_suit_dict.items()}
+NUM_CARDS = 52
+# Rounds of the Feistel network shuffling sampled runout ranks, see `permuted_ranks`
+PERMUTATION_ROUNDS = 4
 hand_type_dict = {0: 'High Card', 1: 'One Pair', 2: 'Two Pairs', 3: 'Three of a Kind', 4: 'Straight', 5: 'Flush', 6: 'Full House', 7: 'Four of a Kind', 8: 'Straight Flush'}
+short_hand_type_dict = {**hand_type_dict, 5: 'Full House', 6: 'Flush'}
 
 def num_combinations(total, selected):
     """
@@ -35,102 +47,321 @@ def comb_index(n, k):
 
     Returns:
         numpy.ndarray: An array of shape (M, k) where M is the number of combinations, and each row represents indices of a combination.
+            Indices are stored in the smallest unsigned dtype that fits them, uint8 for any deck.
     """
     count = comb(n, k, exact=True)
     index = np.fromiter(chain.from_iterable(combinations(range(n), k)),
-                        int, count=count*k)
+                        np.min_scalar_type(n - 1), count=count*k)
     return index.reshape(-1, k)
 
+def unrank_combinations(ranks, n, k):
+    """
+    Decodes combination ranks into the combinations themselves with the combinatorial number system, without
+    listing the other combinations.
+
+    Args:
+        ranks (numpy.ndarray): Ranks between 0 and C(n, k) - 1.
+        n (int): Length of the array from which elements are chosen.
+        k (int): Number of elements chosen.
+
+    Returns:
+        numpy.ndarray: An array of shape (len(ranks), k) holding the ascending indices of each combination, in the
+            smallest unsigned dtype that fits them.
+    """
+    remaining = np.array(ranks, dtype=np.int64)
+    index = np.zeros((len(remaining), k), dtype=np.min_scalar_type(n - 1))
+    for size in range(k, 0, -1):
+        # The largest element is the largest c with C(c, size) <= rank, and C(c, size) grows with c
+        binomials = np.array([comb(c, size, exact=True) for c in range(n)], dtype=np.int64)
+        element = np.searchsorted(binomials, remaining, side="right") - 1
+        index[:, size - 1] = element
+        remaining -= binomials[element]
+    return index
+
+
+def permutation_key(rng=None):
+    """
+    Draws the key of a pseudo-random permutation of ranks, see `permuted_ranks`.
+
+    Args:
+        rng (numpy.random.Generator, optional): Random generator to draw from. A fresh one is used by default.
+
+    Returns:
+        numpy.ndarray: PERMUTATION_ROUNDS uint64 round keys.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    return rng.integers(2 ** 63, size=PERMUTATION_ROUNDS, dtype=np.uint64)
+
+
+def permuted_ranks(total, positions, key):
+    """
+    Samples distinct ranks uniformly, to be decoded with `unrank_combinations`, as the images of `positions` under a
+    pseudo-random permutation of 0 to `total` - 1 chosen by `key`. The permutation is a Feistel network on the bits
+    of a rank, applied again to images past `total` until they fall below it, so distinct positions always give
+    distinct ranks, and a sample drawn over several consecutive ranges of positions is the same as drawn at once.
+
+    Args:
+        total (int): Number of ranks, C(n, k), at most 2**62.
+        positions (range): Positions of the sampled ranks in the permutation, between 0 and `total` - 1.
+        key (numpy.ndarray): Round keys as returned by `permutation_key`.
+
+    Returns:
+        numpy.ndarray: The sampled int64 ranks.
+    """
+    half_bits = np.uint64(max(1, (int(total - 1).bit_length() + 1) // 2))
+    half_mask = (np.uint64(1) << half_bits) - np.uint64(1)
+    ranks = np.arange(positions.start, positions.stop, dtype=np.uint64)
+    walking = np.ones(len(ranks), dtype=bool)
+    while walking.any():
+        left, right = ranks[walking] >> half_bits, ranks[walking] & half_mask
+        for round_key in key:
+            # The splitmix64 finalizer of the right half and the round key
+            mixed = right ^ round_key
+            mixed = (mixed ^ (mixed >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            mixed = (mixed ^ (mixed >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            left, right = right, left ^ ((mixed ^ (mixed >> np.uint64(31))) & half_mask)
+        ranks[walking] = (left << half_bits) | right
+        walking = ranks >= np.uint64(total)
+    return ranks.astype(np.int64)
+
+
+def num_deals(n, group_sizes):
+    """
+    Counts the ways to deal several groups of cards one after the other, e.g. the rest of the board followed by the
+    unknown hole cards of every player.
+
+    Args:
+        n (int): Number of cards to deal from.
+        group_sizes (list[int]): Number of cards in each group.
+
+    Returns:
+        int: The exact number of deals, 0 if there are not enough cards.
+    """
+    total = 1
+    for size in group_sizes:
+        total *= comb(n, size, exact=True)
+        n -= size
+    return total
+
+
+def unrank_deals(ranks, n, group_sizes):
+    """
+    Decodes deal ranks into deals of several groups of cards. A rank is read in the mixed radix of the number of
+    ways to deal each group from the cards the previous groups left, the first group being the least significant.
+
+    Args:
+        ranks (numpy.ndarray): Ranks between 0 and `num_deals(n, group_sizes)` - 1.
+        n (int): Number of cards to deal from.
+        group_sizes (list[int]): Number of cards in each group.
+
+    Returns:
+        numpy.ndarray: An array of shape (len(ranks), sum(group_sizes)) holding the indices of every group's cards
+            one group after the other, ascending within a group.
+    """
+    remaining = np.array(ranks, dtype=np.int64)
+    left = np.broadcast_to(np.arange(n, dtype=np.min_scalar_type(n - 1)), (len(remaining), n))
+    groups = []
+    for size in group_sizes:
+        num_left = left.shape[1]
+        remaining, group_ranks = np.divmod(remaining, comb(num_left, size, exact=True))
+        picked = unrank_combinations(group_ranks, num_left, size).astype(np.intp)
+        groups.append(np.take_along_axis(left, picked, axis=1))
+        keep = np.ones(left.shape, dtype=bool)
+        np.put_along_axis(keep, picked, False, axis=1)
+        left = left[keep].reshape(len(left), num_left - size)
+    return np.concatenate(groups, axis=1)
+
+
+def sample_deals(n, k, num_samples, rng=None):
+    """
+    Samples deals of `k` distinct cards out of `n` in random order, independently of each other, so any split of a
+    deal into consecutive groups (the board, then each player's hole cards) is a uniformly random deal of the groups.
+
+    Args:
+        n (int): Number of cards to deal from.
+        k (int): Number of cards in a deal, at most `n`.
+        num_samples (int): Number of deals. The keys take 12 * n bytes per deal, so callers draw them in chunks.
+        rng (numpy.random.Generator, optional): Random generator to draw from. A fresh one is used by default.
+
+    Returns:
+        numpy.ndarray: An array of shape (num_samples, k) holding the indices of each deal's cards, in the order
+            they are dealt.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    # Sorting the cards by random keys shuffles them, so the first k cards are a uniformly random ordered deal. Every
+    # deal reads n keys in turn from the random stream, so drawing deals in several calls gives the same deals as
+    # drawing them at once.
+    keys = rng.integers(1 << 32, size=(num_samples, n), dtype=np.uint32)
+    return np.argsort(keys, axis=1)[:, :k].astype(np.min_scalar_type(n - 1))
+
+
 def card_str_to_arr(card_str):
     """
-    Converts a list of card strings into a 2D numpy array representing card numbers and suits.
+    Converts a list of card strings into an array of card ids.
 
     Args:
         card_str (list[str]): List of card strings, each formatted as 'RankSuit'.
 
     Returns:
-        numpy.ndarray: A 2D array where each row represents a card with columns for rank and suit.
+        numpy.ndarray: A 1D uint8 array of card ids.
     """
-    return np.array([[num_dict[card[0]], suit_dict[card[1]]] for card in card_str])
+    return np.array([(num_dict[card[0]] - 2) * 4 + suit_dict[card[1]] for card in card_str], dtype=np.uint8)
 
 
 def card_arr_to_str(card_arr):
     """
-    Converts a 2D numpy array representing cards into a list of card strings.
+    Converts an array of card ids into a list of card strings.
 
     Args:
-        card_arr (numpy.ndarray): A 2D array where each row represents a card with columns for rank and suit.
+        card_arr (numpy.ndarray): A 1D array of card ids.
 
     Returns:
         list[str]: List of card strings formatted as 'RankSuit'.
     """
-    return [rev_num_dict[card[0]] + rev_suit_dict[card[1]] for card in card_arr]
+    return [rev_num_dict[card // 4 + 2] + rev_suit_dict[card % 4] for card in np.asarray(card_arr).tolist()]
 
 
-def remove_card(card, card_arr):
+def card_name_to_id(card_name):
     """
-    Removes a specified card from a card array.
+    Converts a GUI card name such as 'Ace_of_spades' into a card id.
 
     Args:
-        card (str or numpy.ndarray): The card to remove, specified either as a string or as an array element.
-        card_arr (numpy.ndarray): Array from which the card is to be removed.
+        card_name (str): The card name, formatted as 'Rank_of_Suit'.
 
     Returns:
-        numpy.ndarray: Array with the specified card removed.
+        int: The card id.
 
     Raises:
-        DeckException: If the specified card is not found in the array.
+        CardException: If the name does not describe a valid card.
     """
-    if type(card) == str:
-        card_check = (card_arr[:, 0] == card_str_to_arr([card])[0][0]) & (card_arr[:, 1] == card_str_to_arr([card])[0][1])
-    else:
-        card_check = (card_arr[:, 0] == card[0]) & (card_arr[:, 1] == card[1])
-    if not card_check.sum():
-        raise DeckException(f"Card {card if type(card) == str else ' '.join(card_arr_to_str([card]))} is not in the Deck")
-    return card_arr[~card_check]
+    parts = card_name.split('_of_')
+    if len(parts) != 2 or parts[0] not in name_num_dict or parts[1].lower() not in name_suit_dict:
+        raise CardException(f"Invalid card name: '{card_name}'. Expected format is 'Rank_of_Suit'.")
+    return (name_num_dict[parts[0]] - 2) * 4 + name_suit_dict[parts[1].lower()]
+
 
-def add_card(card, card_arr):
+def card_id_to_name(card_id):
     """
-    Adds a specified card to a card array, ensuring no duplicates.
+    Converts a card id into its GUI card name, e.g. 'Ace_of_spades'.
 
     Args:
-        card (str or numpy.ndarray): The card to add, specified either as a string or as an array element.
-        card_arr (numpy.ndarray): Array to which the card is to be added.
+        card_id (int): The card id.
 
     Returns:
-        numpy.ndarray: Array with the specified card added.
+        str: The card name, formatted as 'Rank_of_Suit'.
+    """
+    return f"{rev_name_num_dict[card_id // 4 + 2]}_of_{rev_name_suit_dict[card_id % 4]}"
+
+
+def card_to_id(card):
+    """
+    Normalizes a single card, given as a string or an integer id, into a card id.
+
+    Args:
+        card (str or int): The card, either as a 'RankSuit' string or as a card id.
+
+    Returns:
+        int: The card id.
 
     Raises:
-        HandException: If the specified card is already present in the array.
-    """
-    if len(card_arr) == 0:
-        card_arr = card_str_to_arr([card]) if type(card) == str else np.array([card])
-    else:
-        new_card = card_str_to_arr([card]) if type(card) == str else np.array([card])
-        card_check = np.array((card_arr[:, 0] == new_card[0][0]) & (card_arr[:, 1] == new_card[0][1]))
-
-        if card_check.sum():
-            raise HandException(f"Card {card if type(card) == str else ' '.join(card_arr_to_str([card]))} is already added")
-        card_arr = np.concatenate([
-                card_arr,
-                new_card
-            ], axis=0)
-    return card_arr
+        CardException: If the card is not a valid card string or id.
+    """
+    if type(card) == str:
+        if len(card) != 2 or card[0] not in num_dict or card[1] not in suit_dict:
+            raise CardException(f"Invalid card: '{card}'")
+        return (num_dict[card[0]] - 2) * 4 + suit_dict[card[1]]
+    if not 0 <= card < NUM_CARDS:
+        raise CardException(f"Invalid card id: {card}")
+    return int(card)
+
+
+def card_bit(card):
+    """
+    Converts a card into its bit in a 52-bit card mask, where bit i is set if card id i is present.
+
+    Args:
+        card (str or int): The card, specified either as a string or as a card id.
+
+    Returns:
+        int: The card's bit.
+    """
+    return 1 << card_to_id(card)
+
+
+def mask_to_arr(card_mask):
+    """
+    Lists the cards of a card mask.
+
+    Args:
+        card_mask (int): A 52-bit card mask.
+
+    Returns:
+        numpy.ndarray: A 1D uint8 array of the card ids in the mask, in ascending order.
+    """
+    bits = np.unpackbits(np.frombuffer(card_mask.to_bytes(7, 'little'), dtype=np.uint8), bitorder='little')
+    return np.flatnonzero(bits).astype(np.uint8)
+
 
 def format_cards(cards):
     """
     Normalizes different forms of card inputs into a consistent format.
 
     Args:
-        cards (str, list, or numpy.ndarray): Input cards, which could be a single string, a list of integers, or a numpy array.
+        cards (str, int, list, or numpy.ndarray): Input cards, which could be a single string or card id, or a list or
+            numpy array of them.
 
     Returns:
         list: A normalized list of cards.
     """
-    if type(cards) == np.ndarray and cards.ndim == 1:
-        return [cards]
-    elif type(cards) == list and type(cards[0]) == int:
-        return [cards]
-    elif type(cards) == str:
+    if type(cards) == str or isinstance(cards, (int, np.integer)):
         return [cards]
-    return cards
+    return list(cards)
+
+
+def resolve_n_jobs(n_jobs):
+    """
+    Resolves a joblib-style worker count, where -1 means one worker per CPU core, -2 all cores but one, and so on.
+
+    Args:
+        n_jobs (int): Requested number of workers.
+
+    Returns:
+        int: The actual number of workers, at least 1.
+
+    Raises:
+        ValueError: If `n_jobs` is 0.
+    """
+    if n_jobs == 0:
+        raise ValueError("n_jobs == 0 has no meaning, use 1 to run in the current process")
+    return max(multiprocessing.cpu_count() + 1 + n_jobs, 1) if n_jobs < 0 else n_jobs
+
+
+def shard_sizes(total, num_shards):
+    """
+    Splits a number of simulations into near-equal shards.
+
+    Args:
+        total (int): Number of simulations to split.
+        num_shards (int): Number of shards.
+
+    Returns:
+        list[int]: The size of each shard, summing to `total`.
+    """
+    return [total // num_shards + (shard < total % num_shards) for shard in range(num_shards)]
+
+
+def run_shards(function, shard_args, n_jobs=1):
+    """
+    Calls `function` once per shard, in a pool of worker processes when `n_jobs` is not 1.
+
+    Args:
+        function (callable): Picklable function computing one shard.
+        shard_args (list[tuple]): Positional arguments of every shard.
+        n_jobs (int): Number of worker processes, -1 for one per CPU core.
+
+    Returns:
+        list: The result of every shard, in shard order regardless of which worker computed it.
+    """
+    if resolve_n_jobs(n_jobs) == 1:
+        return [function(*args) for args in shard_args]
+    return Parallel(n_jobs=n_jobs, backend="loky")(delayed(function)(*args) for args in shard_args)